@@ -0,0 +1,29 @@
+-- ============================================================
+-- SmartNR: admin_access_logs キーセットページネーション用インデックス
+-- 実行先: Supabase SQL Editor
+--
+-- GET /api/admin/access-logs?pagination=cursor は
+--   ORDER BY created_at DESC, id DESC
+--   WHERE created_at <= :cursor_created_at
+--     AND (created_at < :cursor_created_at OR (created_at = :cursor_created_at AND id < :cursor_id))
+-- で読む（PostgRESTの .lte() + .or_()）。created_at <= の条件がインデックスの範囲の上限になり、
+-- 何ページ目でもカーソル位置から1ページ分だけ読む（先頭からの読み捨てが発生しない）。
+-- 件数は count 未指定なら取らない（COUNT(*) はページごとに全件を数えるため）。
+--
+-- SQL Editorはスクリプト全体を1トランザクションで実行するため CONCURRENTLY は使えない。
+-- 作成中は admin_access_logs への INSERT が待たされる（SHAREロック）。
+-- その間のログはMiddlewareの書き込みキュー／スプールに溜まり、作成後に書き込まれる。
+-- 行数が多い環境ではアクセスの少ない時間帯に実行すること。
+-- ============================================================
+
+CREATE INDEX IF NOT EXISTS idx_access_logs_created_id
+  ON admin_access_logs (created_at DESC, id DESC);
+
+-- よく使うフィルターとの組み合わせ
+CREATE INDEX IF NOT EXISTS idx_access_logs_action_created_id
+  ON admin_access_logs (action_type, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_access_logs_resource_created_id
+  ON admin_access_logs (resource_type, created_at DESC, id DESC);
+
+-- count=planned / estimated はプランナーの統計を使うため、定期的にANALYZEする
+ANALYZE admin_access_logs;
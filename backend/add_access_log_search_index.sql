@@ -0,0 +1,44 @@
+-- ============================================================
+-- SmartNR: admin_access_logs 全文検索用トライグラムインデックス
+-- 実行先: Supabase SQL Editor
+--
+-- GET /api/admin/access-logs?search=... は以前
+--   request_path / user_email / ip_address / error_message の ILIKE '%...%' 4本のOR
+-- で検索しており、先頭ワイルドカードのためB-treeインデックスが使えず全件走査になっていた。
+-- 4列を連結した生成列 search_text にトライグラムGINインデックスを張り、
+--   search_text ILIKE '%...%'
+-- 1本で検索する。user_email / ip_address の部分一致フィルターも同様にインデックスを使う。
+--
+-- 適用後、.env の ACCESS_LOG_SEARCH_COLUMN=search_text（既定値）で新しい検索経路になる。
+-- 未適用の環境では ACCESS_LOG_SEARCH_COLUMN= （空）にすると従来のOR検索のまま動く。
+--
+-- SQL Editorはスクリプト全体を1トランザクションで実行するため CONCURRENTLY は使えない。
+-- 生成列の追加はテーブルを書き直すため ACCESS EXCLUSIVE ロック、インデックス作成は SHARE ロックを取り、
+-- 完了まで admin_access_logs の読み書きが待たされる（ログはMiddlewareのキュー／スプールに溜まる）。
+-- 行数が多い環境ではアクセスの少ない時間帯に実行すること。
+-- ============================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 検索用の連結列（INSERT/UPDATE時に自動計算。アプリからは書かない）
+ALTER TABLE admin_access_logs
+  ADD COLUMN IF NOT EXISTS search_text TEXT
+  GENERATED ALWAYS AS (
+    lower(
+      coalesce(request_path, '') || ' ' ||
+      coalesce(user_email, '') || ' ' ||
+      coalesce(ip_address, '') || ' ' ||
+      coalesce(error_message, '')
+    )
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_access_logs_search_trgm
+  ON admin_access_logs USING gin (search_text gin_trgm_ops);
+
+-- 個別フィルター（user_email / ip_address の部分一致）
+CREATE INDEX IF NOT EXISTS idx_access_logs_email_trgm
+  ON admin_access_logs USING gin (user_email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_access_logs_ip_trgm
+  ON admin_access_logs USING gin (ip_address gin_trgm_ops);
+
+ANALYZE admin_access_logs;
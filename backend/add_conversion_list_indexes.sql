@@ -0,0 +1,35 @@
+-- ════════════════════════════════════════
+-- SmartNR: コンバージョン一覧のキーセットページネーション用インデックス
+-- 実行先: Supabase SQL Editor
+--
+-- GET /api/master/tracking/conversions?pagination=cursor は (created_at, id) の昇順・降順で並べ、
+--   (created_at, id) < (:created_at, :id)   （昇順は >）
+-- でカーソル位置から読む。よく使う絞り込み（種別・ステータス・スカウト）を先頭に置いた
+-- 複合インデックスで、カーソル位置から1ページ分（+1行）だけを読む。
+-- 件数はcount未指定なら取らない。count=exactを指定したページは絞り込み結果全体のCOUNTを実行し、
+-- オフセット方式（pagination=offset）はOFFSET分の行を読み飛ばす。
+-- 名前の部分一致検索は pg_trgm（add_access_log_search_index.sql で有効化済み）を使う。
+-- ════════════════════════════════════════
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 絞り込みなし
+CREATE INDEX IF NOT EXISTS idx_link_conversions_created_id
+  ON link_conversions(created_at, id);
+
+-- 種別・ステータス・スカウト（単独と組み合わせ）
+CREATE INDEX IF NOT EXISTS idx_link_conversions_type_created_id
+  ON link_conversions(conversion_type, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_link_conversions_status_created_id
+  ON link_conversions(status, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_link_conversions_type_status_created_id
+  ON link_conversions(conversion_type, status, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_link_conversions_scout_created_id
+  ON link_conversions(scout_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_link_conversions_scout_type_status_created_id
+  ON link_conversions(scout_id, conversion_type, status, created_at, id);
+
+-- 名前の部分一致（search）
+CREATE INDEX IF NOT EXISTS idx_link_conversions_name_trgm
+  ON link_conversions USING gin (name gin_trgm_ops);
+
+ANALYZE link_conversions;
@@ -0,0 +1,27 @@
+-- ════════════════════════════════════════
+-- SmartNR: scout_links に更新日時を追加
+-- 実行先: Supabase SQL Editor
+--
+-- 日報アラート（app/core/alerts.py）はリンクの有効/無効・強制停止・新規作成を
+-- scout_links.updated_at で検知し、変更のあったスカウトだけ集計し直す。
+-- APIはORMで更新時に設定するが、SQL Editor等からの直接更新も拾えるようトリガーでも更新する。
+-- ════════════════════════════════════════
+ALTER TABLE scout_links ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION touch_scout_links_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  NEW.updated_at := NOW();
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS scout_links_touch_updated_at ON scout_links;
+CREATE TRIGGER scout_links_touch_updated_at
+  BEFORE UPDATE ON scout_links
+  FOR EACH ROW EXECUTE FUNCTION touch_scout_links_updated_at();
+
+-- 前回以降に更新されたリンクの検索（max(updated_at) と updated_at > :watermark）
+CREATE INDEX IF NOT EXISTS idx_link_updated_at ON scout_links(updated_at);
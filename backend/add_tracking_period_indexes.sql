@@ -0,0 +1,43 @@
+-- ════════════════════════════════════════
+-- SmartNR: トラッキング集計の期間指定用インデックス
+-- 実行先: Supabase SQL Editor
+--
+-- /api/master/tracking/overview・/scouts の period（月・日付範囲・直近7/30日）は
+--   submitted_at >= :start AND submitted_at < :end
+-- のような範囲条件で絞り込むため、種別＋日時の複合インデックスで期間内の行だけを読む。
+-- 各ステータスの日時は大半がNULLなので部分インデックスにする。
+-- ════════════════════════════════════════
+
+-- 応募日（スカウト別・種別別）
+CREATE INDEX IF NOT EXISTS idx_link_conversions_scout_type_submitted
+  ON link_conversions(scout_id, conversion_type, submitted_at);
+CREATE INDEX IF NOT EXISTS idx_link_conversions_type_submitted
+  ON link_conversions(conversion_type, submitted_at);
+
+-- 各ステータスの到達日
+CREATE INDEX IF NOT EXISTS idx_link_conversions_type_contacted
+  ON link_conversions(conversion_type, contacted_at) WHERE contacted_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_link_conversions_type_interviewed
+  ON link_conversions(conversion_type, interviewed_at) WHERE interviewed_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_link_conversions_type_trial
+  ON link_conversions(conversion_type, trial_at) WHERE trial_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_link_conversions_type_hired
+  ON link_conversions(conversion_type, hired_at) WHERE hired_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_link_conversions_scout_type_hired
+  ON link_conversions(scout_id, conversion_type, hired_at) WHERE hired_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_link_conversions_type_registered
+  ON link_conversions(conversion_type, registered_at) WHERE registered_at IS NOT NULL;
+
+-- クリック日（期間内のクリックをリンク経由でスカウト・種別に集計）
+CREATE INDEX IF NOT EXISTS idx_link_clicks_clicked_link
+  ON link_clicks(clicked_at, link_id);
+CREATE INDEX IF NOT EXISTS idx_link_clicks_link_clicked
+  ON link_clicks(link_id, clicked_at);
+
+-- リンク数の集計
+CREATE INDEX IF NOT EXISTS idx_scout_links_scout_type
+  ON scout_links(scout_id, link_type);
+
+ANALYZE link_conversions;
+ANALYZE link_clicks;
+ANALYZE scout_links;
@@ -0,0 +1,210 @@
+"""
+日報アラートのルールエンジン
+スカウトごとの集計値を1回のGROUP BYクエリでまとめて読み、宣言済みの全ルールをその結果に対して評価する。
+ルールを増やしてもスカウトごとのクエリは増えない（必要なら SCOUT_METRICS に列を足す）。
+
+集計値は日ごとにプロセス内でキャッシュし、2回目以降は scout_performance か scout_links が
+更新されたスカウトだけを読み直す（クリック・応募・ステータス変更・SB変更は scout_performance を、
+リンクの作成・有効/無効・強制停止は scout_links.updated_at を更新する）。
+"""
+import threading
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import Session
+from app.models import Scout, ScoutLink, ScoutPerformanceRollup
+
+# 読み直し時の重なり（コミットが遅れた更新の取りこぼし防止）
+REFRESH_OVERLAP = timedelta(minutes=2)
+
+
+class AlertRule:
+    """1つのアラートルール（条件とメッセージは集計値の辞書とthresholdsを受け取る）"""
+
+    def __init__(
+        self,
+        type: str,
+        condition: Callable[[dict, dict], bool],
+        message: Callable[[dict, dict], str],
+        **thresholds,
+    ):
+        self.type = type
+        self.condition = condition
+        self.message = message
+        self.thresholds = thresholds
+
+    def evaluate(self, metrics: dict) -> Optional[dict]:
+        if not self.condition(metrics, self.thresholds):
+            return None
+        return {
+            "type": self.type,
+            "scout_id": metrics["scout_id"],
+            "message": self.message(metrics, self.thresholds),
+        }
+
+
+def recruit_cvr(metrics: dict) -> float:
+    clicks = metrics["recruit_clicks"]
+    return metrics["recruit_submissions"] / clicks * 100 if clicks else 0.0
+
+
+RULES = [
+    # 低CVR（最低クリック数以上のスカウトのみ判定）
+    AlertRule(
+        "low_cvr",
+        lambda m, t: m["recruit_clicks"] > t["min_clicks"] and recruit_cvr(m) < t["max_cvr"],
+        lambda m, t: f"{m['name']}のCVRが{recruit_cvr(m):.1f}%。リンクの見直しを推奨",
+        min_clicks=30,
+        max_cvr=5,
+    ),
+    # 今月の採用数が多い
+    AlertRule(
+        "high_performer",
+        lambda m, t: m["hired_this_month"] >= t["min_hired"],
+        lambda m, t: f"{m['name']}が今月{m['hired_this_month']}人採用。過去最高ペース",
+        min_hired=10,
+    ),
+    # 未払い報酬の滞留
+    AlertRule(
+        "unpaid_backlog",
+        lambda m, t: m["unpaid_scout_income"] >= t["min_amount"],
+        lambda m, t: f"{m['name']}の未払い報酬が{m['unpaid_scout_income']:,}円。支払い処理を確認",
+        min_amount=300000,
+    ),
+    # 有効なリンクがあるのに今月クリックが無い（月の後半のみ）
+    AlertRule(
+        "inactive_links",
+        lambda m, t: (
+            m["active_links"] > 0 and m["clicks_this_month"] == 0 and m["day_of_month"] >= t["from_day"]
+        ),
+        lambda m, t: f"{m['name']}の有効リンク{m['active_links']}本が今月クリック0件",
+        from_day=15,
+    ),
+]
+
+
+def scout_metrics(db: Session, today: date, scout_ids: Optional[set] = None) -> dict:
+    """スカウトごとの集計値 {scout_id: {...}}（1クエリ）"""
+    month = date(today.year, today.month, 1)
+    is_recruit = ScoutLink.link_type == "recruit"
+    links = db.query(
+        ScoutLink.scout_id.label("scout_id"),
+        func.sum(case((is_recruit, ScoutLink.click_count), else_=0)).label("recruit_clicks"),
+        func.sum(case((is_recruit, ScoutLink.submission_count), else_=0)).label("recruit_submissions"),
+        func.count(case((and_(ScoutLink.is_active == True, ScoutLink.force_disabled != True), 1))).label("active_links"),
+    ).group_by(ScoutLink.scout_id).subquery()
+
+    perf = ScoutPerformanceRollup
+    this_month = perf.month == month
+    performance = db.query(
+        perf.scout_id.label("scout_id"),
+        func.sum(case((and_(this_month, perf.link_type == "recruit"), perf.hired), else_=0)).label("hired_this_month"),
+        func.sum(case((this_month, perf.clicks), else_=0)).label("clicks_this_month"),
+        func.sum(perf.unpaid_scout_income).label("unpaid_scout_income"),
+    ).group_by(perf.scout_id).subquery()
+
+    query = db.query(
+        Scout.id,
+        Scout.name,
+        links.c.recruit_clicks,
+        links.c.recruit_submissions,
+        links.c.active_links,
+        performance.c.hired_this_month,
+        performance.c.clicks_this_month,
+        performance.c.unpaid_scout_income,
+    ).outerjoin(links, links.c.scout_id == Scout.id).outerjoin(
+        performance, performance.c.scout_id == Scout.id
+    )
+    if scout_ids is not None:
+        if not scout_ids:
+            return {}
+        query = query.filter(Scout.id.in_(scout_ids))
+
+    return {
+        scout_id: {
+            "scout_id": scout_id,
+            "name": name,
+            "recruit_clicks": int(recruit_clicks or 0),
+            "recruit_submissions": int(recruit_submissions or 0),
+            "active_links": int(active_links or 0),
+            "hired_this_month": int(hired or 0),
+            "clicks_this_month": int(clicks or 0),
+            "unpaid_scout_income": int(unpaid or 0),
+            "day_of_month": today.day,
+        }
+        for scout_id, name, recruit_clicks, recruit_submissions, active_links, hired, clicks, unpaid in query
+    }
+
+
+def evaluate(metrics: dict, rules: list = RULES) -> list[dict]:
+    """全スカウト×全ルールを評価する（スカウトID順・ルールの宣言順）"""
+    alerts = []
+    for scout_id in sorted(metrics):
+        for rule in rules:
+            alert = rule.evaluate(metrics[scout_id])
+            if alert:
+                alerts.append(alert)
+    return alerts
+
+
+class DailyAlertCache:
+    """当日分の集計値のキャッシュ（日付が変わったら全件読み直す）"""
+
+    def __init__(self, rules: list = RULES):
+        self.rules = rules
+        self._lock = threading.Lock()
+        self._day: Optional[date] = None
+        self._metrics: dict = {}
+        self._watermark: Optional[datetime] = None  # 読んだ時点のupdated_atの最大値（2テーブルの大きい方）
+
+        self.full_refreshes = 0
+        self.incremental_refreshes = 0
+
+    def alerts(self, db: Session, today: Optional[date] = None) -> list[dict]:
+        today = today or date.today()
+        with self._lock:
+            if self._day != today:
+                watermark = self._latest_update(db)
+                self._metrics = scout_metrics(db, today)
+                self._day = today
+                self._watermark = watermark
+                self.full_refreshes += 1
+            else:
+                self._refresh_changed(db, today)
+            return evaluate(self._metrics, self.rules)
+
+    def _refresh_changed(self, db: Session, today: date) -> None:
+        """前回以降にscout_performance・scout_linksが更新されたスカウトだけ読み直す"""
+        watermark = self._latest_update(db)
+        if watermark is None or (self._watermark is not None and watermark <= self._watermark):
+            return
+        perf = ScoutPerformanceRollup
+        changed_perf = db.query(perf.scout_id)
+        changed_links = db.query(ScoutLink.scout_id)
+        if self._watermark is not None:
+            since = self._watermark - REFRESH_OVERLAP
+            changed_perf = changed_perf.filter(perf.updated_at > since)
+            changed_links = changed_links.filter(ScoutLink.updated_at > since)
+        changed = changed_perf.union(changed_links)
+        self._metrics.update(scout_metrics(db, today, {row[0] for row in changed}))
+        self._watermark = watermark
+        self.incremental_refreshes += 1
+
+    @staticmethod
+    def _latest_update(db: Session) -> Optional[datetime]:
+        latest = db.query(
+            db.query(func.max(ScoutPerformanceRollup.updated_at)).scalar_subquery(),
+            db.query(func.max(ScoutLink.updated_at)).scalar_subquery(),
+        ).one()
+        latest = [datetime.fromisoformat(v) if isinstance(v, str) else v for v in latest]  # SQLite
+        latest = [v for v in latest if v is not None]
+        return max(latest) if latest else None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._day = None
+            self._metrics = {}
+            self._watermark = None
+
+
+daily_alerts = DailyAlertCache()
@@ -15,6 +15,8 @@ class Settings(BaseSettings):
     # Supabase設定
     SUPABASE_URL: str
     SUPABASE_KEY: str
+    SUPABASE_JWT_SECRET: str = ""  # HS256署名の検証用（Project Settings → API → JWT Secret）
+    SUPABASE_JWKS_URL: str = ""  # 非対称鍵の場合: https://xxx.supabase.co/auth/v1/.well-known/jwks.json
     
     # xAI API設定
     XAI_API_KEY: str
@@ -26,6 +28,42 @@ class Settings(BaseSettings):
     # CORS設定
     ALLOWED_ORIGINS: str = "http://localhost:3000"
     
+    # アクセスログ書き込みキュー設定
+    ACCESS_LOG_BATCH_SIZE: int = 100  # 1回のINSERT行数
+    ACCESS_LOG_FLUSH_INTERVAL: float = 1.0  # 秒
+    ACCESS_LOG_QUEUE_MAX: int = 10000  # キュー上限
+    ACCESS_LOG_DROP_POLICY: str = "drop_oldest"  # 'drop_oldest' | 'drop_newest'
+    ACCESS_LOG_SPOOL_DIR: str = "access_log_spool"  # INSERT失敗時の退避先（空文字で無効）
+    ACCESS_LOG_SPOOL_SEGMENT_BYTES: int = 4 * 1024 * 1024  # セグメントのローテーションサイズ
+    ACCESS_LOG_SPOOL_REPLAY_INTERVAL: float = 10.0  # 再投入を試みる間隔（秒）
+    ACCESS_LOG_IDENTITY_CACHE_SIZE: int = 10000  # JWT検証結果のキャッシュ件数
+    ACCESS_LOG_IDENTITY_CACHE_TTL: int = 300  # 秒（JWTのexpが先ならそちらを優先）
+    ACCESS_LOG_AUTH_REMOTE_FALLBACK: bool = True  # ローカル検証できない場合にAuth APIへ問い合わせる
+    ACCESS_LOG_BODY_INSPECT_LIMIT: int = 16384  # JSONボディを覗く上限バイト数
+    ACCESS_LOG_SEARCH_COLUMN: str = "search_text"  # トライグラム索引付きの検索列（空なら4列のOR検索）
+    ACCESS_LOG_RETENTION_DAYS: int = 90  # これより古い行はアーカイブへ移動
+    ACCESS_LOG_ARCHIVE_DIR: str = "access_log_archive"  # 日付パーティションの圧縮ファイル置き場
+    ACCESS_LOG_STATS_FLUSH_INTERVAL: float = 30.0  # 日別統計をaccess_log_daily_statsへマージする間隔（秒）
+    ACCESS_LOG_STREAM_BUFFER: int = 256  # ライブ配信の購読者ごとのバッファ行数（溢れたら古い行から破棄）
+    ACCESS_LOG_STREAM_MAX_SUBSCRIBERS: int = 50
+    # 不審なアクティビティ検出（/suspicious）
+    SUSPICIOUS_WINDOW_SECONDS: int = 3600  # 集計ウィンドウ
+    SUSPICIOUS_BUCKET_SECONDS: int = 60  # ウィンドウを区切るバケット幅
+    SUSPICIOUS_TRACKED_KEYS: int = 1000  # 追跡するIP・ユーザー数の上限（超えたら件数の少ないものから破棄）
+    SUSPICIOUS_AUTH_FAILURE_THRESHOLD: int = 20  # ウィンドウ内の401/403がこれ以上のIPを表示
+    SUSPICIOUS_DELETE_THRESHOLD: int = 10  # ウィンドウ内のDELETEがこれ以上のユーザーを表示
+    # ルート単位の記録ポリシー（"メソッド ルートテンプレート=always|sample:率|aggregate" をカンマ区切り）
+    # GET/HEAD以外はlog_policy.READ_LIKE_WRITESに挙げたルート（クリック計測のPOST /api/r）のみ対象
+    ACCESS_LOG_POLICY: str = (
+        "POST /api/r/{unique_code}=aggregate,"
+        "GET /api/lp/data/{unique_code}=aggregate"
+    )
+    # /metrics（Prometheusのbearer_tokenに同じ値を設定。空なら/metricsは404）
+    METRICS_TOKEN: str = ""
+    # トラッキング（マスター画面）
+    SB_BULK_PAY_CHUNK_SIZE: int = 1000  # SB一括支払いを1トランザクションで更新する件数
+    TRACKING_MAX_PER_PAGE: int = 100  # コンバージョン一覧のper_page上限
+    
     @property
     def allowed_origins_list(self) -> List[str]:
         """CORS許可オリジンをリスト化"""
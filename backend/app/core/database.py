@@ -2,6 +2,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
+from .metrics import instrument_engine, instrument_supabase
 from supabase import create_client, Client
 
 # データベースエンジン作成
@@ -11,6 +12,7 @@ engine = create_engine(
     pool_pre_ping=True,  # 接続チェック
     echo=settings.DEBUG  # SQLログ出力（開発時のみ）
 )
+instrument_engine(engine)  # クエリ回数・時間を/metricsへ
 
 # セッションローカル作成
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -30,4 +32,4 @@ def get_db():
 
 def get_supabase() -> Client:
     """Supabaseクライアント取得（アクセスログMiddleware用）"""
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    return instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
@@ -0,0 +1,58 @@
+"""
+リクエスト単位のエンティティローダー
+一覧の各行が参照するScout/Shop等を行ごとに取りに行かず、必要なIDを先に集めて
+モデルごとに1回の IN (...) クエリで取得する。取得結果はリクエスト内でキャッシュする。
+
+    loader.want(Scout, [row.scout_id for row in rows])
+    loader.want(Shop, [row.shop_id for row in rows])
+    for row in rows:
+        scout = loader.get(Scout, row.scout_id)  # 初回のgetで未取得分をまとめて読む
+"""
+from collections import defaultdict
+from typing import Iterable, Optional
+from fastapi import Depends
+from sqlalchemy.orm import Session
+from app.core.database import get_db
+
+
+class EntityLoader:
+    """主キーでのまとめ読み（同じIDは1度しか読まない）"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._cache: dict = defaultdict(dict)  # model → {id: entity or None}
+        self._pending: dict = defaultdict(set)  # model → 未取得のID
+
+    def want(self, model, ids: Iterable[Optional[int]]) -> None:
+        """取得予定のIDを登録する（None・取得済みは無視）"""
+        cache = self._cache[model]
+        self._pending[model].update(i for i in ids if i is not None and i not in cache)
+
+    def get(self, model, id: Optional[int]):
+        """1件取得（存在しなければNone）"""
+        if id is None:
+            return None
+        cache = self._cache[model]
+        if id not in cache:
+            self._pending[model].add(id)
+            self._load(model)
+        return cache[id]
+
+    def name(self, model, id: Optional[int], default=None):
+        entity = self.get(model, id)
+        return entity.name if entity else default
+
+    def _load(self, model) -> None:
+        ids = self._pending.pop(model, set())
+        if not ids:
+            return
+        cache = self._cache[model]
+        for entity in self.db.query(model).filter(model.id.in_(ids)).all():
+            cache[entity.id] = entity
+        for missing in ids - cache.keys():
+            cache[missing] = None
+
+
+def get_loader(db: Session = Depends(get_db)) -> EntityLoader:
+    """依存性注入用（同じリクエストのget_dbセッションを使う）"""
+    return EntityLoader(db)
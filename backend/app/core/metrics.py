@@ -0,0 +1,212 @@
+"""
+プロセス内メトリクス（Prometheusテキスト形式で /metrics に公開）
+- ルートテンプレート×メソッド×ステータス区分ごとのレイテンシヒストグラム
+- 処理中リクエスト数
+- DB / Supabase / xAI 呼び出し回数と所要時間
+
+カウンターはスレッドごとのシャードに加算し、スクレイプ時に合算する。
+イベントループとスレッドプール（同期エンドポイント）の両方から呼ばれてもロック不要。
+"""
+import threading
+import time
+from collections import defaultdict
+from typing import Iterable
+import httpx
+
+# レイテンシのバケット境界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class ShardedCounter:
+    """スレッドごとに分割したカウンター（key → float）"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: list[defaultdict] = []
+
+    def _shard(self) -> defaultdict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = defaultdict(float)
+            self._shards.append(shard)
+        return shard
+
+    def inc(self, key: tuple, amount: float = 1.0) -> None:
+        self._shard()[key] += amount
+
+    def snapshot(self) -> dict:
+        total: defaultdict = defaultdict(float)
+        for shard in list(self._shards):
+            for key, value in list(shard.items()):
+                total[key] += value
+        return total
+
+
+class ShardedHistogram:
+    """スレッドごとに分割したヒストグラム（key → [バケット..., +Inf, sum]）"""
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards: list[dict] = []
+
+    def observe(self, key: tuple, value: float) -> None:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            self._shards.append(shard)
+        series = shard.get(key)
+        if series is None:
+            series = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        else:
+            series[len(self.buckets)] += 1
+        series[-1] += value
+
+    def snapshot(self) -> dict:
+        total: dict = {}
+        for shard in list(self._shards):
+            for key, series in list(shard.items()):
+                merged = total.get(key)
+                if merged is None:
+                    total[key] = list(series)
+                else:
+                    for i, value in enumerate(series):
+                        merged[i] += value
+        return total
+
+
+class MetricsRegistry:
+    """アプリ全体のメトリクス"""
+
+    def __init__(self):
+        self.request_latency = ShardedHistogram()
+        self.external_calls = ShardedCounter()
+        self.external_seconds = ShardedCounter()
+        self.in_flight = 0  # イベントループからのみ更新
+
+    def observe_request(self, route: str, method: str, status: int, seconds: float) -> None:
+        self.request_latency.observe((route, method, f"{status // 100}xx"), seconds)
+
+    def observe_call(self, target: str, outcome: str, seconds: float) -> None:
+        self.external_calls.inc((target, outcome))
+        self.external_seconds.inc((target,), seconds)
+
+    def render(self) -> str:
+        """Prometheusテキスト形式"""
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route template.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        buckets = self.request_latency.buckets
+        for (route, method, status_class), series in sorted(self.request_latency.snapshot().items()):
+            labels = _labels(route=route, method=method, status_class=status_class)
+            cumulative = 0
+            for bound, count in zip(buckets, series):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += series[len(buckets)]
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {series[-1]:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+        lines += [
+            "# HELP http_requests_in_flight Requests currently being processed.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP external_calls_total Calls to DB / Supabase / xAI.",
+            "# TYPE external_calls_total counter",
+        ]
+        for (target, outcome), value in sorted(self.external_calls.snapshot().items()):
+            lines.append(f"external_calls_total{{{_labels(target=target, outcome=outcome)}}} {int(value)}")
+        lines += [
+            "# HELP external_call_seconds_total Time spent in calls to DB / Supabase / xAI.",
+            "# TYPE external_call_seconds_total counter",
+        ]
+        for (target,), value in sorted(self.external_seconds.snapshot().items()):
+            lines.append(f"external_call_seconds_total{{{_labels(target=target)}}} {value:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(
+        f'{name}="{_escape(value)}"' for name, value in labels.items()
+    )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# グローバルレジストリ
+metrics = MetricsRegistry()
+
+
+# ─────────────────────────────
+# 外部呼び出しの計測
+# ─────────────────────────────
+
+def instrument_engine(engine, target: str = "db") -> None:
+    """SQLAlchemyエンジンのクエリ実行を計測する"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["metrics_start"].pop()
+        metrics.observe_call(target, "ok", time.perf_counter() - start)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("metrics_start") if conn is not None else None
+        elapsed = time.perf_counter() - starts.pop() if starts else 0.0
+        metrics.observe_call(target, "error", elapsed)
+
+
+def instrument_httpx(client: httpx.Client, target: str) -> httpx.Client:
+    """httpxクライアント（Supabase / xAI SDK内部）のリクエストを計測する（同じクライアントには1回だけ）"""
+    if getattr(client, "_metrics_target", None):
+        return client
+    client._metrics_target = target
+
+    def _on_request(request: httpx.Request) -> None:
+        request.extensions["metrics_start"] = time.perf_counter()
+
+    def _on_response(response: httpx.Response) -> None:
+        start = response.request.extensions.get("metrics_start", time.perf_counter())
+        outcome = "ok" if response.status_code < 400 else "error"
+        metrics.observe_call(target, outcome, time.perf_counter() - start)
+
+    client.event_hooks["request"].append(_on_request)
+    client.event_hooks["response"].append(_on_response)
+    return client
+
+
+def instrument_supabase(client, target: str = "supabase"):
+    """
+    SupabaseクライアントのPostgREST・Authの呼び出しを計測する
+    PostgRESTクライアントは認証状態の変化（SIGNED_IN等）で作り直されるため、
+    作成処理を包んで作り直したクライアントにも計測を付け直す。
+    """
+    init_postgrest = client._init_postgrest_client
+
+    def _init_postgrest_client(*args, **kwargs):
+        postgrest = init_postgrest(*args, **kwargs)
+        instrument_httpx(postgrest.session, target)
+        return postgrest
+
+    client._init_postgrest_client = _init_postgrest_client
+    if client._postgrest is not None:
+        instrument_httpx(client._postgrest.session, target)
+    # auth.get_user（アクセスログのユーザー識別のフォールバック）等
+    instrument_httpx(client.auth._http_client, target)
+    return client
@@ -0,0 +1,40 @@
+"""
+キーセットページネーション用のカーソル
+(created_at, id) 等のソートキーをURLセーフなbase64文字列にして返す。
+クライアントにとっては不透明な文字列で、次ページ取得時にそのまま渡してもらう。
+"""
+import base64
+import json
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy.orm import Query, Session
+
+
+def encode_cursor(values: dict) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: tuple[str, ...]) -> dict:
+    """カーソルを復元する（改ざん・形式不正は400）"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, dict) or any(key not in values for key in keys):
+            raise ValueError
+        return values
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def estimate_count(db: Session, query: Query) -> Optional[int]:
+    """プランナーの推定行数（PostgreSQL以外はNone）"""
+    if db.bind.dialect.name != "postgresql":
+        return None
+    compiled = query.statement.compile(dialect=db.bind.dialect)
+    plan = db.connection().exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
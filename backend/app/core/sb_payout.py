@@ -0,0 +1,167 @@
+"""
+SB一括支払い
+対象IDをチャンクに分け、チャンクごとに
+  UPDATE link_conversions ... WHERE id IN (...) AND is_sb_paid = false RETURNING ...
+を1トランザクションで実行する（月次集計・遷移ログも同じトランザクションでまとめて更新）。
+既に支払済みの行は更新されないため、同じ対象で再実行しても二重には支払わない。
+
+idempotency_key を指定した場合は sb_payout_batches に進捗を記録し、
+完了済みのキーでの再送は何もせず前回の結果を返す（途中で失敗したキーは続きのチャンクから再開する）。
+同じキーの同時リクエストはチャンクごとに sb_payout_batches の行ロック（SELECT ... FOR UPDATE）を取り、
+ロック後に読み直した進捗の続きだけを処理するため、同じチャンクを二重に処理・記録しない。
+"""
+import hashlib
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import and_, case, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.scout_performance import record_sb_paid
+from app.core.status_events import record_status_events
+from app.models import LinkConversion, SbPayoutBatch
+
+
+def ids_digest(ids: list[int]) -> str:
+    return hashlib.sha256(",".join(map(str, ids)).encode()).hexdigest()
+
+
+def batch_result(batch: SbPayoutBatch, replayed: bool) -> dict:
+    return {
+        "success": True,
+        "idempotency_key": batch.idempotency_key,
+        "replayed": replayed,
+        "requested_count": batch.requested_count,
+        "paid_count": batch.paid_count,
+        "chunks": batch.chunks,
+    }
+
+
+def open_batch(db: Session, key: str, master_id: int, ids: list[int]) -> SbPayoutBatch:
+    """冪等キーの記録を取得・作成する（別の対象で使われたキーは409）"""
+    digest = ids_digest(ids)
+    batch = db.get(SbPayoutBatch, key)
+    if batch is None:
+        try:
+            batch = SbPayoutBatch(
+                idempotency_key=key,
+                master_id=master_id,
+                ids_digest=digest,
+                requested_count=len(ids),
+                paid_count=0,
+                chunks=[],
+                status="running",
+            )
+            db.add(batch)
+            db.commit()
+        except IntegrityError:
+            # 同じキーの同時リクエスト
+            db.rollback()
+            batch = db.get(SbPayoutBatch, key)
+    if batch.ids_digest != digest:
+        raise HTTPException(status_code=409, detail="Idempotency key was used for different conversions")
+    return batch
+
+
+def lock_batch(db: Session, key: str) -> SbPayoutBatch:
+    """冪等キーの記録を行ロックして読み直す（ロックは次のコミットまで）"""
+    return (
+        db.query(SbPayoutBatch)
+        .filter(SbPayoutBatch.idempotency_key == key)
+        .with_for_update()
+        .populate_existing()
+        .one()
+    )
+
+
+def pay_chunk(db: Session, master_id: int, ids: list[int], notes: str, now: datetime) -> int:
+    """1チャンク分を支払済みにする（コミットは呼び出し側）。更新した件数を返す"""
+    conversion = LinkConversion
+    has_notes = and_(conversion.notes.isnot(None), conversion.notes != "")
+    statement = (
+        update(conversion)
+        .where(
+            conversion.id.in_(ids),
+            func.coalesce(conversion.is_sb_paid, False) == False,
+        )
+        .values(
+            is_sb_paid=True,
+            sb_paid_at=now,
+            notes=case((has_notes, conversion.notes + "\n" + notes), else_=notes),
+            updated_at=now,
+        )
+        .returning(
+            conversion.id,
+            conversion.scout_id,
+            conversion.conversion_type,
+            conversion.status,
+            conversion.hired_at,
+            conversion.submitted_at,
+            conversion.scout_income,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    rows = db.execute(statement).all()
+
+    record_sb_paid(db, [
+        (row.scout_id, row.conversion_type, row.hired_at, row.submitted_at, row.scout_income)
+        for row in rows
+    ])
+    record_status_events(
+        db,
+        [(row.id, row.scout_id, row.status) for row in rows],
+        actor_id=master_id,
+        actor_role="master",
+        event_type="sb_paid",
+        at=now,
+    )
+    return len(rows)
+
+
+def pay_conversions(
+    db: Session,
+    master_id: int,
+    conversion_ids: list[int],
+    notes: str,
+    chunk_size: int,
+    idempotency_key: Optional[str] = None,
+) -> dict:
+    """チャンクごとにコミットしながら支払済みにする"""
+    ids = sorted(set(conversion_ids))  # 行ロックの順序を揃える
+    chunks = [ids[start:start + chunk_size] for start in range(0, len(ids), chunk_size)]
+
+    if idempotency_key:
+        open_batch(db, idempotency_key, master_id, ids)
+        replayed = True
+        while True:
+            batch = lock_batch(db, idempotency_key)
+            index = len(batch.chunks or [])
+            if batch.status != "completed" and index >= len(chunks):
+                batch.status = "completed"
+                batch.completed_at = datetime.now()
+                replayed = False
+            if batch.status == "completed":
+                result = batch_result(batch, replayed=replayed)
+                db.commit()
+                return result
+            chunk = chunks[index]
+            paid = pay_chunk(db, master_id, chunk, notes, datetime.now())
+            batch.chunks = list(batch.chunks or []) + [{"index": index, "requested": len(chunk), "paid": paid}]
+            batch.paid_count = (batch.paid_count or 0) + paid
+            db.commit()
+            replayed = False
+
+    progress = []
+    for index, chunk in enumerate(chunks):
+        paid = pay_chunk(db, master_id, chunk, notes, datetime.now())
+        progress.append({"index": index, "requested": len(chunk), "paid": paid})
+        db.commit()
+
+    return {
+        "success": True,
+        "idempotency_key": None,
+        "replayed": False,
+        "requested_count": len(ids),
+        "paid_count": sum(chunk["paid"] for chunk in progress),
+        "chunks": progress,
+    }
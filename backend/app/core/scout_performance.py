@@ -0,0 +1,263 @@
+"""
+スカウト成績の月次集計（scout_performance）の更新
+
+クリック・応募・ステータス変更・SB変更の各処理から、同じトランザクション内で
+差分を加算する（INSERT ... ON CONFLICT DO UPDATE）。
+コンバージョンの変更は「変更前後の計上内容」の差分で反映するため、
+どの項目がどう変わったかを呼び出し側で意識する必要はない。
+
+    before = conversion_contributions(conversion)
+    conversion.status = ...
+    record_conversion_change(db, conversion, before)
+    db.commit()
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models import LinkClick, LinkConversion, ScoutLink, ScoutPerformanceRollup
+
+COUNT_COLUMNS = (
+    "clicks", "submissions", "contacted", "interviewed", "trial", "hired", "registered",
+    "active", "churned",
+)
+AMOUNT_COLUMNS = ("sb_amount", "scout_income", "unpaid_scout_income")
+
+# ステータス到達日 → 集計列
+STAGE_COLUMNS = {
+    "contacted_at": "contacted",
+    "interviewed_at": "interviewed",
+    "trial_at": "trial",
+    "hired_at": "hired",
+    "registered_at": "registered",
+}
+
+LINK_TYPE_BY_CONVERSION = {
+    "recruit_apply": "recruit",
+    "app_register": "app_invite",
+}
+
+
+def month_of(value: Optional[datetime]) -> Optional[date]:
+    if value is None:
+        return None
+    return date(value.year, value.month, 1)
+
+
+def link_type_of(conversion: LinkConversion) -> str:
+    return LINK_TYPE_BY_CONVERSION.get(conversion.conversion_type, conversion.conversion_type)
+
+
+def conversion_contributions(conversion: LinkConversion) -> dict:
+    """このコンバージョンが集計に計上している値 {(月, 列): 値}"""
+    contributions: dict = defaultdict(Decimal)
+    submitted = month_of(conversion.submitted_at)
+    if submitted is None:
+        return {}
+
+    contributions[(submitted, "submissions")] += 1
+    for attribute, column in STAGE_COLUMNS.items():
+        reached = month_of(getattr(conversion, attribute))
+        if reached is not None:
+            contributions[(reached, column)] += 1
+    if conversion.status in ("active", "churned"):
+        contributions[(submitted, conversion.status)] += 1
+
+    earned = month_of(conversion.hired_at) or submitted
+    scout_income = Decimal(str(conversion.scout_income or 0))
+    contributions[(earned, "sb_amount")] += Decimal(str(conversion.sb_amount or 0))
+    contributions[(earned, "scout_income")] += scout_income
+    if not conversion.is_sb_paid:
+        contributions[(earned, "unpaid_scout_income")] += scout_income
+    return dict(contributions)
+
+
+def record_conversion_change(db: Session, conversion: LinkConversion, before: dict) -> None:
+    """変更前の計上内容との差分を加算する（新規作成時は before={}）"""
+    after = conversion_contributions(conversion)
+    by_month: dict = defaultdict(dict)
+    for key in set(before) | set(after):
+        delta = after.get(key, 0) - before.get(key, 0)
+        if delta:
+            month, column = key
+            by_month[month][column] = int(delta) if column in COUNT_COLUMNS else delta
+    link_type = link_type_of(conversion)
+    for month, deltas in by_month.items():
+        bump(db, conversion.scout_id, link_type, month, **deltas)
+
+
+def record_sb_paid(db: Session, paid_rows) -> None:
+    """一括支払いで支払済みにした行の未払い報酬を減算する（月・リンクタイプごとに1回）
+
+    paid_rows: (scout_id, conversion_type, hired_at, submitted_at, scout_income) の並び
+    """
+    deltas: dict = defaultdict(Decimal)
+    for scout_id, conversion_type, hired_at, submitted_at, scout_income in paid_rows:
+        earned = month_of(hired_at) or month_of(submitted_at)
+        if earned is None or not scout_income:
+            continue
+        link_type = LINK_TYPE_BY_CONVERSION.get(conversion_type, conversion_type)
+        deltas[(scout_id, link_type, earned)] -= Decimal(str(scout_income))
+    for (scout_id, link_type, month), delta in deltas.items():
+        bump(db, scout_id, link_type, month, unpaid_scout_income=delta)
+
+
+def record_click(db: Session, link: ScoutLink, clicked_at: datetime) -> None:
+    bump(db, link.scout_id, link.link_type, month_of(clicked_at), clicks=1)
+
+
+def bump(db: Session, scout_id: int, link_type: str, month: date, **deltas) -> None:
+    """(スカウト, リンクタイプ, 月) の行に差分を加算する（行が無ければ作成）"""
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    table = ScoutPerformanceRollup.__table__
+    values = {column: 0 for column in COUNT_COLUMNS + AMOUNT_COLUMNS}
+    values.update(deltas)
+    statement = insert(table).values(
+        scout_id=scout_id, link_type=link_type, month=month, **values
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["scout_id", "link_type", "month"],
+        set_={
+            **{column: table.c[column] + statement.excluded[column] for column in deltas},
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(statement)
+
+
+# ─────────────────────────────
+# 読み出し
+# ─────────────────────────────
+
+TREND_COLUMNS = ("clicks", "submissions", "hired", "scout_income")
+
+
+def monthly_trend(db: Session, scout_id: int, months: int = 12, today: Optional[date] = None) -> list[dict]:
+    """直近months か月（当月含む）のリンクタイプ別推移。データの無い月は0で埋める"""
+    current = month_of(today or date.today())
+    series = []
+    year, month = current.year, current.month
+    for _ in range(months):
+        series.append(date(year, month, 1))
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    series.reverse()
+
+    perf = ScoutPerformanceRollup
+    rows = db.query(
+        perf.month, perf.link_type, *[getattr(perf, column) for column in TREND_COLUMNS]
+    ).filter(
+        perf.scout_id == scout_id,
+        perf.month >= series[0],
+        perf.month <= current,
+    ).all()
+    values = {(row[0], row[1]): row[2:] for row in rows}
+
+    def point(month_start: date, link_type: str) -> dict:
+        found = values.get((month_start, link_type))
+        if found is None:
+            return {column: 0 for column in TREND_COLUMNS}
+        return {
+            column: int(value or 0)
+            for column, value in zip(TREND_COLUMNS, found)
+        }
+
+    return [
+        {
+            "month": month_start.strftime("%Y-%m"),
+            "recruit": point(month_start, "recruit"),
+            "app_invite": point(month_start, "app_invite"),
+        }
+        for month_start in series
+    ]
+
+
+# ─────────────────────────────
+# 全件再計算
+# ─────────────────────────────
+
+def month_expr(db: Session, column):
+    """月初日のSQL式"""
+    if db.bind.dialect.name == "postgresql":
+        return func.date_trunc("month", column)
+    return func.strftime("%Y-%m-01", column)
+
+
+def rebuild(db: Session) -> int:
+    """link_clicks / link_conversions から scout_performance を作り直す（書き込んだ行数を返す）"""
+    rows: dict = defaultdict(lambda: defaultdict(Decimal))
+
+    def as_month(value) -> date:
+        if isinstance(value, str):
+            return date.fromisoformat(value[:10])
+        return date(value.year, value.month, 1)
+
+    def collect(query, column):
+        for scout_id, link_type, month, value in query:
+            rows[(scout_id, link_type, as_month(month))][column] += value or 0
+
+    clicked = month_expr(db, LinkClick.clicked_at)
+    collect(
+        db.query(ScoutLink.scout_id, ScoutLink.link_type, clicked, func.count(LinkClick.id))
+        .join(ScoutLink, ScoutLink.id == LinkClick.link_id)
+        .group_by(ScoutLink.scout_id, ScoutLink.link_type, clicked),
+        "clicks",
+    )
+
+    # コンバージョンは列ごとに (スカウト, 種別, 月) で GROUP BY して集計する
+    # 応募日の無い行は差分更新（conversion_contributions）と同じく計上しない
+    conversion_type = LinkConversion.conversion_type
+
+    def conversion_query(month_column, value, *conditions):
+        month = month_expr(db, month_column)
+        query = db.query(LinkConversion.scout_id, conversion_type, month, value).filter(
+            LinkConversion.submitted_at.isnot(None)
+        )
+        for condition in conditions:
+            query = query.filter(condition)
+        return (
+            (scout_id, LINK_TYPE_BY_CONVERSION.get(kind, kind), month_value, total)
+            for scout_id, kind, month_value, total
+            in query.group_by(LinkConversion.scout_id, conversion_type, month)
+        )
+
+    count = func.count(LinkConversion.id)
+    collect(conversion_query(LinkConversion.submitted_at, count), "submissions")
+    for attribute, column in STAGE_COLUMNS.items():
+        stage = getattr(LinkConversion, attribute)
+        collect(conversion_query(stage, count, stage.isnot(None)), column)
+    for status in ("active", "churned"):
+        collect(conversion_query(LinkConversion.submitted_at, count, LinkConversion.status == status), status)
+
+    earned = func.coalesce(LinkConversion.hired_at, LinkConversion.submitted_at)
+    collect(conversion_query(earned, func.sum(LinkConversion.sb_amount)), "sb_amount")
+    collect(conversion_query(earned, func.sum(LinkConversion.scout_income)), "scout_income")
+    collect(
+        conversion_query(
+            earned,
+            func.sum(LinkConversion.scout_income),
+            func.coalesce(LinkConversion.is_sb_paid, False) == False,
+        ),
+        "unpaid_scout_income",
+    )
+
+    db.query(ScoutPerformanceRollup).delete(synchronize_session=False)
+    db.bulk_insert_mappings(ScoutPerformanceRollup, [
+        {
+            "scout_id": scout_id,
+            "link_type": link_type,
+            "month": month,
+            **{column: 0 for column in COUNT_COLUMNS + AMOUNT_COLUMNS},
+            **{
+                column: int(value) if column in COUNT_COLUMNS else value
+                for column, value in values.items()
+            },
+        }
+        for (scout_id, link_type, month), values in rows.items()
+    ])
+    return len(rows)
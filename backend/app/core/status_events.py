@@ -0,0 +1,114 @@
+"""
+コンバージョンのステータス遷移ログ（conversion_status_events）
+ステータス変更・SB支払い・応募の各処理が、同じトランザクション内で1行追記する。
+日報・ステージ滞在時間・監査ビューはこのログを時刻の範囲で読む。
+
+    from_status = conversion.status
+    conversion.status = ...
+    record_status_event(db, conversion, from_status, actor_id=master_id, actor_role="master")
+    db.commit()
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from app.models import ConversionStatusEvent, LinkConversion
+
+
+def record_status_event(
+    db: Session,
+    conversion: LinkConversion,
+    from_status: Optional[str],
+    actor_id: Optional[int],
+    actor_role: str,
+    event_type: str = "status",
+    at: Optional[datetime] = None,
+) -> None:
+    """1件追記する（新規コンバージョンはflush済みであること）"""
+    db.add(ConversionStatusEvent(
+        conversion_id=conversion.id,
+        scout_id=conversion.scout_id,
+        event_type=event_type,
+        from_status=from_status,
+        to_status=conversion.status,
+        actor_id=actor_id,
+        actor_role=actor_role,
+        created_at=at or datetime.now(),
+    ))
+
+
+def record_status_events(db: Session, rows, actor_id: Optional[int], actor_role: str, event_type: str, at: datetime) -> None:
+    """同じ操作の複数件をまとめて追記する（rows: (conversion_id, scout_id, status) の並び）"""
+    values = [
+        {
+            "conversion_id": conversion_id,
+            "scout_id": scout_id,
+            "event_type": event_type,
+            "from_status": status,
+            "to_status": status,
+            "actor_id": actor_id,
+            "actor_role": actor_role,
+            "created_at": at,
+        }
+        for conversion_id, scout_id, status in rows
+    ]
+    if values:
+        db.execute(insert(ConversionStatusEvent), values)
+
+
+def day_range(day: date) -> tuple:
+    """その日の [00:00, 翌日00:00)"""
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def seconds_between(db: Session, start, end):
+    """2つの時刻の差（秒）のSQL式"""
+    if db.bind.dialect.name == "postgresql":
+        return func.extract("epoch", end - start)
+    return (func.julianday(end) - func.julianday(start)) * 86400
+
+
+def stage_durations(db: Session, date_range: Optional[tuple] = None, scout_id: Optional[int] = None) -> list[dict]:
+    """
+    ステージごとの滞在時間（そのステージを抜けた遷移を期間で絞る）
+    直前の遷移（無ければ応募）からの経過時間を、抜けたステージ単位で集計する。
+    """
+    event = ConversionStatusEvent
+    entered_at = func.lag(event.created_at).over(
+        partition_by=event.conversion_id, order_by=(event.created_at, event.id)
+    )
+    transitions = db.query(
+        event.from_status.label("stage"),
+        event.created_at.label("left_at"),
+        entered_at.label("entered_at"),
+    ).filter(event.event_type.in_(("submitted", "status")))
+    if scout_id:
+        transitions = transitions.filter(event.scout_id == scout_id)
+    if date_range is not None:
+        # 直前の遷移は期間外にあり得るため、期間の終わりまでを窓関数に渡して後から絞る
+        transitions = transitions.filter(event.created_at < date_range[1])
+    transitions = transitions.subquery()
+
+    duration = seconds_between(db, transitions.c.entered_at, transitions.c.left_at)
+    query = db.query(
+        transitions.c.stage,
+        func.count(),
+        func.avg(duration),
+        func.max(duration),
+    ).filter(
+        transitions.c.stage.isnot(None),
+        transitions.c.entered_at.isnot(None),
+    )
+    if date_range is not None:
+        query = query.filter(transitions.c.left_at >= date_range[0])
+    rows = query.group_by(transitions.c.stage).all()
+    return [
+        {
+            "stage": stage,
+            "transitions": count,
+            "avg_hours": round(float(avg or 0) / 3600, 1),
+            "max_hours": round(float(longest or 0) / 3600, 1),
+        }
+        for stage, count, avg, longest in sorted(rows, key=lambda row: -row[1])
+    ]
@@ -1,5 +1,6 @@
 from supabase import create_client, Client
 from app.core.config import settings
+from app.core.metrics import instrument_supabase
 
 # Supabaseクライアント初期化
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+supabase: Client = instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
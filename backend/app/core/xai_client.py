@@ -1,8 +1,10 @@
-from openai import OpenAI
+from openai import DefaultHttpxClient, OpenAI
 from app.core.config import settings
+from app.core.metrics import instrument_httpx
 
 # xAI Grokクライアント初期化（OpenAI SDK互換モード）
 xai_client = OpenAI(
     api_key=settings.XAI_API_KEY,
-    base_url=settings.XAI_BASE_URL
+    base_url=settings.XAI_BASE_URL,
+    http_client=instrument_httpx(DefaultHttpxClient(), "xai"),
 )
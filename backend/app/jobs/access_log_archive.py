@@ -0,0 +1,211 @@
+"""
+admin_access_logsのアーカイブ・保持期間管理
+
+保持期間（ACCESS_LOG_RETENTION_DAYS）を過ぎた行を日付パーティションの
+カラム指向圧縮ファイルへ移し、移した行をホットテーブルから小分けに削除する。
+
+ディレクトリ構成:
+  <ACCESS_LOG_ARCHIVE_DIR>/date=2026-01-31/part-<先頭id>-<末尾id>/
+      _meta.json            行数・カラム一覧
+      <column>.json.gz      カラムごとの値配列（gzip）
+
+削除の途中で中断した場合、再実行時の先頭チャンクは前回書き出した行を含むため、
+パートを書く前にその日の書き出し済みidを除く（同じ行が2つのパートに入らない）。
+
+実行: cd backend && python -m app.jobs.access_log_archive [--days 90]
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Iterator, Optional
+from supabase import Client
+
+LOG_TABLE = "admin_access_logs"
+META_FILE = "_meta.json"
+
+# アーカイブするカラム（保存列のみ。検索用の生成列 search_text は含めない）
+LOG_COLUMNS = (
+    "id", "created_at", "user_id", "user_email", "user_role", "request_method", "request_path",
+    "request_query", "request_body_summary", "ip_address", "user_agent", "referer",
+    "response_status", "response_time_ms", "error_message", "action_type", "resource_type",
+    "resource_id", "session_id",
+)
+
+
+class AccessLogArchive:
+    """日付パーティション×カラム単位のアーカイブファイル"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._archived_ids: dict[str, set] = {}  # 日付 → 書き出し済みのid（書き込み中の日付のみ保持）
+
+    def _day_dir(self, day: str) -> str:
+        return os.path.join(self.directory, f"date={day}")
+
+    def write_part(self, day: str, rows: list[dict]) -> Optional[str]:
+        """1日分の行をパートとして書き出す（書き出し済みのidは除く。全て書き出し済みなら何もしない）"""
+        archived_ids = self._ids_of_day(day)
+        rows = [row for row in rows if row["id"] not in archived_ids]
+        if not rows:
+            return None
+        part_name = f"part-{rows[0]['id']:012d}-{rows[-1]['id']:012d}"
+        part_dir = os.path.join(self._day_dir(day), part_name)
+        if os.path.exists(os.path.join(part_dir, META_FILE)):
+            return None  # 前回の実行で書き出し済み（削除前に中断したケース）
+
+        columns = list(rows[0].keys())
+        tmp_dir = part_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for column in columns:
+            values = [row.get(column) for row in rows]
+            with gzip.open(os.path.join(tmp_dir, f"{column}.json.gz"), "wt", encoding="utf-8") as f:
+                json.dump(values, f, ensure_ascii=False, default=str)
+        with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+            json.dump({"rows": len(rows), "columns": columns}, f)
+        os.replace(tmp_dir, part_dir)
+        archived_ids.update(row["id"] for row in rows)
+        return part_dir
+
+    def _ids_of_day(self, day: str) -> set:
+        """その日の書き出し済みid（初回のみid列を読む。古い順に処理するため前の日付は捨てる）"""
+        if day not in self._archived_ids:
+            for cached in [d for d in self._archived_ids if d < day]:
+                del self._archived_ids[cached]
+            self._archived_ids[day] = {
+                row_id for part in self._parts(day) for row_id in self._column(part, "id")
+            }
+        return self._archived_ids[day]
+
+    def days(self) -> list[dict]:
+        """アーカイブ済みの日付と行数"""
+        if not os.path.isdir(self.directory):
+            return []
+        result = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.startswith("date="):
+                continue
+            parts = self._parts(name[len("date="):])
+            result.append({
+                "date": name[len("date="):],
+                "parts": len(parts),
+                "rows": sum(self._meta(part)["rows"] for part in parts),
+            })
+        return result
+
+    def scan(
+        self,
+        date_from: date,
+        date_to: date,
+        columns: Optional[list[str]] = None,
+        where: Optional[Callable[[dict], bool]] = None,
+    ) -> Iterator[dict]:
+        """
+        期間内のアーカイブをパート単位で読み出し、1行ずつ返す。
+        必要なカラムのファイルだけを展開するため、メモリ使用量は1パート分の選択カラムに収まる。
+        """
+        day = date_from
+        while day <= date_to:
+            for part in self._parts(day.isoformat()):
+                meta = self._meta(part)
+                wanted = [c for c in (columns or meta["columns"]) if c in meta["columns"]]
+                values = [self._column(part, column) for column in wanted]
+                for row_values in zip(*values):
+                    row = dict(zip(wanted, row_values))
+                    if where is None or where(row):
+                        yield row
+            day += timedelta(days=1)
+
+    def _parts(self, day: str) -> list[str]:
+        day_dir = self._day_dir(day)
+        if not os.path.isdir(day_dir):
+            return []
+        return [
+            os.path.join(day_dir, name)
+            for name in sorted(os.listdir(day_dir))
+            if name.startswith("part-") and not name.endswith(".tmp")
+        ]
+
+    @staticmethod
+    def _meta(part_dir: str) -> dict:
+        with open(os.path.join(part_dir, META_FILE)) as f:
+            return json.load(f)
+
+    @staticmethod
+    def _column(part_dir: str, column: str) -> list:
+        with gzip.open(os.path.join(part_dir, f"{column}.json.gz"), "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def archive_old_logs(
+    supabase: Client,
+    archive: AccessLogArchive,
+    retention_days: int,
+    chunk_size: int = 1000,
+    delete_chunk: int = 200,
+) -> dict:
+    """
+    保持期間を過ぎた行をアーカイブへ移す。
+    古い順にchunk_size行ずつ取得 → 日付ごとに書き出し → delete_chunk件ずつ削除、を繰り返す。
+    """
+    cutoff = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    cutoff -= timedelta(days=retention_days)
+
+    archived = 0
+    deleted = 0
+    while True:
+        rows = (
+            supabase.table(LOG_TABLE)
+            .select(", ".join(LOG_COLUMNS))
+            .lt("created_at", cutoff.isoformat())
+            .order("created_at")
+            .order("id")
+            .limit(chunk_size)
+            .execute()
+        ).data
+        if not rows:
+            break
+
+        # 日付ごとにパート化
+        by_day: dict[str, list[dict]] = {}
+        for row in rows:
+            by_day.setdefault(str(row["created_at"])[:10], []).append(row)
+        for day, day_rows in by_day.items():
+            archive.write_part(day, day_rows)
+            archived += len(day_rows)
+
+        # 書き出し済みの行を小分けに削除（長いロックを避ける）
+        ids = [row["id"] for row in rows]
+        for start in range(0, len(ids), delete_chunk):
+            supabase.table(LOG_TABLE).delete().in_("id", ids[start:start + delete_chunk]).execute()
+            deleted += len(ids[start:start + delete_chunk])
+
+        if len(rows) < chunk_size:
+            break
+
+    return {"cutoff": cutoff.isoformat(), "archived": archived, "deleted": deleted}
+
+
+def main():
+    from app.core.config import settings
+    from app.core.database import get_supabase
+
+    parser = argparse.ArgumentParser(description="admin_access_logsのアーカイブ")
+    parser.add_argument("--days", type=int, default=settings.ACCESS_LOG_RETENTION_DAYS)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    result = archive_old_logs(
+        get_supabase(),
+        AccessLogArchive(settings.ACCESS_LOG_ARCHIVE_DIR),
+        retention_days=args.days,
+        chunk_size=args.chunk_size,
+    )
+    print(f"[AccessLogArchive] {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+scout_performance（スカウト成績の月次集計）の再計算
+
+link_clicks / link_conversions から全件集計し直してテーブルを置き換える。
+通常はクリック・応募・ステータス変更の各処理が差分を加算するため不要で、
+初回導入時や手作業でデータを直した後に実行する。
+
+実行: cd backend && python -m app.jobs.rebuild_scout_performance
+"""
+from app.core.database import SessionLocal
+from app.core.scout_performance import rebuild
+
+
+def main():
+    db = SessionLocal()
+    try:
+        written = rebuild(db)
+        db.commit()
+        print(f"[ScoutPerformance] rebuilt {written} rows")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
-from fastapi import FastAPI
+import hmac
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.database import get_supabase
+from app.core.metrics import metrics
 from app.routers import router
 from app.routers.ai import router as ai_router
 from app.routers.ai_matching import router as ai_matching_router
@@ -11,17 +16,113 @@ from app.routers.scout_links import router as scout_links_router
 from app.routers.mini_lp import router as mini_lp_router
 from app.routers.master_tracking import router as master_tracking_router
 from app.routers.access_logs import router as access_logs_router
+from app.middleware.abuse_monitor import AbuseMonitor
 from app.middleware.access_logger import AccessLogMiddleware
+from app.middleware.action_classifier import RouteActionClassifier
+from app.middleware.auth_identity import IdentityResolver
+from app.middleware.log_broadcaster import LogBroadcaster
+from app.middleware.log_policy import AccessLogPolicy, parse_policy
+from app.middleware.log_spool import AccessLogSpool
+from app.middleware.log_stats import DailyStatsAccumulator
+from app.middleware.log_writer import AccessLogWriter
 
 # Supabaseを使用するため、SQLAlchemyのテーブル自動作成は不要
 
+# アクセスログ書き込みキュー（リクエスト処理とは別にバッチINSERT。失敗分はスプールへ退避）
+supabase_client = get_supabase()
+access_log_spool = (
+    AccessLogSpool(
+        settings.ACCESS_LOG_SPOOL_DIR,
+        segment_max_bytes=settings.ACCESS_LOG_SPOOL_SEGMENT_BYTES,
+    )
+    if settings.ACCESS_LOG_SPOOL_DIR
+    else None
+)
+access_log_writer = AccessLogWriter(
+    supabase_client,
+    batch_size=settings.ACCESS_LOG_BATCH_SIZE,
+    flush_interval=settings.ACCESS_LOG_FLUSH_INTERVAL,
+    max_queue=settings.ACCESS_LOG_QUEUE_MAX,
+    drop_policy=settings.ACCESS_LOG_DROP_POLICY,
+    spool=access_log_spool,
+    replay_interval=settings.ACCESS_LOG_SPOOL_REPLAY_INTERVAL,
+)
+
+# ログ用ユーザー識別（JWTをローカル検証。Auth APIはフォールバックのみ）
+identity_resolver = IdentityResolver(
+    supabase_client,
+    jwt_secret=settings.SUPABASE_JWT_SECRET,
+    jwks_url=settings.SUPABASE_JWKS_URL,
+    cache_size=settings.ACCESS_LOG_IDENTITY_CACHE_SIZE,
+    cache_ttl=settings.ACCESS_LOG_IDENTITY_CACHE_TTL,
+    remote_fallback=settings.ACCESS_LOG_AUTH_REMOTE_FALLBACK,
+)
+
+# ルートテンプレート単位のアクション分類（起動時に全ルート分を計算）
+route_classifier = RouteActionClassifier()
+
+# ルート単位の記録ポリシー（集計のみのルートは分単位サマリーをaccess_log_route_minutesへ）
+access_log_aggregate_writer = AccessLogWriter(
+    supabase_client,
+    table="access_log_route_minutes",
+    flush_interval=settings.ACCESS_LOG_FLUSH_INTERVAL,
+)
+access_log_policy = AccessLogPolicy(
+    parse_policy(settings.ACCESS_LOG_POLICY),
+    aggregate_writer=access_log_aggregate_writer,
+)
+
+# 日別統計（記録した行を加算し、定期的にaccess_log_daily_statsへマージ）
+access_log_daily_stats = DailyStatsAccumulator(
+    supabase_client,
+    flush_interval=settings.ACCESS_LOG_STATS_FLUSH_INTERVAL,
+)
+
+# 不審なアクティビティ検出（認証失敗IP・DELETE多発ユーザーをプロセス内で集計）
+abuse_monitor = AbuseMonitor(
+    window_seconds=settings.SUSPICIOUS_WINDOW_SECONDS,
+    bucket_seconds=settings.SUSPICIOUS_BUCKET_SECONDS,
+    capacity=settings.SUSPICIOUS_TRACKED_KEYS,
+    auth_failure_threshold=settings.SUSPICIOUS_AUTH_FAILURE_THRESHOLD,
+    delete_threshold=settings.SUSPICIOUS_DELETE_THRESHOLD,
+)
+
+# ライブ配信（記録行を管理画面のSSE購読者へ直接配る）
+log_broadcaster = LogBroadcaster(
+    buffer_size=settings.ACCESS_LOG_STREAM_BUFFER,
+    max_subscribers=settings.ACCESS_LOG_STREAM_MAX_SUBSCRIBERS,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """起動時にログflusherを開始し、終了時に残りを書き出す"""
+    route_classifier.warm(app.routes)
+    access_log_writer.start()
+    access_log_aggregate_writer.start()
+    access_log_policy.start()
+    access_log_daily_stats.start()
+    yield
+    await access_log_policy.stop()
+    await access_log_aggregate_writer.stop()
+    await access_log_writer.stop()
+    await access_log_daily_stats.stop()
+
+
 # FastAPIアプリケーション初期化
 app = FastAPI(
     title=settings.APP_NAME,
     debug=settings.DEBUG,
     version="1.0.0",
-    description="ナイトワークスカウトアプリ - AI顔分析・店舗マッチング機能搭載"
+    description="ナイトワークスカウトアプリ - AI顔分析・店舗マッチング機能搭載",
+    lifespan=lifespan,
 )
+app.state.access_log_writer = access_log_writer
+app.state.identity_resolver = identity_resolver
+app.state.access_log_policy = access_log_policy
+app.state.access_log_daily_stats = access_log_daily_stats
+app.state.abuse_monitor = abuse_monitor
+app.state.log_broadcaster = log_broadcaster
 
 # CORS設定
 app.add_middleware(
@@ -33,8 +134,18 @@ app.add_middleware(
 )
 
 # アクセスログMiddleware（全リクエストを記録）
-supabase_client = get_supabase()
-app.add_middleware(AccessLogMiddleware, supabase_client=supabase_client)
+app.add_middleware(
+    AccessLogMiddleware,
+    supabase_client=supabase_client,
+    writer=access_log_writer,
+    identity_resolver=identity_resolver,
+    classifier=route_classifier,
+    policy=access_log_policy,
+    body_inspect_limit=settings.ACCESS_LOG_BODY_INSPECT_LIMIT,
+    daily_stats=access_log_daily_stats,
+    abuse_monitor=abuse_monitor,
+    broadcaster=log_broadcaster,
+)
 
 # ルーター登録
 app.include_router(router, prefix="/api", tags=["CRUD API"])
@@ -66,3 +177,18 @@ def health():
         "app_name": settings.APP_NAME,
         "debug": settings.DEBUG
     }
+
+
+def require_metrics_token(authorization: Optional[str] = Header(default=None)):
+    """/metricsのBearerトークン検証（METRICS_TOKEN未設定なら無効化して404）"""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_token)])
+def get_metrics():
+    """Prometheus形式のメトリクス（ルート別レイテンシ・外部呼び出し回数。要Bearerトークン）"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,157 @@
+"""
+不審なアクティビティのスライディングウィンドウ集計
+- IPごとの認証失敗（401/403）
+- ユーザーごとのDELETE操作
+
+ウィンドウを時間バケットに分けてキーごとに数え、追跡するキー数が上限を超えたら
+ウィンドウ内の件数が少ないキーから捨てる（上位のヘビーヒッターだけを残す）。
+カウンターはプロセス内にあるため、複数ワーカー構成ではワーカーごとの値になる。
+"""
+import heapq
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+
+class _Entry:
+    __slots__ = ("stamps", "counts", "last_seen", "detail")
+
+    def __init__(self, buckets: int):
+        self.stamps = [-1] * buckets
+        self.counts = [0] * buckets
+        self.last_seen = 0.0
+        self.detail: dict = {}
+
+
+class SlidingWindowCounter:
+    """キーごとの時間バケット付きカウンター（追跡キー数に上限あり）"""
+
+    def __init__(self, window_seconds: int = 3600, bucket_seconds: int = 60, capacity: int = 1000):
+        self.bucket_seconds = bucket_seconds
+        self.buckets = max(1, window_seconds // bucket_seconds)
+        self.capacity = capacity
+        self._entries: dict[str, _Entry] = {}
+        self.evicted = 0
+        self.evicted_max = 0  # 捨てたキーの最大件数（これ未満の件数は取りこぼし得る）
+
+    @property
+    def window_seconds(self) -> int:
+        return self.buckets * self.bucket_seconds
+
+    def add(self, key: str, now: Optional[float] = None, **detail) -> None:
+        now = now or time.time()
+        bucket = int(now // self.bucket_seconds)
+        entry = self._entries.get(key)
+        if entry is None:
+            if len(self._entries) >= self.capacity + self.capacity // 4:
+                self._prune(bucket)
+            entry = self._entries[key] = _Entry(self.buckets)
+
+        slot = bucket % self.buckets
+        if entry.stamps[slot] != bucket:
+            entry.stamps[slot] = bucket
+            entry.counts[slot] = 0
+        entry.counts[slot] += 1
+        entry.last_seen = now
+        if detail:
+            entry.detail.update(detail)
+
+    def _total(self, entry: _Entry, bucket: int) -> int:
+        oldest = bucket - self.buckets
+        return sum(
+            count for stamp, count in zip(entry.stamps, entry.counts) if stamp > oldest
+        )
+
+    def _prune(self, bucket: int) -> None:
+        """件数の少ないキーを捨ててcapacity件に戻す（capacity/4件ごとにまとめて実行）"""
+        totals = {key: self._total(entry, bucket) for key, entry in self._entries.items()}
+        keep = set(heapq.nlargest(self.capacity, totals, key=totals.__getitem__))
+        for key, total in totals.items():
+            if key not in keep or total == 0:
+                del self._entries[key]
+                self.evicted += 1
+                self.evicted_max = max(self.evicted_max, total)
+
+    def top(self, limit: int, min_count: int = 1, now: Optional[float] = None) -> list[dict]:
+        """ウィンドウ内の件数が多い順（min_count以上のみ）"""
+        bucket = int((now or time.time()) // self.bucket_seconds)
+        ranked = []
+        for key, entry in self._entries.items():
+            total = self._total(entry, bucket)
+            if total >= min_count:
+                ranked.append((total, key, entry))
+        return [
+            {
+                "key": key,
+                "count": total,
+                "last_seen": datetime.fromtimestamp(entry.last_seen, timezone.utc).isoformat(),
+                **entry.detail,
+            }
+            for total, key, entry in heapq.nlargest(limit, ranked, key=lambda item: item[0])
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "tracked": len(self._entries),
+            "evicted": self.evicted,
+            "evicted_max": self.evicted_max,
+        }
+
+
+class AbuseMonitor:
+    """認証失敗IP・DELETE多発ユーザーの集計"""
+
+    def __init__(
+        self,
+        window_seconds: int = 3600,
+        bucket_seconds: int = 60,
+        capacity: int = 1000,
+        auth_failure_threshold: int = 20,
+        delete_threshold: int = 10,
+    ):
+        self.auth_failures = SlidingWindowCounter(window_seconds, bucket_seconds, capacity)
+        self.deletes = SlidingWindowCounter(window_seconds, bucket_seconds, capacity)
+        self.auth_failure_threshold = auth_failure_threshold
+        self.delete_threshold = delete_threshold
+
+    def observe(
+        self,
+        method: str,
+        path: str,
+        status: int,
+        ip_address: str,
+        user_id: Optional[str],
+        user_email: str,
+    ) -> None:
+        """1リクエスト分を反映する（イベントループから呼ぶ）"""
+        if status in (401, 403) and ip_address:
+            self.auth_failures.add(ip_address, last_path=path)
+        if method == "DELETE" and (user_id or user_email):
+            self.deletes.add(user_email or user_id, user_id=user_id, last_path=path)
+
+    def report(
+        self,
+        limit: int = 20,
+        auth_failure_threshold: Optional[int] = None,
+        delete_threshold: Optional[int] = None,
+    ) -> dict:
+        """閾値以上のIP・ユーザーを件数順に返す"""
+        auth_failures = self.auth_failures.top(
+            limit, auth_failure_threshold or self.auth_failure_threshold
+        )
+        deletes = self.deletes.top(limit, delete_threshold or self.delete_threshold)
+        return {
+            "window_seconds": self.auth_failures.window_seconds,
+            "auth_failures": [
+                {"ip_address": item.pop("key"), **item} for item in auth_failures
+            ],
+            "delete_operations": [
+                {"user_email": item.pop("key"), **item} for item in deletes
+            ],
+        }
+
+    def stats(self) -> dict:
+        return {
+            "auth_failures": self.auth_failures.stats(),
+            "deletes": self.deletes.stats(),
+        }
@@ -4,12 +4,19 @@
 """
 import time
 import json
-import re
 from typing import Optional
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from supabase import Client
+from app.core.metrics import UNMATCHED_ROUTE, metrics
+from app.middleware.abuse_monitor import AbuseMonitor
+from app.middleware.action_classifier import RouteActionClassifier
+from app.middleware.auth_identity import ANONYMOUS, IdentityResolver
+from app.middleware.log_broadcaster import LogBroadcaster
+from app.middleware.log_policy import SKIP, AccessLogPolicy
+from app.middleware.log_stats import DailyStatsAccumulator
+from app.middleware.log_writer import AccessLogWriter
+from app.middleware.redaction import Redactor
 
 # 個人情報マスクパターン
 SENSITIVE_FIELDS = [
@@ -20,6 +27,8 @@ SENSITIVE_FIELDS = [
 # ログ不要パス（ヘルスチェック、静的ファイル等）
 SKIP_PATHS = [
     "/health",
+    "/metrics",
+    "/api/admin/access-logs/stream",  # 長時間接続のライブ配信自体は記録しない
     "/docs",
     "/openapi.json",
     "/redoc",
@@ -27,76 +36,13 @@ SKIP_PATHS = [
 ]
 
 
-def mask_sensitive_data(data: dict) -> str:
-    """個人情報をマスクしてJSON文字列で返す"""
-    if not data:
-        return ""
-    masked = {}
-    for key, value in data.items():
-        if any(field in key.lower() for field in SENSITIVE_FIELDS):
-            masked[key] = "***MASKED***"
-        elif isinstance(value, str) and len(value) > 200:
-            masked[key] = value[:50] + "...(truncated)"
-        else:
-            masked[key] = value
-    try:
-        return json.dumps(masked, ensure_ascii=False, default=str)[:1000]
-    except Exception:
-        return "(parse error)"
-
-
-def classify_action(method: str, path: str) -> tuple[str, str, str]:
-    """
-    リクエストからaction_type, resource_type, resource_idを推定する。
-    戻り値: (action_type, resource_type, resource_id)
-    """
-    # ログイン/ログアウト
-    if "login" in path or "auth/signin" in path:
-        return ("login", "system", "")
-    if "logout" in path or "auth/signout" in path:
-        return ("logout", "system", "")
-
-    # リソースタイプ判定
-    resource_type = ""
-    resource_id = ""
-    
-    resource_map = {
-        "/casts": "cast",
-        "/job-seekers": "cast",
-        "/shops": "shop",
-        "/stores": "shop",
-        "/scouts": "scout",
-        "/interviews": "interview",
-        "/salary": "salary",
-        "/links": "link",
-        "/access-logs": "system",
-        "/concierge": "ai",
-    }
-    
-    for pattern, rtype in resource_map.items():
-        if pattern in path:
-            resource_type = rtype
-            # /casts/123 → resource_id = "123"
-            id_match = re.search(rf"{pattern}/(\d+)", path)
-            if id_match:
-                resource_id = id_match.group(1)
-            break
-
-    # アクションタイプ判定
-    method_action_map = {
-        "GET": "view",
-        "POST": "create",
-        "PUT": "update",
-        "PATCH": "update",
-        "DELETE": "delete",
-    }
-    action_type = method_action_map.get(method.upper(), "view")
-    
-    # エクスポート検出
-    if "export" in path or "download" in path or "csv" in path:
-        action_type = "export"
-
-    return (action_type, resource_type, resource_id)
+# キー名判定は正規表現1本にまとめてプロセス起動時にコンパイル
+redactor = Redactor(SENSITIVE_FIELDS)
+
+
+def mask_sensitive_data(data) -> str:
+    """個人情報をマスクしてJSON文字列で返す（ネスト対応・最大1000文字）"""
+    return redactor.redact(data)
 
 
 def get_client_ip(request: Request) -> str:
@@ -112,86 +58,160 @@ def get_client_ip(request: Request) -> str:
     return "unknown"
 
 
-class AccessLogMiddleware(BaseHTTPMiddleware):
-    """全リクエストを記録するMiddleware"""
-
-    def __init__(self, app, supabase_client: Client):
-        super().__init__(app)
+class BodyPrefixTee:
+    """receiveを素通ししつつ、先頭limitバイトだけ控えておく（バッファリングしない）"""
+
+    def __init__(self, receive: Receive, limit: int):
+        self._receive = receive
+        self.limit = limit
+        self.prefix = bytearray()
+        self.overflow = False
+        self.complete = False
+
+    async def __call__(self) -> Message:
+        message = await self._receive()
+        if message["type"] == "http.request":
+            chunk = message.get("body", b"")
+            if not self.overflow:
+                room = self.limit - len(self.prefix)
+                if len(chunk) > room:
+                    self.overflow = True
+                    self.prefix.clear()
+                else:
+                    self.prefix += chunk
+            if not message.get("more_body", False):
+                self.complete = True
+        return message
+
+    def summary(self) -> str:
+        if self.overflow:
+            return "(too large)"
+        if not self.complete or not self.prefix:
+            return ""
+        try:
+            return mask_sensitive_data(json.loads(self.prefix))
+        except Exception:
+            return "(unreadable)"
+
+
+class AccessLogMiddleware:
+    """全リクエストを記録するMiddleware（pure ASGI）"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        supabase_client: Client,
+        writer: Optional[AccessLogWriter] = None,
+        identity_resolver: Optional[IdentityResolver] = None,
+        classifier: Optional[RouteActionClassifier] = None,
+        policy: Optional[AccessLogPolicy] = None,
+        body_inspect_limit: int = 16384,
+        daily_stats: Optional[DailyStatsAccumulator] = None,
+        abuse_monitor: Optional[AbuseMonitor] = None,
+        broadcaster: Optional[LogBroadcaster] = None,
+    ):
+        self.app = app
         self.supabase = supabase_client
+        self.writer = writer or AccessLogWriter(supabase_client)
+        self.identity = identity_resolver or IdentityResolver(supabase_client)
+        self.classifier = classifier or RouteActionClassifier()
+        self.policy = policy or AccessLogPolicy({})
+        self.body_inspect_limit = body_inspect_limit
+        self.daily_stats = daily_stats
+        self.abuse = abuse_monitor
+        self.broadcaster = broadcaster
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next) -> Response:
         # スキップ対象パス
-        if any(request.url.path.startswith(skip) for skip in SKIP_PATHS):
-            return await call_next(request)
+        path = scope["path"]
+        if any(path.startswith(skip) for skip in SKIP_PATHS):
+            await self.app(scope, receive, send)
+            return
 
         start_time = time.time()
         error_message = ""
         response_status = 500  # デフォルト（エラー想定）
-
-        # リクエストボディの読み取り（POST/PUT/PATCHのみ）
-        body_summary = ""
-        if request.method in ("POST", "PUT", "PATCH"):
-            try:
-                body = await request.body()
-                if body:
-                    body_data = json.loads(body)
-                    body_summary = mask_sensitive_data(body_data)
-                # bodyを再読み取り可能にする
-                request._body = body
-            except Exception:
-                body_summary = "(unreadable)"
-
+        request = Request(scope)
+        method = request.method
+
+        # リクエストボディの先頭だけ覗く（POST/PUT/PATCHかつJSONのみ。アップロードは素通し）
+        tee = None
+        if method in ("POST", "PUT", "PATCH"):
+            content_type = request.headers.get("content-type", "")
+            if "json" in content_type:
+                tee = BodyPrefixTee(receive, self.body_inspect_limit)
+                receive = tee
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_status
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+            await send(message)
+
+        metrics.in_flight += 1
         try:
-            response = await call_next(request)
-            response_status = response.status_code
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
             error_message = str(e)[:500]
             raise
         finally:
+            metrics.in_flight -= 1
+
             # レスポンス時間計算
-            elapsed_ms = int((time.time() - start_time) * 1000)
+            elapsed = time.time() - start_time
+            elapsed_ms = int(elapsed * 1000)
 
-            # アクション分類
-            action_type, resource_type, resource_id = classify_action(
-                request.method, request.url.path
-            )
+            # アクション分類（ルーティング後のscopeからルートテンプレート単位で判定）
+            action_type, resource_type, resource_id = self.classifier.classify(scope)
 
             # エラー判定
             if response_status >= 400:
                 action_type = "error" if response_status >= 500 else action_type
 
-            # ユーザー情報取得（Supabase Auth JWTから）
-            user_id = None
-            user_email = ""
-            user_role = "unknown"
+            # ユーザー情報取得（Supabase Auth JWTをローカル検証。結果はキャッシュ）
+            user_id, user_email, user_role = ANONYMOUS
             
             auth_header = request.headers.get("authorization", "")
             if auth_header.startswith("Bearer "):
-                try:
-                    token = auth_header.replace("Bearer ", "")
-                    user_resp = self.supabase.auth.get_user(token)
-                    if user_resp and user_resp.user:
-                        user_id = str(user_resp.user.id)
-                        user_email = user_resp.user.email or ""
-                        user_role = (
-                            user_resp.user.user_metadata.get("role", "scout")
-                            if user_resp.user.user_metadata
-                            else "scout"
-                        )
-                except Exception:
-                    pass  # トークン無効でもログは記録
-
-            # ログ書き込み（非同期でDBに書き込み。失敗してもリクエスト処理は止めない）
-            try:
-                self.supabase.table("admin_access_logs").insert({
+                token = auth_header.replace("Bearer ", "")
+                user_id, user_email, user_role = await self.identity.resolve(token)
+
+            # 認証失敗IP・DELETE多発ユーザーのスライディングウィンドウ集計（/suspicious）
+            ip_address = get_client_ip(request)
+            if self.abuse is not None:
+                self.abuse.observe(method, path, response_status, ip_address, user_id, user_email)
+
+            # ルート単位のレイテンシヒストグラム（/metrics）
+            route = scope.get("route")
+            metrics.observe_request(
+                route.path if route is not None else UNMATCHED_ROUTE,
+                method,
+                response_status,
+                elapsed,
+            )
+
+            # 記録ポリシー判定（公開LP等の匿名アクセスはサンプリング/集計のみ）
+            route_template = route.path if route is not None else path
+            decision = self.policy.decide(
+                method, route_template, response_status, elapsed_ms, user_id
+            )
+
+            # ログ書き込み（キューに積むだけ。DBへはバックグラウンドで一括INSERT）
+            if decision != SKIP:
+                query_string = scope.get("query_string", b"").decode("latin-1")
+                row = {
                     "user_id": user_id,
                     "user_email": user_email,
                     "user_role": user_role,
-                    "request_method": request.method,
-                    "request_path": str(request.url.path),
-                    "request_query": str(request.url.query) if request.url.query else "",
-                    "request_body_summary": body_summary,
-                    "ip_address": get_client_ip(request),
+                    "request_method": method,
+                    "request_path": path,
+                    "request_query": query_string,
+                    "request_body_summary": tee.summary() if tee else "",
+                    "ip_address": ip_address,
                     "user_agent": request.headers.get("user-agent", "")[:500],
                     "referer": request.headers.get("referer", "")[:500],
                     "response_status": response_status,
@@ -201,9 +221,9 @@ class AccessLogMiddleware(BaseHTTPMiddleware):
                     "resource_type": resource_type,
                     "resource_id": resource_id,
                     "session_id": request.cookies.get("session_id", ""),
-                }).execute()
-            except Exception as log_error:
-                # ログ書き込み失敗はprintのみ。リクエスト処理は止めない
-                print(f"[AccessLog] Failed to write log: {log_error}")
-
-        return response
+                }
+                self.writer.enqueue(row)
+                if self.daily_stats is not None:
+                    self.daily_stats.record(row)
+                if self.broadcaster is not None:
+                    self.broadcaster.publish(row)
@@ -0,0 +1,121 @@
+"""
+アクセスログのアクション分類
+FastAPIのルートテンプレート（例: /api/master/tracking/links/{link_id}/force-toggle）から
+action_type / resource_typeを起動時に1回だけ計算し、ルート単位でキャッシュする。
+"""
+from typing import Iterable, Optional
+from starlette.types import Scope
+
+# パスの固定セグメント → resource_type（右側のセグメントほど優先）
+RESOURCE_SEGMENTS = {
+    "casts": "cast",
+    "job-seekers": "cast",
+    "shops": "shop",
+    "stores": "shop",
+    "job-postings": "shop",
+    "scouts": "scout",
+    "interviews": "interview",
+    "salary": "salary",
+    "commission": "salary",
+    "links": "link",
+    "r": "link",
+    "lp": "link",
+    "tracking": "link",
+    "conversions": "conversion",
+    "access-logs": "system",
+    "concierge": "ai",
+    "analyze-face": "ai",
+    "ai-matching": "ai",
+    "cast-parser": "ai",
+}
+
+LOGIN_SEGMENTS = {"login", "signin"}
+LOGOUT_SEGMENTS = {"logout", "signout"}
+EXPORT_MARKERS = ("export", "download", "csv")
+
+METHOD_ACTIONS = {
+    "GET": "view",
+    "POST": "create",
+    "PUT": "update",
+    "PATCH": "update",
+    "DELETE": "delete",
+}
+
+
+def classify_route(method: str, template: str) -> tuple[str, str, Optional[str]]:
+    """
+    ルートテンプレートからaction_type, resource_type, resource_idに使うパスパラメータ名を決める。
+    戻り値: (action_type, resource_type, id_param)
+    """
+    segments = [seg for seg in template.strip("/").split("/") if seg]
+    static = [seg for seg in segments if not seg.startswith("{")]
+    params = [seg[1:-1].split(":")[0] for seg in segments if seg.startswith("{")]
+
+    resource_type = ""
+    for seg in reversed(static):
+        if seg in RESOURCE_SEGMENTS:
+            resource_type = RESOURCE_SEGMENTS[seg]
+            break
+
+    # ログイン/ログアウト
+    if any(seg in LOGIN_SEGMENTS for seg in static):
+        return ("login", "system", None)
+    if any(seg in LOGOUT_SEGMENTS for seg in static):
+        return ("logout", "system", None)
+
+    action_type = METHOD_ACTIONS.get(method.upper(), "view")
+
+    # エクスポート検出
+    if any(marker in seg for seg in static for marker in EXPORT_MARKERS):
+        action_type = "export"
+
+    # /links/{link_id}/force-toggle → link_id
+    id_param = params[-1] if params else None
+    return (action_type, resource_type, id_param)
+
+
+class RouteActionClassifier:
+    """(ルートテンプレート, メソッド) → 分類結果のキャッシュ"""
+
+    def __init__(self):
+        self._cache: dict[tuple[str, str], tuple[str, str, Optional[str]]] = {}
+
+    def warm(self, routes: Iterable) -> None:
+        """起動時に全ルートの分類を計算しておく"""
+        for route in routes:
+            template = getattr(route, "path", None)
+            methods = getattr(route, "methods", None)
+            if template is None or not methods:
+                continue
+            for method in methods:
+                self._cache[(template, method)] = classify_route(method, template)
+
+    def classify(self, scope: Scope) -> tuple[str, str, str]:
+        """
+        ルーティング後のscopeから分類する。
+        戻り値: (action_type, resource_type, resource_id)
+        """
+        method = scope["method"]
+        route = scope.get("route")
+        if route is None:
+            # ルート未一致（404等）はパスをそのまま分類
+            return self._classify_unmatched(method, scope["path"])
+
+        key = (route.path, method)
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = self._cache[key] = classify_route(method, route.path)
+
+        action_type, resource_type, id_param = cached
+        resource_id = ""
+        if id_param:
+            resource_id = str(scope.get("path_params", {}).get(id_param, ""))
+        return (action_type, resource_type, resource_id)
+
+    @staticmethod
+    def _classify_unmatched(method: str, path: str) -> tuple[str, str, str]:
+        segments = path.strip("/").split("/")
+        template = "/".join("{id}" if seg.isdigit() else seg for seg in segments)
+        action_type, resource_type, _ = classify_route(method, template)
+        resource_id = next((seg for seg in reversed(segments) if seg.isdigit()), "")
+        return (action_type, resource_type, resource_id)
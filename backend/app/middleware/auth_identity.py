@@ -0,0 +1,165 @@
+"""
+アクセスログ用のユーザー識別
+Supabase Auth JWTをローカル検証し、結果をトークンハッシュ単位でキャッシュする。
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+import jwt
+from starlette.concurrency import run_in_threadpool
+from supabase import Client
+
+# (user_id, user_email, user_role)
+Identity = tuple[Optional[str], str, str]
+
+ANONYMOUS: Identity = (None, "", "unknown")
+
+
+class IdentityResolver:
+    """Bearerトークン → ユーザー情報（ローカルJWT検証＋TTL/LRUキャッシュ）"""
+
+    def __init__(
+        self,
+        supabase_client: Client,
+        jwt_secret: str = "",
+        jwks_url: str = "",
+        audience: str = "authenticated",
+        cache_size: int = 10000,
+        cache_ttl: int = 300,
+        remote_fallback: bool = True,
+    ):
+        self.supabase = supabase_client
+        self.jwt_secret = jwt_secret
+        self.jwks_client = jwt.PyJWKClient(jwks_url) if jwks_url else None
+        self.audience = audience
+        self.cache_size = max(1, cache_size)
+        self.cache_ttl = cache_ttl
+        self.remote_fallback = remote_fallback
+
+        # token hash → (有効期限(epoch秒), Identity)
+        self._cache: OrderedDict[bytes, tuple[float, Identity]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.remote_calls = 0
+
+    @property
+    def local_enabled(self) -> bool:
+        return bool(self.jwt_secret or self.jwks_client)
+
+    async def resolve(self, token: str) -> Identity:
+        """トークンからユーザー情報を取得（無効なトークンはANONYMOUS）"""
+        key = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+
+        cached = self._cache.get(key)
+        if cached and cached[0] > now:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+
+        identity, expires_at = ANONYMOUS, now + self.cache_ttl
+        verified = False
+        if self.local_enabled:
+            try:
+                if self.jwks_client:
+                    # 公開鍵の取得（初回・kid不明時のみ）がネットワーク越しになるためスレッドで実行
+                    claims = await run_in_threadpool(self._decode, token)
+                else:
+                    claims = self._decode(token)
+                identity = _identity_from_claims(claims)
+                if claims.get("exp"):
+                    expires_at = min(expires_at, float(claims["exp"]))
+                verified = True
+            except (jwt.InvalidSignatureError, jwt.ExpiredSignatureError):
+                verified = True  # 署名不正・期限切れ。リモートに問い合わせても結果は同じ
+            except (jwt.PyJWKClientError, jwt.InvalidTokenError):
+                # 鍵が取得できない・アルゴリズムや鍵の種類が合わない（HS256のシークレットだけ設定していて
+                # トークンがES256/RS256の場合など）はローカルでは判定できないのでリモート確認にフォールバック
+                pass
+
+        if not verified and self.remote_fallback:
+            identity = await run_in_threadpool(self._get_user_remote, token)
+            # リモートで確認した結果もトークンの有効期限を超えてはキャッシュしない
+            exp = _unverified_exp(token)
+            if exp is not None:
+                expires_at = min(expires_at, exp)
+
+        self._store(key, identity, expires_at)
+        return identity
+
+    def _decode(self, token: str) -> dict:
+        if self.jwks_client:
+            signing_key = self.jwks_client.get_signing_key_from_jwt(token)
+            return jwt.decode(
+                token,
+                signing_key.key,
+                algorithms=["RS256", "ES256"],
+                audience=self.audience,
+            )
+        return jwt.decode(
+            token,
+            self.jwt_secret,
+            algorithms=["HS256"],
+            audience=self.audience,
+        )
+
+    def _get_user_remote(self, token: str) -> Identity:
+        """Supabase Authへの問い合わせ（ローカル検証できない場合のみ）"""
+        self.remote_calls += 1
+        try:
+            user_resp = self.supabase.auth.get_user(token)
+            if user_resp and user_resp.user:
+                return (
+                    str(user_resp.user.id),
+                    user_resp.user.email or "",
+                    (
+                        user_resp.user.user_metadata.get("role", "scout")
+                        if user_resp.user.user_metadata
+                        else "scout"
+                    ),
+                )
+        except Exception:
+            pass  # トークン無効でもログは記録
+        return ANONYMOUS
+
+    def _store(self, key: bytes, identity: Identity, expires_at: float) -> None:
+        if expires_at <= time.time():
+            return
+        self._cache[key] = (expires_at, identity)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> dict:
+        """キャッシュのカウンター"""
+        return {
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "remote_calls": self.remote_calls,
+            "local_verification": self.local_enabled,
+        }
+
+
+def _unverified_exp(token: str) -> Optional[float]:
+    """署名を検証せずにexpを読む（キャッシュの有効期限の上限にだけ使う）"""
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+        return float(exp) if exp is not None else None
+    except (jwt.InvalidTokenError, TypeError, ValueError):
+        return None
+
+
+def _identity_from_claims(claims: dict) -> Identity:
+    user_id = claims.get("sub")
+    if not user_id:
+        return ANONYMOUS
+    user_metadata = claims.get("user_metadata") or {}
+    return (
+        str(user_id),
+        claims.get("email") or "",
+        user_metadata.get("role", "scout"),
+    )
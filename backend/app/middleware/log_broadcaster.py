@@ -0,0 +1,118 @@
+"""
+アクセスログのライブ配信（SSE用ファンアウト）
+Middlewareが記録した行をDBを経由せずに購読者へ配る。
+購読者ごとに上限付きバッファを持ち、読み出しが追いつかない購読者は古い行から捨てる
+（他の購読者やリクエスト処理を待たせない）。
+"""
+import asyncio
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+# 配信する項目（/realtime と同じ + resource_type）
+STREAM_FIELDS = (
+    "user_email", "request_method", "request_path", "response_status", "response_time_ms",
+    "ip_address", "action_type", "resource_type", "resource_id",
+)
+
+
+class LogFilter:
+    """購読時の絞り込み条件"""
+
+    def __init__(
+        self,
+        status_class: Optional[str] = None,
+        action_type: Optional[str] = None,
+        resource_type: Optional[str] = None,
+        user_email: Optional[str] = None,
+    ):
+        # "4xx" → 4
+        self.status_class = int(status_class[0]) if status_class else None
+        self.action_type = action_type
+        self.resource_type = resource_type
+        self.user_email = user_email.lower() if user_email else None
+
+    def matches(self, row: dict) -> bool:
+        if self.status_class is not None and row["response_status"] // 100 != self.status_class:
+            return False
+        if self.action_type and row["action_type"] != self.action_type:
+            return False
+        if self.resource_type and row["resource_type"] != self.resource_type:
+            return False
+        if self.user_email and self.user_email not in (row["user_email"] or "").lower():
+            return False
+        return True
+
+
+class Subscription:
+    """1購読者分のバッファ"""
+
+    def __init__(self, log_filter: LogFilter, buffer_size: int):
+        self.filter = log_filter
+        self.buffer: deque = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def push(self, event: dict) -> None:
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(event)
+        self._ready.set()
+
+    async def get(self, timeout: float) -> list[dict]:
+        """溜まっている行をまとめて返す（timeout秒来なければ空リスト）"""
+        if not self.buffer:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        events = list(self.buffer)
+        self.buffer.clear()
+        return events
+
+
+class LogBroadcaster:
+    """記録行を全購読者へ配る（イベントループから呼ぶ）"""
+
+    def __init__(self, buffer_size: int = 256, max_subscribers: int = 50):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: set[Subscription] = set()
+        self._sequence = 0
+        self.published = 0
+
+    def subscribe(self, log_filter: LogFilter) -> Optional[Subscription]:
+        """上限に達していればNone"""
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        subscription = Subscription(log_filter, self.buffer_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def publish(self, row: dict) -> None:
+        if not self._subscribers:
+            return
+        self._sequence += 1
+        self.published += 1
+        event = None
+        for subscription in self._subscribers:
+            if not subscription.filter.matches(row):
+                continue
+            if event is None:
+                event = {
+                    **{field: row.get(field) for field in STREAM_FIELDS},
+                    "stream_id": self._sequence,
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                }
+            subscription.push(event)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": sum(s.dropped for s in self._subscribers),
+        }
@@ -0,0 +1,171 @@
+"""
+アクセスログの記録ポリシー
+ルートテンプレート＋メソッド単位で「全件記録 / サンプリング / 集計のみ」を切り替える。
+書き込み系（GET/HEAD以外）・エラー・ログイン済みユーザー（管理者含む）のリクエストは常に全件記録する。
+書き込み系の例外は READ_LIKE_WRITES に列挙したルートのみ（ポリシーで指定しても他の書き込みは記録する）。
+集計対象のルートは分単位の件数とレスポンス時間合計をメモリに持ち、サマリー行として書き出す
+（分が確定したら、次のリクエストを待たずにタイマーで書き出す）。
+"""
+import asyncio
+import random
+import time
+from typing import Optional
+from app.middleware.log_writer import AccessLogWriter
+
+MODE_ALWAYS = "always"
+MODE_SAMPLE = "sample"
+MODE_AGGREGATE = "aggregate"
+
+# 判定結果
+LOG = "log"
+SKIP = "skip"
+
+READ_METHODS = ("GET", "HEAD")
+
+# 書き込みメソッドだがポリシー（サンプリング/集計）の対象にできるルート
+# - POST /api/r/{unique_code}: 短縮URLのクリック計測。クリックごとにlink_clicksへ記録済みで、
+#   リクエスト自体は匿名の公開アクセス（読み取り相当）のため
+READ_LIKE_WRITES = frozenset({
+    ("POST", "/api/r/{unique_code}"),
+})
+
+
+def parse_policy(spec: str) -> dict[tuple[str, str], tuple[str, float]]:
+    """
+    "POST /api/r/{unique_code}=aggregate,GET /api/lp/data/{unique_code}=sample:0.05"
+    → {("POST", "/api/r/{unique_code}"): ("aggregate", 0.0), ...}
+    """
+    rules = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        target, _, mode = item.rpartition("=")
+        method, _, template = target.strip().partition(" ")
+        mode, _, rate = mode.strip().partition(":")
+        if mode not in (MODE_ALWAYS, MODE_SAMPLE, MODE_AGGREGATE):
+            raise ValueError(f"Unknown access log policy mode: {mode}")
+        rules[(method.upper(), template.strip())] = (mode, float(rate) if rate else 0.0)
+    return rules
+
+
+class AccessLogPolicy:
+    """ルート単位の記録ポリシー＋分単位集計"""
+
+    def __init__(
+        self,
+        rules: dict[tuple[str, str], tuple[str, float]],
+        aggregate_writer: Optional[AccessLogWriter] = None,
+    ):
+        self.rules = rules
+        self.aggregate_writer = aggregate_writer
+
+        # (分, メソッド, ルート, ステータス) → [件数, レスポンス時間合計, 最大]
+        self._buckets: dict[tuple[int, str, str, int], list[int]] = {}
+        self._current_minute = 0
+        self._task: Optional[asyncio.Task] = None
+
+        self.sampled_out = 0
+        self.aggregated = 0
+
+    def decide(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        elapsed_ms: int,
+        user_id: Optional[str],
+    ) -> str:
+        """1リクエスト分を判定し、集計対象なら集計に加える。戻り値: LOG | SKIP"""
+        if method not in READ_METHODS and (method, route) not in READ_LIKE_WRITES:
+            return LOG
+        rule = self.rules.get((method, route))
+        if rule is None:
+            return LOG
+
+        mode, rate = rule
+        # エラー・ログイン済みユーザー（管理者操作含む）は常に記録
+        if mode == MODE_ALWAYS or status >= 400 or user_id:
+            return LOG
+
+        # 集計は件数を正確に保つため、サンプリング対象でも必ず加算する
+        self._add(method, route, status, elapsed_ms)
+
+        if mode == MODE_SAMPLE and random.random() < rate:
+            return LOG
+        self.sampled_out += 1
+        return SKIP
+
+    def _add(self, method: str, route: str, status: int, elapsed_ms: int) -> None:
+        minute = int(time.time() // 60)
+        if minute != self._current_minute:
+            self.flush(before_minute=minute)
+            self._current_minute = minute
+
+        bucket = self._buckets.get((minute, method, route, status))
+        if bucket is None:
+            self._buckets[(minute, method, route, status)] = [1, elapsed_ms, elapsed_ms]
+        else:
+            bucket[0] += 1
+            bucket[1] += elapsed_ms
+            if elapsed_ms > bucket[2]:
+                bucket[2] = elapsed_ms
+        self.aggregated += 1
+
+    def flush(self, before_minute: Optional[int] = None) -> None:
+        """確定した分（before_minute未満。Noneなら全て）のサマリー行を書き出しキューへ"""
+        if not self._buckets:
+            return
+        closed = [
+            key for key in self._buckets
+            if before_minute is None or key[0] < before_minute
+        ]
+        for key in closed:
+            minute, method, route, status = key
+            count, total_ms, max_ms = self._buckets.pop(key)
+            if self.aggregate_writer is None:
+                continue
+            self.aggregate_writer.enqueue({
+                "bucket_start": time.strftime("%Y-%m-%dT%H:%M:00Z", time.gmtime(minute * 60)),
+                "request_method": method,
+                "route_template": route,
+                "response_status": status,
+                "request_count": count,
+                "total_response_time_ms": total_ms,
+                "max_response_time_ms": max_ms,
+            })
+
+    # ─────────────────────────────
+    # 確定した分の定期書き出し
+    # ─────────────────────────────
+
+    def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """タイマーを止め、未確定の分も含めて全て書き出す"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            # 分の境目の少し後に、前の分までを書き出す
+            await asyncio.sleep(60 - time.time() % 60 + 1)
+            self.flush(before_minute=int(time.time() // 60))
+
+    def stats(self) -> dict:
+        """ポリシーのカウンター"""
+        return {
+            "rules": {f"{method} {route}": mode for (method, route), (mode, _) in self.rules.items()},
+            "aggregated": self.aggregated,
+            "sampled_out": self.sampled_out,
+            "open_buckets": len(self._buckets),
+        }
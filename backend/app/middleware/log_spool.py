@@ -0,0 +1,160 @@
+"""
+アクセスログのローカルスプール
+Supabaseに書き込めなかった行を追記専用のセグメントファイルに退避し、
+復旧後にバッチで再投入する（at-least-once）。
+
+セグメント形式: 1行1レコード "<crc32 8桁hex> <JSON>\\n"
+再投入済みの行数は "<segment>.ack" に記録し、途中失敗時はその続きから再開する。
+"""
+import json
+import os
+import threading
+import zlib
+from typing import Callable, Iterator
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".log"
+ACK_SUFFIX = ".ack"
+
+
+def encode_record(row: dict) -> bytes:
+    payload = json.dumps(row, ensure_ascii=False, default=str).encode("utf-8")
+    return b"%08x " % zlib.crc32(payload) + payload + b"\n"
+
+
+def decode_record(line: bytes) -> dict:
+    """チェックサムを検証してレコードを復元する（不一致はValueError）"""
+    checksum, _, payload = line.rstrip(b"\n").partition(b" ")
+    if len(checksum) != 8 or int(checksum, 16) != zlib.crc32(payload):
+        raise ValueError("checksum mismatch")
+    return json.loads(payload)
+
+
+class AccessLogSpool:
+    """サイズでローテーションする追記専用セグメントファイル群"""
+
+    def __init__(self, directory: str, segment_max_bytes: int = 4 * 1024 * 1024):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._active = None
+        existing = self._segments()
+        self._seq = self._seq_of(existing[-1]) if existing else 0
+        self._pending = bool(existing)
+
+        # カウンター
+        self.spooled = 0
+        self.replayed = 0
+        self.corrupt = 0
+
+    @property
+    def has_pending(self) -> bool:
+        return self._pending
+
+    def append(self, rows: list[dict]) -> None:
+        """行をアクティブセグメントに追記してfsyncする"""
+        if not rows:
+            return
+        data = b"".join(encode_record(row) for row in rows)
+        with self._lock:
+            if self._active is None or self._active.tell() >= self.segment_max_bytes:
+                self._rotate()
+            self._active.write(data)
+            self._active.flush()
+            os.fsync(self._active.fileno())
+            self._pending = True
+            self.spooled += len(rows)
+
+    def replay(self, insert: Callable[[list[dict]], None], batch_size: int = 500) -> int:
+        """
+        古いセグメントから順にinsertへ渡す。
+        insertが例外を投げたらその時点で中断し、例外をそのまま返す（次回続きから再開）。
+        戻り値: 今回再投入した行数
+        """
+        with self._lock:
+            self._seal()
+            segments = self._segments()
+
+            count = 0
+            for path in segments:
+                acked = self._read_ack(path)
+                rows = list(self._read(path))
+                for start in range(acked, len(rows), batch_size):
+                    batch = rows[start:start + batch_size]
+                    insert(batch)
+                    acked = start + len(batch)
+                    self._write_ack(path, acked)
+                    count += len(batch)
+                    self.replayed += len(batch)
+                os.remove(path)
+                if os.path.exists(path + ACK_SUFFIX):
+                    os.remove(path + ACK_SUFFIX)
+
+            self._pending = False
+            return count
+
+    def close(self) -> None:
+        with self._lock:
+            self._seal()
+
+    # ─────────────────────────────
+    # 内部処理
+    # ─────────────────────────────
+
+    def _segments(self) -> list[str]:
+        names = sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+        return [os.path.join(self.directory, name) for name in names]
+
+    @staticmethod
+    def _seq_of(path: str) -> int:
+        name = os.path.basename(path)
+        return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+    def _rotate(self) -> None:
+        self._seal()
+        self._seq += 1
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{self._seq:010d}{SEGMENT_SUFFIX}")
+        self._active = open(path, "ab")
+
+    def _seal(self) -> None:
+        if self._active is not None:
+            self._active.close()
+            self._active = None
+
+    def _read(self, path: str) -> Iterator[dict]:
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    yield decode_record(line)
+                except ValueError:
+                    # 書き込み途中で落ちた末尾行など。チェックサム不一致は捨てる
+                    self.corrupt += 1
+
+    @staticmethod
+    def _read_ack(path: str) -> int:
+        try:
+            with open(path + ACK_SUFFIX, "r") as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    @staticmethod
+    def _write_ack(path: str, acked: int) -> None:
+        tmp = path + ACK_SUFFIX + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(str(acked))
+        os.replace(tmp, path + ACK_SUFFIX)
+
+    def stats(self) -> dict:
+        """スプールのカウンター"""
+        return {
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "corrupt": self.corrupt,
+            "pending_segments": len(self._segments()),
+        }
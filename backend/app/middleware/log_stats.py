@@ -0,0 +1,177 @@
+"""
+アクセスログの日別統計（インクリメンタル集計）
+ログ行を記録するたびにメモリ上の日別カウンターへ加算し、定期的に
+access_log_daily_statsへマージする（RPC: merge_access_log_daily_stats）。
+ユニークユーザー数・ユニークIP数はHyperLogLogスケッチで持ち、DB側でレジスタ単位にマージする。
+"""
+import asyncio
+import base64
+import hashlib
+import math
+from datetime import datetime, timezone
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from supabase import Client
+
+HLL_PRECISION = 10  # 2^10 = 1024レジスタ（標準誤差 約3.3%）
+
+# action_type → カウンター列
+ACTION_COUNTERS = {
+    "login": "login_count",
+    "create": "create_count",
+    "update": "update_count",
+    "delete": "delete_count",
+    "export": "export_count",
+}
+
+
+class HyperLogLog:
+    """マージ可能なユニーク数スケッチ"""
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[bytearray] = None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = registers if registers is not None else bytearray(self.size)
+
+    def add(self, value: str) -> None:
+        h = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        index = h >> (64 - self.precision)
+        rest = (h << self.precision) & 0xFFFFFFFFFFFFFFFF
+        rank = min(64 - self.precision, 64 - rest.bit_length()) + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        for i, value in enumerate(other.registers):
+            if value > self.registers[i]:
+                self.registers[i] = value
+
+    def estimate(self) -> int:
+        m = self.size
+        total = sum(2.0 ** -r for r in self.registers)
+        estimate = (0.7213 / (1 + 1.079 / m)) * m * m / total
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # 少数時は線形カウント
+        return int(round(estimate))
+
+    def to_base64(self) -> str:
+        return base64.b64encode(bytes(self.registers)).decode()
+
+
+class DayStats:
+    """1日分の差分"""
+
+    def __init__(self):
+        self.counters = {
+            "total_requests": 0,
+            "error_count": 0,
+            "response_time_sum_ms": 0,
+            **{column: 0 for column in ACTION_COUNTERS.values()},
+        }
+        self.users = HyperLogLog()
+        self.ips = HyperLogLog()
+
+    def merge(self, other: "DayStats") -> None:
+        for column, value in other.counters.items():
+            self.counters[column] += value
+        self.users.merge(other.users)
+        self.ips.merge(other.ips)
+
+
+class DailyStatsAccumulator:
+    """日別統計の差分をメモリに溜め、定期的にDBへマージする"""
+
+    def __init__(self, supabase_client: Client, flush_interval: float = 30.0):
+        self.supabase = supabase_client
+        self.flush_interval = flush_interval
+        self._days: dict[str, DayStats] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._wake: Optional[asyncio.Event] = None
+
+        self.flushed_days = 0
+        self.failed_flushes = 0
+
+    def record(self, row: dict) -> None:
+        """ログ1行分を加算する（イベントループから呼ぶ）"""
+        log_date = datetime.now(timezone.utc).date().isoformat()
+        day = self._days.get(log_date)
+        if day is None:
+            day = self._days[log_date] = DayStats()
+
+        counters = day.counters
+        counters["total_requests"] += 1
+        counters["response_time_sum_ms"] += row.get("response_time_ms") or 0
+        if (row.get("response_status") or 0) >= 400:
+            counters["error_count"] += 1
+        column = ACTION_COUNTERS.get(row.get("action_type", ""))
+        if column:
+            counters[column] += 1
+        if row.get("user_id"):
+            day.users.add(str(row["user_id"]))
+        if row.get("ip_address"):
+            day.ips.add(row["ip_address"])
+
+    # ─────────────────────────────
+    # DBへのマージ
+    # ─────────────────────────────
+
+    def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._closing = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """実行中のマージは中断せず完了を待ち、残りを書き出す"""
+        self._closing = True
+        if self._task:
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """溜まった差分をaccess_log_daily_statsへマージする（失敗した日は次回に持ち越し）"""
+        pending, self._days = self._days, {}
+        for log_date, day in pending.items():
+            try:
+                await run_in_threadpool(self._merge, log_date, day)
+                self.flushed_days += 1
+            except Exception as stats_error:
+                self.failed_flushes += 1
+                print(f"[AccessLogStats] Failed to merge {log_date}: {stats_error}")
+                current = self._days.get(log_date)
+                if current is None:
+                    self._days[log_date] = day
+                else:
+                    current.merge(day)
+
+    def _merge(self, log_date: str, day: DayStats) -> None:
+        params = {f"p_{column}": value for column, value in day.counters.items()}
+        params.update({
+            "p_log_date": log_date,
+            "p_users_hll": day.users.to_base64(),
+            "p_ips_hll": day.ips.to_base64(),
+        })
+        self.supabase.rpc("merge_access_log_daily_stats", params).execute()
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._closing:
+                break
+            await self.flush()
+
+    def stats(self) -> dict:
+        """集計のカウンター"""
+        return {
+            "pending_days": len(self._days),
+            "flushed_days": self.flushed_days,
+            "failed_flushes": self.failed_flushes,
+        }
@@ -0,0 +1,181 @@
+"""
+アクセスログ書き込みキュー
+リクエスト処理から切り離し、バックグラウンドでadmin_access_logsへ一括INSERTする。
+INSERTに失敗した行はスプール（ローカルディスク）に退避し、復旧後に再投入する。
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from supabase import Client
+from app.middleware.log_spool import AccessLogSpool
+
+# キュー満杯時の挙動
+#   drop_oldest: 最も古い行を捨てて新しい行を積む
+#   drop_newest: 新しい行を捨てる
+DROP_POLICIES = ("drop_oldest", "drop_newest")
+
+
+class AccessLogWriter:
+    """上限付きメモリキュー＋バックグラウンドflusher"""
+
+    def __init__(
+        self,
+        supabase_client: Client,
+        table: str = "admin_access_logs",
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+        drop_policy: str = "drop_oldest",
+        spool: Optional[AccessLogSpool] = None,
+        replay_interval: float = 10.0,
+    ):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy must be one of {DROP_POLICIES}")
+        self.supabase = supabase_client
+        self.table = table
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_queue = max(1, max_queue)
+        self.drop_policy = drop_policy
+        self.spool = spool
+        self.replay_interval = replay_interval
+        self._last_replay = 0.0
+
+        self._buffer: deque = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        # カウンター
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.spooled = 0
+
+    # ─────────────────────────────
+    # ライフサイクル
+    # ─────────────────────────────
+
+    def start(self) -> None:
+        """flusherタスクを起動（起動済みなら何もしない）"""
+        if self._task and not self._task.done():
+            return
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """flusherを止め、キューに残った行を全て書き出す"""
+        self._closing = True
+        if self._wakeup:
+            self._wakeup.set()
+        if self._task:
+            await self._task
+            self._task = None
+        await self.flush()
+        if self.spool:
+            self.spool.close()
+
+    # ─────────────────────────────
+    # 書き込み
+    # ─────────────────────────────
+
+    def enqueue(self, row: dict) -> bool:
+        """ログ行をキューに積む（ノンブロッキング）。捨てた場合はFalse"""
+        if len(self._buffer) >= self.max_queue:
+            self.dropped += 1
+            if self.drop_policy == "drop_newest":
+                return False
+            self._buffer.popleft()
+
+        self._buffer.append(row)
+        self.queued += 1
+
+        if self._task is None or self._task.done():
+            try:
+                self.start()
+            except RuntimeError:
+                pass  # イベントループ外（stop時のflushで書き出される）
+        if len(self._buffer) >= self.batch_size and self._wakeup:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> None:
+        """キューの中身をbatch_sizeずつINSERTする（失敗分はスプールへ）"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while self._buffer:
+                batch = [
+                    self._buffer.popleft()
+                    for _ in range(min(self.batch_size, len(self._buffer)))
+                ]
+                # スプールに未再投入分がある間は順序を保つため直接INSERTしない
+                if self.spool and self.spool.has_pending:
+                    await self._spool(batch)
+                    continue
+                try:
+                    await run_in_threadpool(self._insert, batch)
+                    self.flushed += len(batch)
+                except Exception as log_error:
+                    print(f"[AccessLog] Failed to write {len(batch)} logs: {log_error}")
+                    await self._spool(batch)
+
+    async def replay(self) -> None:
+        """スプールに退避した行を再投入する（失敗したら次回に持ち越し）"""
+        if not self.spool or not self.spool.has_pending:
+            return
+        self._last_replay = time.monotonic()
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            try:
+                replayed = await run_in_threadpool(self.spool.replay, self._insert, self.batch_size)
+                self.flushed += replayed
+            except Exception as log_error:
+                print(f"[AccessLog] Spool replay deferred: {log_error}")
+
+    async def _spool(self, batch: list[dict]) -> None:
+        if not self.spool:
+            # ログ書き込み失敗はprintのみ。リクエスト処理は止めない
+            self.failed += len(batch)
+            return
+        try:
+            await run_in_threadpool(self.spool.append, batch)
+            self.spooled += len(batch)
+        except Exception as spool_error:
+            self.failed += len(batch)
+            print(f"[AccessLog] Failed to spool {len(batch)} logs: {spool_error}")
+
+    def _insert(self, batch: list[dict]) -> None:
+        self.supabase.table(self.table).insert(batch).execute()
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if time.monotonic() - self._last_replay >= self.replay_interval:
+                await self.replay()
+
+    def stats(self) -> dict:
+        """キューのカウンター"""
+        return {
+            "queued": self.queued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "spooled": self.spooled,
+            "pending": len(self._buffer),
+            "max_queue": self.max_queue,
+            "drop_policy": self.drop_policy,
+            "spool": self.spool.stats() if self.spool else None,
+        }
@@ -0,0 +1,119 @@
+"""
+リクエストボディの個人情報マスク
+キー名の判定は設定済みフィールド一覧から作った正規表現1本で行い、
+ネストしたdict/listも走査する。ノード数と出力文字数に上限があり、
+上限に達した時点で走査を打ち切るため、ペイロードの大きさに関係なくコストが一定に収まる。
+"""
+import json
+import re
+from typing import Any, Iterable
+
+MASKED = '"***MASKED***"'
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+class _Output:
+    """上限付きの文字列バッファ"""
+
+    def __init__(self, max_chars: int):
+        self.parts: list[str] = []
+        self.remaining = max_chars
+        self.nodes = 0
+
+    def write(self, text: str) -> None:
+        if len(text) >= self.remaining:
+            self.parts.append(text[:self.remaining])
+            self.remaining = 0
+            raise _BudgetExceeded
+        self.parts.append(text)
+        self.remaining -= len(text)
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+
+class Redactor:
+    """ネスト対応のマスク処理（1パス・上限付き）"""
+
+    def __init__(
+        self,
+        fields: Iterable[str],
+        max_chars: int = 1000,
+        max_nodes: int = 500,
+        max_depth: int = 8,
+        max_string: int = 200,
+        keep_string: int = 50,
+    ):
+        self._pattern = re.compile("|".join(re.escape(f) for f in fields), re.IGNORECASE)
+        self.max_chars = max_chars
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.max_string = max_string
+        self.keep_string = keep_string
+        self._key_cache: dict[str, bool] = {}
+
+    def is_sensitive(self, key: str) -> bool:
+        hit = self._key_cache.get(key)
+        if hit is None:
+            hit = self._pattern.search(key) is not None
+            if len(self._key_cache) < 4096:
+                self._key_cache[key] = hit
+        return hit
+
+    def redact(self, data: Any) -> str:
+        """マスク済みJSON文字列（max_chars以内）を返す"""
+        if not data:
+            return ""
+        out = _Output(self.max_chars)
+        try:
+            self._walk(data, out, 0)
+        except _BudgetExceeded:
+            pass
+        return out.getvalue()
+
+    def _walk(self, value: Any, out: _Output, depth: int) -> None:
+        out.nodes += 1
+        if out.nodes > self.max_nodes:
+            out.write('"...(truncated)"')
+            raise _BudgetExceeded
+
+        if isinstance(value, dict):
+            if depth >= self.max_depth:
+                out.write('"{...}"')
+                return
+            out.write("{")
+            for i, (key, item) in enumerate(value.items()):
+                if i:
+                    out.write(", ")
+                key = str(key)
+                out.write(self._string(key))
+                out.write(": ")
+                if self.is_sensitive(key):
+                    out.write(MASKED)
+                else:
+                    self._walk(item, out, depth + 1)
+            out.write("}")
+        elif isinstance(value, list):
+            if depth >= self.max_depth:
+                out.write('"[...]"')
+                return
+            out.write("[")
+            for i, item in enumerate(value):
+                if i:
+                    out.write(", ")
+                self._walk(item, out, depth + 1)
+            out.write("]")
+        elif isinstance(value, str):
+            out.write(self._string(value))
+        elif value is None or isinstance(value, (bool, int, float)):
+            out.write(json.dumps(value))
+        else:
+            out.write(self._string(str(value)))
+
+    def _string(self, value: str) -> str:
+        if len(value) > self.max_string:
+            value = value[:self.keep_string] + "...(truncated)"
+        return json.dumps(value, ensure_ascii=False)
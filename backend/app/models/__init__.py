@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, ARRAY, Numeric, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Date, DateTime, Text, ForeignKey, ARRAY, Numeric, JSON, Boolean
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -127,6 +127,7 @@ class ScoutLink(Base):
     
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 
 class LinkClick(Base):
@@ -185,3 +186,69 @@ class LinkConversion(Base):
     notes = Column(Text, default='')
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class ScoutPerformanceRollup(Base):
+    """スカウト成績の月次集計（Supabase scout_performanceテーブル）"""
+    __tablename__ = "scout_performance"
+
+    scout_id = Column(Integer, ForeignKey("scouts.id"), primary_key=True)
+    link_type = Column(Text, primary_key=True)  # 'recruit' | 'app_invite'
+    month = Column(Date, primary_key=True)  # 月初日
+
+    # 発生月で計上（クリック日・応募日・各ステータスの到達日）
+    clicks = Column(Integer, default=0)
+    submissions = Column(Integer, default=0)
+    contacted = Column(Integer, default=0)
+    interviewed = Column(Integer, default=0)
+    trial = Column(Integer, default=0)
+    hired = Column(Integer, default=0)
+    registered = Column(Integer, default=0)
+
+    # 現在のステータス（応募月で計上）
+    active = Column(Integer, default=0)
+    churned = Column(Integer, default=0)
+
+    # SB（採用月で計上。未採用なら応募月）
+    sb_amount = Column(Numeric, default=0)
+    scout_income = Column(Numeric, default=0)
+    unpaid_scout_income = Column(Numeric, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class ConversionStatusEvent(Base):
+    """コンバージョンのステータス遷移ログ（Supabase conversion_status_eventsテーブル・追記のみ）"""
+    __tablename__ = "conversion_status_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    conversion_id = Column(Integer, ForeignKey("link_conversions.id"), nullable=False)
+    scout_id = Column(Integer, ForeignKey("scouts.id"), nullable=False)  # コンバージョンの担当スカウト
+
+    # event_type: 'submitted' | 'status' | 'sb_paid'
+    event_type = Column(Text, nullable=False)
+    from_status = Column(Text, nullable=True)  # 応募時はNone
+    to_status = Column(Text, nullable=False)
+
+    # 操作した人（scouts.id）と立場: 'master' | 'scout' | 'applicant'
+    actor_id = Column(Integer, ForeignKey("scouts.id"), nullable=True)
+    actor_role = Column(Text, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class SbPayoutBatch(Base):
+    """SB一括支払いの実行記録（Supabase sb_payout_batchesテーブル・冪等キー単位）"""
+    __tablename__ = "sb_payout_batches"
+
+    idempotency_key = Column(Text, primary_key=True)
+    master_id = Column(Integer, ForeignKey("scouts.id"), nullable=False)
+    ids_digest = Column(Text, nullable=False)  # 対象IDのハッシュ（同じキーで別の対象を送ったら拒否）
+
+    requested_count = Column(Integer, nullable=False)
+    paid_count = Column(Integer, default=0)
+    chunks = Column(JSONB, default=list)  # [{"index", "requested", "paid"}]（完了したチャンク）
+    status = Column(Text, default='running')  # 'running' | 'completed'
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
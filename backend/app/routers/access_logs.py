@@ -1,12 +1,26 @@
 """管理者向けアクセスログAPI"""
-from fastapi import APIRouter, Depends, HTTPException, Query
+import csv
+import io
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from typing import Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from app.core.config import settings
 from app.core.database import get_supabase
+from app.core.pagination import decode_cursor, encode_cursor
+from app.jobs.access_log_archive import LOG_COLUMNS, AccessLogArchive
+from app.middleware.log_broadcaster import LogFilter
 from supabase import Client
 
 router = APIRouter(prefix="/api/admin/access-logs", tags=["AccessLogs"])
 
+# AccessLogStatsの項目（スケッチ列は返さない）
+DAILY_STATS_COLUMNS = (
+    "log_date, total_requests, unique_users, unique_ips, login_count, error_count, "
+    "create_count, update_count, delete_count, export_count, avg_response_time_ms"
+)
+
 
 def require_admin(supabase: Client = Depends(get_supabase)):
     """管理者権限チェック（簡易版。本番ではJWT検証を追加）"""
@@ -14,10 +28,8 @@ def require_admin(supabase: Client = Depends(get_supabase)):
     return supabase
 
 
-@router.get("")
-async def get_access_logs(
-    page: int = Query(1, ge=1),
-    per_page: int = Query(50, ge=1, le=200),
+def apply_log_filters(
+    query,
     user_email: Optional[str] = None,
     action_type: Optional[str] = None,
     resource_type: Optional[str] = None,
@@ -27,12 +39,8 @@ async def get_access_logs(
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     search: Optional[str] = None,
-    supabase: Client = Depends(require_admin),
 ):
-    """アクセスログ一覧取得（ページネーション＋フィルター）"""
-    query = supabase.table("admin_access_logs").select("*", count="exact")
-
-    # フィルター適用
+    """一覧・エクスポート共通のフィルター"""
     if user_email:
         query = query.ilike("user_email", f"%{user_email}%")
     if action_type:
@@ -49,39 +57,212 @@ async def get_access_logs(
         query = query.gte("created_at", date_from)
     if date_to:
         query = query.lte("created_at", date_to)
-    if search:
+    if search and settings.ACCESS_LOG_SEARCH_COLUMN:
+        # 4列を連結した生成列1本をトライグラムGINインデックスで引く（add_access_log_search_index.sql）
+        query = query.ilike(settings.ACCESS_LOG_SEARCH_COLUMN, f"%{search.lower()}%")
+    elif search:
         query = query.or_(
             f"request_path.ilike.%{search}%,"
             f"user_email.ilike.%{search}%,"
             f"ip_address.ilike.%{search}%,"
             f"error_message.ilike.%{search}%"
         )
+    return query
+
+
+def apply_keyset(query, cursor: Optional[str]):
+    """(created_at, id) の降順で、カーソル位置より後ろの行に絞る"""
+    query = query.order("created_at", desc=True).order("id", desc=True)
+    if cursor:
+        position = decode_cursor(cursor, ("created_at", "id"))
+        try:
+            created_at = datetime.fromisoformat(str(position["created_at"])).isoformat()
+            last_id = int(position["id"])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # lteで範囲の上限を与え、idx_access_logs_created_id をその位置から読ませる
+        query = query.lte("created_at", created_at).or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt.{last_id})'
+        )
+    return query
+
+
+def next_cursor_for(rows: list[dict]) -> str:
+    last = rows[-1]
+    return encode_cursor({"created_at": last["created_at"], "id": last["id"]})
+
+
+# 一覧・エクスポートで返すカラム（検索用の生成列は含めない）
+EXPORT_COLUMNS = LOG_COLUMNS
+EXPORT_CHUNK_SIZE = 1000
+
+
+@router.get("")
+async def get_access_logs(
+    page: int = Query(1, ge=1),
+    per_page: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    pagination: str = Query("offset", pattern="^(offset|cursor)$"),
+    count: Optional[str] = Query(None, pattern="^(exact|planned|estimated|none)$"),
+    user_email: Optional[str] = None,
+    action_type: Optional[str] = None,
+    resource_type: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    status_min: Optional[int] = None,
+    status_max: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    search: Optional[str] = None,
+    supabase: Client = Depends(require_admin),
+):
+    """
+    アクセスログ一覧取得（ページネーション＋フィルター）
+    - pagination=cursor または cursor指定時はキーセット方式。レスポンスのnext_cursorを次回渡す
+    - count: exact（COUNT(*)）/ planned・estimated（プランナー推定値）/ none（件数を返さない）
+      未指定ならオフセット方式はexact、キーセット方式はnone（ページごとのCOUNT(*)を避ける）
+    """
+    keyset = bool(cursor) or pagination == "cursor"
+    if count is None:
+        count = "none" if keyset else "exact"
+    # 検索用の生成列（search_text）は返さない
+    query = supabase.table("admin_access_logs").select(
+        ", ".join(EXPORT_COLUMNS), count=None if count == "none" else count
+    )
+    query = apply_log_filters(
+        query,
+        user_email=user_email,
+        action_type=action_type,
+        resource_type=resource_type,
+        ip_address=ip_address,
+        status_min=status_min,
+        status_max=status_max,
+        date_from=date_from,
+        date_to=date_to,
+        search=search,
+    )
+
+    if keyset:
+        # キーセット: 1件多く取得して次ページの有無を判定
+        query = apply_keyset(query, cursor).limit(per_page + 1)
+        result = query.execute()
+        rows = result.data[:per_page]
+        return {
+            "data": rows,
+            "total": result.count,
+            "per_page": per_page,
+            "next_cursor": next_cursor_for(rows) if len(result.data) > per_page else None,
+        }
 
     # ページネーション
     offset = (page - 1) * per_page
-    query = query.order("created_at", desc=True).range(offset, offset + per_page - 1)
+    query = (
+        query.order("created_at", desc=True)
+        .order("id", desc=True)
+        .range(offset, offset + per_page - 1)
+    )
 
     result = query.execute()
+    total = result.count
 
     return {
         "data": result.data,
-        "total": result.count,
+        "total": total,
         "page": page,
         "per_page": per_page,
-        "total_pages": (result.count + per_page - 1) // per_page if result.count else 0,
+        "total_pages": (total + per_page - 1) // per_page if total else 0,
+        "next_cursor": next_cursor_for(result.data) if len(result.data) == per_page else None,
     }
 
 
+@router.get("/export")
+def export_access_logs(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    columns: Optional[str] = None,
+    user_email: Optional[str] = None,
+    action_type: Optional[str] = None,
+    resource_type: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    status_min: Optional[int] = None,
+    status_max: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    search: Optional[str] = None,
+    supabase: Client = Depends(require_admin),
+):
+    """
+    フィルター条件に合うログをNDJSON / CSVでストリーミング出力
+    一覧と同じフィルターで (created_at, id) のキーセット順に1000行ずつ取得して書き出すため、
+    件数に関係なくメモリ使用量は1チャンク分に収まる。
+    """
+    selected = list(EXPORT_COLUMNS)
+    if columns:
+        selected = [c.strip() for c in columns.split(",") if c.strip() in EXPORT_COLUMNS]
+        if not selected:
+            raise HTTPException(status_code=400, detail="columns に有効なカラムがありません")
+    # キーセットに使うカラムは必ず取得する
+    fetched = selected + [c for c in ("created_at", "id") if c not in selected]
+
+    def chunks():
+        cursor = None
+        while True:
+            query = apply_log_filters(
+                supabase.table("admin_access_logs").select(", ".join(fetched)),
+                user_email=user_email,
+                action_type=action_type,
+                resource_type=resource_type,
+                ip_address=ip_address,
+                status_min=status_min,
+                status_max=status_max,
+                date_from=date_from,
+                date_to=date_to,
+                search=search,
+            )
+            rows = apply_keyset(query, cursor).limit(EXPORT_CHUNK_SIZE).execute().data
+            if not rows:
+                return
+            yield rows
+            if len(rows) < EXPORT_CHUNK_SIZE:
+                return
+            cursor = next_cursor_for(rows)
+
+    def generate_ndjson():
+        for rows in chunks():
+            yield "".join(
+                json.dumps({c: row.get(c) for c in selected}, ensure_ascii=False, default=str) + "\n"
+                for row in rows
+            )
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write("\ufeff")  # Excelで文字化けしないようBOMを付ける
+        writer.writerow(selected)
+        for rows in chunks():
+            writer.writerows([row.get(c) for c in selected] for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    filename = f"access_logs_{datetime.utcnow():%Y%m%d_%H%M%S}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if format == "csv":
+        return StreamingResponse(generate_csv(), media_type="text/csv; charset=utf-8", headers=headers)
+    return StreamingResponse(generate_ndjson(), media_type="application/x-ndjson", headers=headers)
+
+
 @router.get("/stats")
 async def get_access_log_stats(
     days: int = Query(30, ge=1, le=90),
     supabase: Client = Depends(require_admin),
 ):
-    """日別アクセス統計"""
+    """日別アクセス統計（access_log_daily_statsの日別1行を読むだけ）"""
     result = (
-        supabase.table("access_log_daily_summary")
-        .select("*")
-        .gte("log_date", (datetime.utcnow() - timedelta(days=days)).isoformat())
+        supabase.table("access_log_daily_stats")
+        .select(DAILY_STATS_COLUMNS)
+        .gte("log_date", (datetime.utcnow() - timedelta(days=days)).date().isoformat())
         .order("log_date", desc=True)
         .execute()
     )
@@ -104,34 +285,144 @@ async def get_realtime_logs(
     return {"data": result.data}
 
 
-@router.get("/suspicious")
-async def get_suspicious_activity(
+@router.get("/stream")
+async def stream_logs(
+    request: Request,
+    status_class: Optional[str] = Query(None, pattern="^[1-5]xx$"),
+    action_type: Optional[str] = None,
+    resource_type: Optional[str] = None,
+    user_email: Optional[str] = None,
     supabase: Client = Depends(require_admin),
 ):
-    """不審なアクティビティ検出"""
-    one_hour_ago = (datetime.utcnow() - timedelta(hours=1)).isoformat()
+    """
+    ライブログ配信（Server-Sent Events）
+    Middlewareが記録した行をDBを読まずにそのまま流す。
+    15秒ごとにコメント行を送って接続を維持し、バッファ溢れで捨てた行数は dropped イベントで通知する。
+    """
+    broadcaster = request.app.state.log_broadcaster
+    subscription = broadcaster.subscribe(
+        LogFilter(status_class, action_type, resource_type, user_email)
+    )
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="ライブ配信の接続数が上限に達しています")
 
-    # 直近1時間で401/403が多いIP
-    auth_failures = (
-        supabase.table("admin_access_logs")
-        .select("ip_address, count")
-        .gte("created_at", one_hour_ago)
-        .in_("response_status", [401, 403])
-        .execute()
+    async def events():
+        reported_drops = 0
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                batch = await subscription.get(timeout=15.0)
+                if not batch:
+                    yield ": ping\n\n"
+                    continue
+                for event in batch:
+                    payload = json.dumps(event, ensure_ascii=False, default=str)
+                    yield f"id: {event['stream_id']}\ndata: {payload}\n\n"
+                if subscription.dropped != reported_drops:
+                    reported_drops = subscription.dropped
+                    yield f"event: dropped\ndata: {reported_drops}\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    # 直近1時間でDELETE操作が多いユーザー
-    delete_heavy = (
-        supabase.table("admin_access_logs")
-        .select("user_email, request_path, created_at")
-        .gte("created_at", one_hour_ago)
-        .eq("request_method", "DELETE")
-        .order("created_at", desc=True)
-        .limit(20)
-        .execute()
+
+@router.get("/suspicious")
+async def get_suspicious_activity(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    auth_failure_threshold: Optional[int] = Query(None, ge=1),
+    delete_threshold: Optional[int] = Query(None, ge=1),
+    supabase: Client = Depends(require_admin),
+):
+    """
+    不審なアクティビティ検出
+    直近ウィンドウ（SUSPICIOUS_WINDOW_SECONDS）で401/403が多いIPとDELETEが多いユーザーを件数順に返す。
+    閾値は未指定なら設定値（SUSPICIOUS_*_THRESHOLD）。
+    """
+    return request.app.state.abuse_monitor.report(
+        limit=limit,
+        auth_failure_threshold=auth_failure_threshold,
+        delete_threshold=delete_threshold,
     )
 
+
+@router.get("/pipeline")
+async def get_pipeline_stats(
+    request: Request,
+    supabase: Client = Depends(require_admin),
+):
+    """ログパイプラインのカウンター（書き込みキュー・JWTキャッシュ・記録ポリシー）"""
     return {
-        "auth_failures": auth_failures.data,
-        "delete_operations": delete_heavy.data,
+        "writer": request.app.state.access_log_writer.stats(),
+        "identity": request.app.state.identity_resolver.stats(),
+        "policy": request.app.state.access_log_policy.stats(),
+        "daily_stats": request.app.state.access_log_daily_stats.stats(),
+        "abuse": request.app.state.abuse_monitor.stats(),
+        "stream": request.app.state.log_broadcaster.stats(),
     }
+
+
+@router.get("/archive/days")
+async def get_archived_days(
+    supabase: Client = Depends(require_admin),
+):
+    """アーカイブ済みの日付一覧（日別の行数）"""
+    return {"data": AccessLogArchive(settings.ACCESS_LOG_ARCHIVE_DIR).days()}
+
+
+@router.get("/archive")
+async def scan_archived_logs(
+    date_from: str,
+    date_to: str,
+    user_email: Optional[str] = None,
+    action_type: Optional[str] = None,
+    resource_type: Optional[str] = None,
+    status_min: Optional[int] = None,
+    status_max: Optional[int] = None,
+    columns: Optional[str] = None,
+    supabase: Client = Depends(require_admin),
+):
+    """アーカイブ済み期間のログをNDJSONでストリーミング（保持期間より古いログ用）"""
+    try:
+        start = date.fromisoformat(date_from[:10])
+        end = date.fromisoformat(date_to[:10])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date_from / date_to はYYYY-MM-DD形式で指定してください")
+    if end < start:
+        raise HTTPException(status_code=400, detail="date_to が date_from より前です")
+
+    def where(row: dict) -> bool:
+        if user_email and user_email.lower() not in (row.get("user_email") or "").lower():
+            return False
+        if action_type and row.get("action_type") != action_type:
+            return False
+        if resource_type and row.get("resource_type") != resource_type:
+            return False
+        status = row.get("response_status") or 0
+        if status_min and status < status_min:
+            return False
+        if status_max and status > status_max:
+            return False
+        return True
+
+    # フィルターに使うカラムは必ず読み込む
+    selected = None
+    if columns:
+        selected = [c.strip() for c in columns.split(",") if c.strip()]
+        selected += [
+            c for c in ("user_email", "action_type", "resource_type", "response_status")
+            if c not in selected
+        ]
+
+    archive = AccessLogArchive(settings.ACCESS_LOG_ARCHIVE_DIR)
+
+    def generate():
+        for row in archive.scan(start, end, columns=selected, where=where):
+            yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
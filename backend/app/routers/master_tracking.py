@@ -2,10 +2,19 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
 from typing import Optional, List
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_, extract
+from sqlalchemy import func, desc, and_, or_, case, cast, tuple_, Numeric
+from app.core.alerts import daily_alerts
+from app.core.config import settings
 from app.core.database import get_db
-from app.models import ScoutLink, Scout, Shop, LinkConversion, LinkClick, Cast
-from datetime import datetime, date
+from app.core.loaders import EntityLoader, get_loader
+from app.core.pagination import decode_cursor, encode_cursor, estimate_count
+from app.core.sb_payout import pay_conversions
+from app.core.scout_performance import conversion_contributions, monthly_trend, record_conversion_change
+from app.core.status_events import day_range, record_status_event, stage_durations
+from app.models import (
+    ScoutLink, Scout, Shop, LinkConversion, LinkClick, Cast, ScoutPerformanceRollup, ConversionStatusEvent,
+)
+from datetime import datetime, date, timedelta
 from decimal import Decimal
 
 router = APIRouter()
@@ -28,6 +37,101 @@ def verify_master(scout_id: int, db: Session):
     return scout
 
 
+# ═══════════════════════════════════════
+# 集計ヘルパー
+# ═══════════════════════════════════════
+
+def parse_period(period: Optional[str]) -> Optional[tuple]:
+    """
+    期間指定を [開始, 終了) の日時に変換する
+    - "2026-02"（月）/ "2026"（年）
+    - "2026-01-10..2026-02-09"（日付範囲。終了日を含む）
+    - "7d" / "30d"（直近N日。現在時刻まで）
+    - "all" または未指定（全期間 → None）
+    """
+    if not period or period == "all":
+        return None
+    try:
+        if ".." in period:
+            first, last = period.split("..", 1)
+            start = datetime.strptime(first, "%Y-%m-%d")
+            end = datetime.strptime(last, "%Y-%m-%d") + timedelta(days=1)
+            if end <= start:
+                raise ValueError
+        elif period.endswith("d") and period[:-1].isdigit():
+            days = int(period[:-1])
+            if not 1 <= days <= 366:
+                raise ValueError
+            end = datetime.now()
+            start = end - timedelta(days=days)
+        elif len(period) == 7:
+            start = datetime.strptime(period, "%Y-%m")
+            end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+        elif len(period) == 4:
+            start = datetime.strptime(period, "%Y")
+            end = datetime(start.year + 1, 1, 1)
+        else:
+            raise ValueError
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid period")
+    return start, end
+
+
+def in_period(column, date_range: Optional[tuple]):
+    """期間内の条件（インデックスが効く範囲条件。全期間なら値が入っていること）"""
+    if date_range is None:
+        return column.isnot(None)
+    return and_(column >= date_range[0], column < date_range[1])
+
+
+def earned_in(date_range: Optional[tuple]):
+    """SB・報酬を期間に計上する条件（採用日。未採用なら応募日）"""
+    return or_(
+        in_period(LinkConversion.hired_at, date_range),
+        and_(LinkConversion.hired_at.is_(None), in_period(LinkConversion.submitted_at, date_range)),
+    )
+
+
+def cvr_expr(submissions, clicks):
+    """CVR（%・小数1桁）のSQL式"""
+    return case(
+        (clicks > 0, func.round(cast(submissions, Numeric) * 100 / clicks, 1)),
+        else_=0,
+    )
+
+
+# ═══════════════════════════════════════
+# キーセットページネーション（(created_at, id)）
+# ═══════════════════════════════════════
+
+def keyset_after(model, cursor: str, descending: bool = True):
+    """
+    カーソル位置より後ろの行の条件
+    行値比較 (created_at, id) < (...) にすることで、(…, created_at, id) のインデックスを
+    カーソル位置から範囲で読める（ORで書くと範囲の境界にならない）
+    """
+    position = decode_cursor(cursor, ("created_at", "id"))
+    try:
+        created_at = datetime.fromisoformat(position["created_at"])
+        last_id = int(position["id"])
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    key = tuple_(model.created_at, model.id)
+    if descending:
+        return key < tuple_(created_at, last_id)
+    return key > tuple_(created_at, last_id)
+
+
+def keyset_order(model, descending: bool = True):
+    if descending:
+        return desc(model.created_at), desc(model.id)
+    return model.created_at, model.id
+
+
+def cursor_for(row) -> str:
+    return encode_cursor({"created_at": row.created_at.isoformat(), "id": row.id})
+
+
 # ═══════════════════════════════════════
 # レスポンススキーマ
 # ═══════════════════════════════════════
@@ -97,9 +201,11 @@ class ConversionItem(BaseModel):
 
 class ConversionsListResponse(BaseModel):
     conversions: List[ConversionItem]
-    total: int
-    page: int
+    total: Optional[int]  # count=noneならNone、count=estimatedは推定値
+    page: Optional[int]  # キーセット方式ではNone
     per_page: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class StatusUpdateRequest(BaseModel):
@@ -118,6 +224,7 @@ class SBUpdateRequest(BaseModel):
 class BulkPayRequest(BaseModel):
     conversion_ids: List[int]
     notes: str = ""
+    idempotency_key: Optional[str] = None  # 再送時に同じ値を送ると二重に処理しない
 
 
 class LinkForceToggleRequest(BaseModel):
@@ -147,92 +254,204 @@ def get_overview(
     """組織全体の統計サマリー"""
     verify_master(master_id, db)
     
-    # 期間フィルター（簡易版：当月）
+    # 期間フィルター（未指定は当月。"all"で全期間）
     if period is None:
         period = datetime.now().strftime("%Y-%m")
-    
-    # recruit統計
-    recruit_links = db.query(ScoutLink).filter(ScoutLink.link_type == "recruit").all()
-    recruit_active = sum(1 for link in recruit_links if link.is_active)
-    recruit_clicks = sum(link.click_count for link in recruit_links)
-    recruit_submissions = sum(link.submission_count for link in recruit_links)
-    recruit_cvr = round((recruit_submissions / recruit_clicks * 100), 1) if recruit_clicks > 0 else 0.0
-    
-    # recruitファネル
-    recruit_conversions = db.query(LinkConversion).filter(
-        LinkConversion.conversion_type == "recruit_apply"
-    ).all()
-    
+    date_range = parse_period(period)
+
+    # リンク統計（link_typeごとに1行。リンク数は現在の件数）
+    link_rows = db.query(
+        ScoutLink.link_type,
+        func.count(ScoutLink.id),
+        func.sum(case((ScoutLink.is_active == True, 1), else_=0)),
+        func.coalesce(func.sum(ScoutLink.click_count), 0),
+        func.coalesce(func.sum(ScoutLink.submission_count), 0),
+    ).group_by(ScoutLink.link_type).all()
+    link_stats = {
+        row[0]: {
+            "total_links": row[1],
+            "active_links": int(row[2] or 0),
+            "total_clicks": int(row[3]),
+            "total_submissions": int(row[4]),
+        }
+        for row in link_rows
+    }
+
+    # 期間指定時のクリック数は link_clicks.clicked_at の範囲で数える
+    if date_range:
+        for stats in link_stats.values():
+            stats["total_clicks"] = 0
+        click_rows = db.query(ScoutLink.link_type, func.count(LinkClick.id)).join(
+            ScoutLink, ScoutLink.id == LinkClick.link_id
+        ).filter(
+            in_period(LinkClick.clicked_at, date_range)
+        ).group_by(ScoutLink.link_type).all()
+        for link_type, clicks in click_rows:
+            if link_type in link_stats:
+                link_stats[link_type]["total_clicks"] = clicks
+
+    # ファネル・SB統計（conversion_typeごとに1行。各段階はその日時が期間内の件数）
+    submitted_in = in_period(LinkConversion.submitted_at, date_range)
+    stage_columns = (
+        LinkConversion.contacted_at, LinkConversion.interviewed_at, LinkConversion.trial_at,
+        LinkConversion.hired_at, LinkConversion.registered_at,
+    )
+    earned = earned_in(date_range)
+    conversion_query = db.query(
+        LinkConversion.conversion_type,
+        func.sum(case((submitted_in, 1), else_=0)),
+        *[func.sum(case((in_period(column, date_range), 1), else_=0)) for column in stage_columns],
+        func.sum(case((and_(submitted_in, LinkConversion.status == "active"), 1), else_=0)),
+        func.sum(case((and_(submitted_in, LinkConversion.status == "churned"), 1), else_=0)),
+        func.coalesce(func.sum(case((earned, LinkConversion.sb_amount), else_=0)), 0),
+        func.coalesce(func.sum(case(
+            (and_(earned, func.coalesce(LinkConversion.is_sb_paid, False) == False), LinkConversion.sb_amount),
+            else_=0,
+        )), 0),
+    ).filter(
+        LinkConversion.conversion_type.in_(["recruit_apply", "app_register"])
+    )
+    if date_range:
+        # 各日時列の範囲条件のOR（それぞれのインデックスで拾える）
+        conversion_query = conversion_query.filter(or_(
+            submitted_in, *[in_period(column, date_range) for column in stage_columns]
+        ))
+    conversion_stats = {
+        row[0]: row[1:] for row in conversion_query.group_by(LinkConversion.conversion_type).all()
+    }
+
+    (
+        recruit_submitted, recruit_contacted, recruit_interviewed, recruit_trial, recruit_hired,
+        _, recruit_active_count, _, total_sb, unpaid_sb,
+    ) = conversion_stats.get("recruit_apply", (0,) * 10)
     recruit_funnel = FunnelStats(
-        submitted=sum(1 for c in recruit_conversions),
-        contacted=sum(1 for c in recruit_conversions if c.contacted_at),
-        interviewed=sum(1 for c in recruit_conversions if c.interviewed_at),
-        trial=sum(1 for c in recruit_conversions if c.trial_at),
-        hired=sum(1 for c in recruit_conversions if c.hired_at),
-        active=sum(1 for c in recruit_conversions if c.status == 'active'),
+        submitted=int(recruit_submitted or 0),
+        contacted=int(recruit_contacted or 0),
+        interviewed=int(recruit_interviewed or 0),
+        trial=int(recruit_trial or 0),
+        hired=int(recruit_hired or 0),
+        active=int(recruit_active_count or 0),
     )
-    
-    total_sb = sum(float(c.sb_amount or 0) for c in recruit_conversions)
-    unpaid_sb = sum(float(c.sb_amount or 0) for c in recruit_conversions if not c.is_sb_paid)
-    
-    # app_invite統計
-    app_links = db.query(ScoutLink).filter(ScoutLink.link_type == "app_invite").all()
-    app_active = sum(1 for link in app_links if link.is_active)
-    app_clicks = sum(link.click_count for link in app_links)
-    app_submissions = sum(link.submission_count for link in app_links)
-    app_cvr = round((app_submissions / app_clicks * 100), 1) if app_clicks > 0 else 0.0
-    
-    app_conversions = db.query(LinkConversion).filter(
-        LinkConversion.conversion_type == "app_register"
-    ).all()
-    
+
+    (
+        app_submitted, _, _, _, _, app_registered, app_active_count, app_churned, _, _,
+    ) = conversion_stats.get("app_register", (0,) * 10)
     app_funnel = FunnelStats(
-        submitted=sum(1 for c in app_conversions),
-        registered=sum(1 for c in app_conversions if c.registered_at),
-        active=sum(1 for c in app_conversions if c.status == 'active'),
-        churned=sum(1 for c in app_conversions if c.status == 'churned'),
+        submitted=int(app_submitted or 0),
+        registered=int(app_registered or 0),
+        active=int(app_active_count or 0),
+        churned=int(app_churned or 0),
     )
-    
+
+    # 期間指定時の応募数は submitted_at の範囲で数える
+    if date_range:
+        for link_type, submitted in (("recruit", recruit_funnel.submitted), ("app_invite", app_funnel.submitted)):
+            if link_type in link_stats:
+                link_stats[link_type]["total_submissions"] = submitted
+
     # アクティブスカウト数
     active_scouts = db.query(Scout).count()
-    
-    # トップパフォーマー（SB合計が最も高いスカウト）
+
+    # トップパフォーマー（期間内に計上されたスカウト報酬が最も高いスカウト）
     top_performer = db.query(
-        LinkConversion.scout_id,
+        Scout.id,
+        Scout.name,
         func.sum(LinkConversion.scout_income).label('total_income')
-    ).group_by(LinkConversion.scout_id).order_by(desc('total_income')).first()
-    
-    top_performer_id = None
-    top_performer_name = None
-    if top_performer:
-        top_scout = db.query(Scout).filter(Scout.id == top_performer[0]).first()
-        if top_scout:
-            top_performer_id = top_scout.id
-            top_performer_name = top_scout.name
-    
+    ).join(Scout, Scout.id == LinkConversion.scout_id).filter(earned).group_by(
+        Scout.id, Scout.name
+    ).order_by(desc('total_income')).first()
+
+    def type_stats(link_type: str, **extra) -> TypeStats:
+        links = link_stats.get(link_type, {
+            "total_links": 0, "active_links": 0, "total_clicks": 0, "total_submissions": 0,
+        })
+        clicks = links["total_clicks"]
+        cvr = round((links["total_submissions"] / clicks * 100), 1) if clicks > 0 else 0.0
+        return TypeStats(**links, overall_cvr=cvr, **extra)
+
     return OverviewResponse(
         period=period,
-        recruit=TypeStats(
-            total_links=len(recruit_links),
-            active_links=recruit_active,
-            total_clicks=recruit_clicks,
-            total_submissions=recruit_submissions,
-            overall_cvr=recruit_cvr,
+        recruit=type_stats(
+            "recruit",
             funnel=recruit_funnel,
-            total_sb_earned=int(total_sb),
-            unpaid_sb=int(unpaid_sb),
-        ),
-        app_invite=TypeStats(
-            total_links=len(app_links),
-            active_links=app_active,
-            total_clicks=app_clicks,
-            total_submissions=app_submissions,
-            overall_cvr=app_cvr,
-            funnel=app_funnel,
+            total_sb_earned=int(total_sb or 0),
+            unpaid_sb=int(unpaid_sb or 0),
         ),
+        app_invite=type_stats("app_invite", funnel=app_funnel),
         active_scouts=active_scouts,
-        top_performer_scout_id=top_performer_id,
-        top_performer_name=top_performer_name,
+        top_performer_scout_id=top_performer[0] if top_performer else None,
+        top_performer_name=top_performer[1] if top_performer else None,
+    )
+
+
+def ranking_from_rollup(db: Session, date_range: Optional[tuple]):
+    """スカウト別の集計値（scout_performanceの月次行を合算）"""
+    perf = ScoutPerformanceRollup
+    is_recruit = perf.link_type == "recruit"
+    is_app = perf.link_type == "app_invite"
+    query = db.query(
+        perf.scout_id.label("scout_id"),
+        func.sum(case((is_recruit, perf.clicks), else_=0)).label("recruit_clicks"),
+        func.sum(case((is_recruit, perf.submissions), else_=0)).label("recruit_submissions"),
+        func.sum(case((is_recruit, perf.hired), else_=0)).label("recruit_hired"),
+        func.sum(case((is_recruit, perf.scout_income), else_=0)).label("recruit_sb"),
+        func.sum(case((is_app, perf.clicks), else_=0)).label("app_clicks"),
+        func.sum(case((is_app, perf.submissions), else_=0)).label("app_submissions"),
+        func.sum(case((is_app, perf.active), else_=0)).label("app_active"),
+    )
+    if date_range:
+        query = query.filter(
+            perf.month >= date_range[0].date(),
+            perf.month < date_range[1].date(),
+        )
+    return query.group_by(perf.scout_id).subquery()
+
+
+def ranking_from_raw(db: Session, date_range: tuple):
+    """スカウト別の集計値（月単位でない期間用。link_clicks / link_conversionsを期間で絞って集計）"""
+    is_recruit_conv = LinkConversion.conversion_type == "recruit_apply"
+    is_app_conv = LinkConversion.conversion_type == "app_register"
+    submitted_in = in_period(LinkConversion.submitted_at, date_range)
+    hired_in = in_period(LinkConversion.hired_at, date_range)
+    conv_agg = db.query(
+        LinkConversion.scout_id.label("scout_id"),
+        func.sum(case((and_(is_recruit_conv, submitted_in), 1), else_=0)).label("recruit_submissions"),
+        func.sum(case((and_(is_app_conv, submitted_in), 1), else_=0)).label("app_submissions"),
+        func.sum(case((and_(is_recruit_conv, hired_in), 1), else_=0)).label("recruit_hired"),
+        func.sum(case((and_(is_recruit_conv, earned_in(date_range)), LinkConversion.scout_income), else_=0)).label("recruit_sb"),
+        func.sum(case((and_(is_app_conv, submitted_in, LinkConversion.status == "active"), 1), else_=0)).label("app_active"),
+    ).filter(or_(submitted_in, hired_in)).group_by(LinkConversion.scout_id).subquery()
+
+    is_recruit = ScoutLink.link_type == "recruit"
+    is_app = ScoutLink.link_type == "app_invite"
+    click_agg = db.query(
+        ScoutLink.scout_id.label("scout_id"),
+        func.sum(case((is_recruit, 1), else_=0)).label("recruit_clicks"),
+        func.sum(case((is_app, 1), else_=0)).label("app_clicks"),
+    ).join(LinkClick, LinkClick.link_id == ScoutLink.id).filter(
+        in_period(LinkClick.clicked_at, date_range)
+    ).group_by(ScoutLink.scout_id).subquery()
+
+    return db.query(
+        Scout.id.label("scout_id"),
+        click_agg.c.recruit_clicks,
+        conv_agg.c.recruit_submissions,
+        conv_agg.c.recruit_hired,
+        conv_agg.c.recruit_sb,
+        click_agg.c.app_clicks,
+        conv_agg.c.app_submissions,
+        conv_agg.c.app_active,
+    ).outerjoin(conv_agg, conv_agg.c.scout_id == Scout.id).outerjoin(
+        click_agg, click_agg.c.scout_id == Scout.id
+    ).subquery()
+
+
+def is_month_aligned(date_range: Optional[tuple]) -> bool:
+    """月次集計で答えられる期間か（全期間・月初〜月初）"""
+    if date_range is None:
+        return True
+    return all(
+        d.day == 1 and d.hour == 0 and d.minute == 0 and d.second == 0 for d in date_range
     )
 
 
@@ -241,111 +460,123 @@ def get_scouts_ranking(
     master_id: int,
     sort_by: str = "sb_earned",
     period: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=500),
+    offset: int = Query(default=0, ge=0),
     db: Session = Depends(get_db)
 ):
-    """全スカウトの成績ランキング"""
+    """
+    全スカウトの成績ランキング
+    集計値はscout_performance（月次集計）から読み、並び替え・順位付けまで1クエリで行う（順位はウィンドウ関数）。
+    period指定時はクリック・応募・採用・SBをその期間の発生分だけで集計する。
+    """
     verify_master(master_id, db)
-    
-    scouts = db.query(Scout).all()
-    
-    result = []
-    for scout in scouts:
-        # recruit統計
-        recruit_links = db.query(ScoutLink).filter(
-            ScoutLink.scout_id == scout.id,
-            ScoutLink.link_type == "recruit"
-        ).all()
-        
-        recruit_clicks = sum(link.click_count for link in recruit_links)
-        recruit_submissions = sum(link.submission_count for link in recruit_links)
-        recruit_cvr = round((recruit_submissions / recruit_clicks * 100), 1) if recruit_clicks > 0 else 0.0
-        
-        recruit_conversions = db.query(LinkConversion).filter(
-            LinkConversion.scout_id == scout.id,
-            LinkConversion.conversion_type == "recruit_apply"
-        ).all()
-        
-        recruit_hired = sum(1 for c in recruit_conversions if c.hired_at)
-        recruit_sb = sum(float(c.scout_income or 0) for c in recruit_conversions)
-        
-        # app_invite統計
-        app_links = db.query(ScoutLink).filter(
-            ScoutLink.scout_id == scout.id,
-            ScoutLink.link_type == "app_invite"
-        ).all()
-        
-        app_clicks = sum(link.click_count for link in app_links)
-        app_submissions = sum(link.submission_count for link in app_links)
-        app_cvr = round((app_submissions / app_clicks * 100), 1) if app_clicks > 0 else 0.0
-        
-        app_conversions = db.query(LinkConversion).filter(
-            LinkConversion.scout_id == scout.id,
-            LinkConversion.conversion_type == "app_register",
-            LinkConversion.status == "active"
-        ).count()
-        
-        result.append({
-            "scout_id": scout.id,
-            "name": scout.name,
-            "recruit": {
-                "links": len(recruit_links),
-                "clicks": recruit_clicks,
-                "submissions": recruit_submissions,
-                "cvr": recruit_cvr,
-                "hired": recruit_hired,
-                "sb_earned": int(recruit_sb),
+    date_range = parse_period(period)
+
+    if is_month_aligned(date_range):
+        agg = ranking_from_rollup(db, date_range)
+    else:
+        agg = ranking_from_raw(db, date_range)
+
+    # リンク数（期間に関係なく現在のリンク）
+    link_agg = db.query(
+        ScoutLink.scout_id.label("scout_id"),
+        func.sum(case((ScoutLink.link_type == "recruit", 1), else_=0)).label("recruit_links"),
+        func.sum(case((ScoutLink.link_type == "app_invite", 1), else_=0)).label("app_links"),
+    ).group_by(ScoutLink.scout_id).subquery()
+
+    recruit_clicks = func.coalesce(agg.c.recruit_clicks, 0)
+    recruit_submissions = func.coalesce(agg.c.recruit_submissions, 0)
+    recruit_sb = func.coalesce(agg.c.recruit_sb, 0)
+    app_clicks = func.coalesce(agg.c.app_clicks, 0)
+    app_submissions = func.coalesce(agg.c.app_submissions, 0)
+    recruit_cvr = cvr_expr(recruit_submissions, recruit_clicks)
+    app_cvr = cvr_expr(app_submissions, app_clicks)
+
+    sort_expr = {
+        "sb_earned": recruit_sb,
+        "submissions": recruit_submissions + app_submissions,
+        "cvr": recruit_cvr,
+    }.get(sort_by)
+    ordering = (sort_expr.desc(), Scout.id) if sort_expr is not None else (Scout.id,)
+
+    rows = db.query(
+        Scout.id,
+        Scout.name,
+        func.coalesce(link_agg.c.recruit_links, 0),
+        recruit_clicks,
+        recruit_submissions,
+        recruit_cvr,
+        func.coalesce(agg.c.recruit_hired, 0),
+        recruit_sb,
+        func.coalesce(link_agg.c.app_links, 0),
+        app_clicks,
+        app_submissions,
+        app_cvr,
+        func.coalesce(agg.c.app_active, 0),
+        func.row_number().over(order_by=ordering).label("rank"),
+        func.count().over().label("total_scouts"),
+    ).outerjoin(link_agg, link_agg.c.scout_id == Scout.id).outerjoin(
+        agg, agg.c.scout_id == Scout.id
+    ).order_by(*ordering).offset(offset).limit(limit).all()
+
+    scouts = []
+    for row in rows:
+        (
+            scout_id, name, r_links, r_clicks, r_subs, r_cvr, r_hired, r_sb,
+            a_links, a_clicks, a_subs, a_cvr, a_active, rank, _,
+        ) = row
+        scouts.append(ScoutPerformance(
+            scout_id=scout_id,
+            name=name,
+            recruit={
+                "links": int(r_links),
+                "clicks": int(r_clicks),
+                "submissions": int(r_subs),
+                "cvr": float(r_cvr),
+                "hired": int(r_hired),
+                "sb_earned": int(r_sb),
             },
-            "app_invite": {
-                "links": len(app_links),
-                "clicks": app_clicks,
-                "submissions": app_submissions,
-                "cvr": app_cvr,
-                "active_users": app_conversions,
+            app_invite={
+                "links": int(a_links),
+                "clicks": int(a_clicks),
+                "submissions": int(a_subs),
+                "cvr": float(a_cvr),
+                "active_users": int(a_active),
             },
-            "total_score": int(recruit_sb),
-        })
-    
-    # ソート
-    if sort_by == "sb_earned":
-        result.sort(key=lambda x: x["recruit"]["sb_earned"], reverse=True)
-    elif sort_by == "submissions":
-        result.sort(key=lambda x: x["recruit"]["submissions"] + x["app_invite"]["submissions"], reverse=True)
-    elif sort_by == "cvr":
-        result.sort(key=lambda x: x["recruit"]["cvr"], reverse=True)
-    
-    # ランク付与
-    for idx, scout_data in enumerate(result, 1):
-        scout_data["rank"] = idx
-    
-    return ScoutsRankingResponse(
-        scouts=[ScoutPerformance(**s) for s in result],
-        total_scouts=len(scouts)
-    )
+            total_score=int(r_sb),
+            rank=rank,
+        ))
+
+    # offsetが件数を超えた場合は行が無いので別途数える
+    total_scouts = rows[0][-1] if rows else db.query(Scout).count()
+    return ScoutsRankingResponse(scouts=scouts, total_scouts=total_scouts)
 
 
 @router.get("/scouts/{scout_id}")
 def get_scout_detail(
     scout_id: int,
     master_id: int,
-    db: Session = Depends(get_db)
+    months: int = Query(default=12, ge=1, le=24),
+    db: Session = Depends(get_db),
+    loader: EntityLoader = Depends(get_loader),
 ):
-    """特定スカウトの詳細データ"""
+    """特定スカウトの詳細データ（monthly_trendは直近months か月分）"""
     verify_master(master_id, db)
     
     scout = db.query(Scout).filter(Scout.id == scout_id).first()
     if not scout:
         raise HTTPException(status_code=404, detail="Scout not found")
     
-    # リンク一覧
     links = db.query(ScoutLink).filter(ScoutLink.scout_id == scout_id).all()
+    conversions = db.query(LinkConversion).filter(LinkConversion.scout_id == scout_id).all()
+    
+    loader.want(Shop, [item.shop_id for item in links + conversions])
+    
+    # リンク一覧
     links_data = []
     
     for link in links:
-        shop_name = None
-        if link.shop_id:
-            shop = db.query(Shop).filter(Shop.id == link.shop_id).first()
-            if shop:
-                shop_name = shop.name
+        shop_name = loader.name(Shop, link.shop_id)
         
         cvr = round((link.submission_count / link.click_count * 100), 1) if link.click_count > 0 else 0.0
         
@@ -364,15 +595,10 @@ def get_scout_detail(
         })
     
     # コンバージョン一覧
-    conversions = db.query(LinkConversion).filter(LinkConversion.scout_id == scout_id).all()
     conversions_data = []
     
     for conv in conversions:
-        shop_name = None
-        if conv.shop_id:
-            shop = db.query(Shop).filter(Shop.id == conv.shop_id).first()
-            if shop:
-                shop_name = shop.name
+        shop_name = loader.name(Shop, conv.shop_id)
         
         conversions_data.append({
             "id": conv.id,
@@ -386,15 +612,15 @@ def get_scout_detail(
             "notes": conv.notes,
         })
     
-    # 月次トレンド（簡易版）
-    monthly_trend = []  # TODO: 実装
+    # 月次トレンド（scout_performanceの月次集計から）
+    trend = monthly_trend(db, scout_id, months)
     
     return {
         "scout_id": scout.id,
         "name": scout.name,
         "links": links_data,
         "conversions": conversions_data,
-        "monthly_trend": monthly_trend,
+        "monthly_trend": trend,
     }
 
 
@@ -405,12 +631,25 @@ def get_all_conversions(
     status: str = Query(default="all"),
     scout_id: Optional[int] = None,
     search: Optional[str] = None,
-    sort: str = "newest",
-    page: int = 1,
-    db: Session = Depends(get_db)
+    sort: str = Query("newest", pattern="^(newest|oldest)$"),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=settings.TRACKING_MAX_PER_PAGE),
+    cursor: Optional[str] = None,
+    pagination: str = Query("offset", pattern="^(offset|cursor)$"),
+    count: Optional[str] = Query(None, pattern="^(exact|estimated|none)$"),
+    db: Session = Depends(get_db),
+    loader: EntityLoader = Depends(get_loader),
 ):
-    """全スカウトのコンバージョン一覧"""
+    """
+    全スカウトのコンバージョン一覧（(created_at, id) 順）
+    - pagination=cursor または cursor指定時はキーセット方式。レスポンスのnext_cursorを次回渡す
+    - count: exact（COUNT）/ estimated（プランナー推定値。PostgreSQL以外はexact）/ none（件数を返さない）
+      未指定ならオフセット方式はexact、キーセット方式はnone（ページごとのCOUNTを避ける）
+    """
     verify_master(master_id, db)
+    keyset = bool(cursor) or pagination == "cursor"
+    if count is None:
+        count = "none" if keyset else "exact"
     
     query = db.query(LinkConversion)
     
@@ -426,27 +665,36 @@ def get_all_conversions(
     if search:
         query = query.filter(LinkConversion.name.ilike(f"%{search}%"))
     
-    # ソート
-    if sort == "newest":
-        query = query.order_by(desc(LinkConversion.created_at))
-    elif sort == "oldest":
-        query = query.order_by(LinkConversion.created_at)
-    
-    # ページネーション
-    per_page = 20
-    total = query.count()
-    conversions = query.offset((page - 1) * per_page).limit(per_page).all()
+    # 件数
+    total = None
+    if count == "estimated":
+        total = estimate_count(db, query)
+    if count == "exact" or (count == "estimated" and total is None):
+        total = query.with_entities(func.count(LinkConversion.id)).scalar()
+    
+    descending = sort == "newest"
+    query = query.order_by(*keyset_order(LinkConversion, descending))
+    
+    next_cursor = None
+    if keyset:
+        # キーセット: 1件多く取得して次ページの有無を判定
+        if cursor:
+            query = query.filter(keyset_after(LinkConversion, cursor, descending))
+        conversions = query.limit(per_page + 1).all()
+        if len(conversions) > per_page:
+            conversions = conversions[:per_page]
+            next_cursor = cursor_for(conversions[-1])
+        page = None
+    else:
+        conversions = query.offset((page - 1) * per_page).limit(per_page).all()
+        if len(conversions) == per_page:
+            next_cursor = cursor_for(conversions[-1])
     
     # データ整形
+    loader.want(Scout, [conv.scout_id for conv in conversions])
+    loader.want(Shop, [conv.shop_id for conv in conversions])
     result = []
     for conv in conversions:
-        scout = db.query(Scout).filter(Scout.id == conv.scout_id).first()
-        shop_name = None
-        if conv.shop_id:
-            shop = db.query(Shop).filter(Shop.id == conv.shop_id).first()
-            if shop:
-                shop_name = shop.name
-        
         result.append(ConversionItem(
             id=conv.id,
             conversion_type=conv.conversion_type,
@@ -454,9 +702,9 @@ def get_all_conversions(
             line_id=conv.line_id,
             age=conv.age,
             status=conv.status,
-            scout_name=scout.name if scout else "",
+            scout_name=loader.name(Scout, conv.scout_id, ""),
             scout_id=conv.scout_id,
-            shop_name=shop_name,
+            shop_name=loader.name(Shop, conv.shop_id),
             submitted_at=conv.submitted_at.isoformat() if conv.submitted_at else "",
             contacted_at=conv.contacted_at.isoformat() if conv.contacted_at else None,
             interviewed_at=conv.interviewed_at.isoformat() if conv.interviewed_at else None,
@@ -470,6 +718,8 @@ def get_all_conversions(
         total=total,
         page=page,
         per_page=per_page,
+        total_pages=(total + per_page - 1) // per_page if total is not None and page else None,
+        next_cursor=next_cursor,
     )
 
 
@@ -487,6 +737,8 @@ def update_conversion_status_master(
     if not conversion:
         raise HTTPException(status_code=404, detail="Conversion not found")
     
+    before = conversion_contributions(conversion)
+    from_status = conversion.status
     conversion.status = request.status
     conversion.notes = request.notes
     
@@ -525,6 +777,9 @@ def update_conversion_status_master(
             cast.status = '稼働中'
     
     conversion.updated_at = now
+    record_conversion_change(db, conversion, before)
+    if from_status != conversion.status:
+        record_status_event(db, conversion, from_status, actor_id=master_id, actor_role="master", at=now)
     db.commit()
     
     return {"success": True, "status": conversion.status}
@@ -544,6 +799,8 @@ def update_sb_amount(
     if not conversion:
         raise HTTPException(status_code=404, detail="Conversion not found")
     
+    before = conversion_contributions(conversion)
+    was_paid = conversion.is_sb_paid
     conversion.sb_amount = request.sb_amount
     conversion.scout_income = request.scout_income
     conversion.is_sb_paid = request.is_sb_paid
@@ -553,6 +810,11 @@ def update_sb_amount(
         conversion.sb_paid_at = datetime.now()
     
     conversion.updated_at = datetime.now()
+    record_conversion_change(db, conversion, before)
+    if request.is_sb_paid and not was_paid:
+        record_status_event(
+            db, conversion, conversion.status, actor_id=master_id, actor_role="master", event_type="sb_paid",
+        )
     db.commit()
     
     return {"success": True}
@@ -564,23 +826,17 @@ def bulk_pay_sb(
     request: BulkPayRequest,
     db: Session = Depends(get_db)
 ):
-    """SB一括支払い処理"""
+    """SB一括支払い処理（チャンクごとに set-based UPDATE。chunksに各チャンクの結果）"""
     verify_master(master_id, db)
     
-    conversions = db.query(LinkConversion).filter(
-        LinkConversion.id.in_(request.conversion_ids)
-    ).all()
-    
-    now = datetime.now()
-    for conv in conversions:
-        conv.is_sb_paid = True
-        conv.sb_paid_at = now
-        conv.notes = f"{conv.notes}\n{request.notes}" if conv.notes else request.notes
-        conv.updated_at = now
-    
-    db.commit()
-    
-    return {"success": True, "paid_count": len(conversions)}
+    return pay_conversions(
+        db,
+        master_id,
+        request.conversion_ids,
+        request.notes,
+        chunk_size=settings.SB_BULK_PAY_CHUNK_SIZE,
+        idempotency_key=request.idempotency_key,
+    )
 
 
 @router.get("/links")
@@ -590,7 +846,8 @@ def get_all_links(
     scout_id: Optional[int] = None,
     is_active: Optional[bool] = None,
     sort: str = "newest",
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    loader: EntityLoader = Depends(get_loader),
 ):
     """全スカウトのリンク一覧"""
     verify_master(master_id, db)
@@ -615,25 +872,20 @@ def get_all_links(
     
     links = query.all()
     
+    loader.want(Scout, [link.scout_id for link in links])
+    loader.want(Shop, [link.shop_id for link in links])
     result = []
     for link in links:
-        scout = db.query(Scout).filter(Scout.id == link.scout_id).first()
-        shop_name = None
-        if link.shop_id:
-            shop = db.query(Shop).filter(Shop.id == link.shop_id).first()
-            if shop:
-                shop_name = shop.name
-        
         cvr = round((link.submission_count / link.click_count * 100), 1) if link.click_count > 0 else 0.0
         
         result.append({
             "id": link.id,
-            "scout_name": scout.name if scout else "",
+            "scout_name": loader.name(Scout, link.scout_id, ""),
             "scout_id": link.scout_id,
             "link_type": link.link_type,
             "unique_code": link.unique_code,
             "short_url": link.short_url,
-            "shop_name": shop_name,
+            "shop_name": loader.name(Shop, link.shop_id),
             "click_count": link.click_count,
             "submission_count": link.submission_count,
             "cvr": cvr,
@@ -722,82 +974,53 @@ def generate_link_for_scout(
 @router.get("/daily-report", response_model=DailyReportResponse)
 def get_daily_report(
     master_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    loader: EntityLoader = Depends(get_loader),
 ):
     """今日のデータ速報"""
     verify_master(master_id, db)
     
     today = date.today()
+    today_range = day_range(today)
     
     # 今日のクリック数
-    new_clicks = db.query(LinkClick).filter(
-        func.date(LinkClick.clicked_at) == today
-    ).count()
+    new_clicks = db.query(func.count(LinkClick.id)).filter(
+        in_period(LinkClick.clicked_at, today_range)
+    ).scalar()
     
     # 今日の応募数
-    new_submissions = db.query(LinkConversion).filter(
-        func.date(LinkConversion.submitted_at) == today
-    ).count()
-    
-    # 今日のステータス変更（updated_atが今日のもの）
-    status_changes = db.query(LinkConversion).filter(
-        func.date(LinkConversion.updated_at) == today,
-        LinkConversion.status != 'submitted'
-    ).all()
-    
+    new_submissions = db.query(func.count(LinkConversion.id)).filter(
+        in_period(LinkConversion.submitted_at, today_range)
+    ).scalar()
+    
+    # 今日のステータス変更（遷移ログから）
+    event = ConversionStatusEvent
+    status_changes = db.query(event, LinkConversion.name).join(
+        LinkConversion, LinkConversion.id == event.conversion_id
+    ).filter(
+        in_period(event.created_at, today_range),
+        event.event_type == "status",
+    ).order_by(event.created_at, event.id).all()
+    
+    loader.want(Scout, [change.scout_id for change, _ in status_changes])
     changes_list = []
-    for conv in status_changes:
-        scout = db.query(Scout).filter(Scout.id == conv.scout_id).first()
+    for change, name in status_changes:
         changes_list.append({
-            "name": conv.name,
-            "from": "submitted",  # TODO: 前のステータスを保存する必要がある
-            "to": conv.status,
-            "scout": scout.name if scout else "",
+            "name": name,
+            "from": change.from_status,
+            "to": change.to_status,
+            "scout": loader.name(Scout, change.scout_id, ""),
+            "at": change.created_at.isoformat() if change.created_at else None,
         })
     
     # 今日のアプリ登録
-    new_app_registrations = db.query(LinkConversion).filter(
-        func.date(LinkConversion.registered_at) == today,
+    new_app_registrations = db.query(func.count(LinkConversion.id)).filter(
+        in_period(LinkConversion.registered_at, today_range),
         LinkConversion.conversion_type == "app_register"
-    ).count()
-    
-    # アラート生成（簡易版）
-    alerts = []
-    
-    # 低CVRスカウトを検出
-    scouts = db.query(Scout).all()
-    for scout in scouts:
-        links = db.query(ScoutLink).filter(
-            ScoutLink.scout_id == scout.id,
-            ScoutLink.link_type == "recruit"
-        ).all()
-        
-        total_clicks = sum(link.click_count for link in links)
-        total_subs = sum(link.submission_count for link in links)
-        
-        if total_clicks > 30:  # 最低30クリックあるスカウトのみ判定
-            cvr = (total_subs / total_clicks * 100) if total_clicks > 0 else 0
-            if cvr < 5:
-                alerts.append({
-                    "type": "low_cvr",
-                    "message": f"{scout.name}のCVRが{cvr:.1f}%。リンクの見直しを推奨"
-                })
-    
-    # ハイパフォーマー検出
-    for scout in scouts:
-        hired_count = db.query(LinkConversion).filter(
-            LinkConversion.scout_id == scout.id,
-            LinkConversion.conversion_type == "recruit_apply",
-            LinkConversion.hired_at.isnot(None),
-            extract('month', LinkConversion.hired_at) == today.month,
-            extract('year', LinkConversion.hired_at) == today.year
-        ).count()
-        
-        if hired_count >= 10:
-            alerts.append({
-                "type": "high_performer",
-                "message": f"{scout.name}が今月{hired_count}人採用。過去最高ペース"
-            })
+    ).scalar()
+    
+    # アラート（全ルールを1回の集計で評価。当日分はキャッシュ）
+    alerts = daily_alerts.alerts(db, today)
     
     return DailyReportResponse(
         date=today.isoformat(),
@@ -807,3 +1030,78 @@ def get_daily_report(
         new_app_registrations=new_app_registrations,
         alerts=alerts,
     )
+
+
+@router.get("/status-events")
+def get_status_events(
+    master_id: int,
+    period: Optional[str] = None,
+    conversion_id: Optional[int] = None,
+    scout_id: Optional[int] = None,
+    event_type: Optional[str] = None,
+    cursor: Optional[str] = None,
+    per_page: int = Query(default=50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    loader: EntityLoader = Depends(get_loader),
+):
+    """ステータス遷移の監査ログ（新しい順・(created_at, id)のキーセット）"""
+    verify_master(master_id, db)
+    
+    event = ConversionStatusEvent
+    query = db.query(event, LinkConversion.name).join(
+        LinkConversion, LinkConversion.id == event.conversion_id
+    )
+    date_range = parse_period(period)
+    if date_range is not None:
+        query = query.filter(in_period(event.created_at, date_range))
+    if conversion_id:
+        query = query.filter(event.conversion_id == conversion_id)
+    if scout_id:
+        query = query.filter(event.scout_id == scout_id)
+    if event_type:
+        query = query.filter(event.event_type == event_type)
+    if cursor:
+        query = query.filter(keyset_after(event, cursor))
+    
+    rows = query.order_by(*keyset_order(event)).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    
+    loader.want(Scout, [change.scout_id for change, _ in rows] + [change.actor_id for change, _ in rows])
+    events = [
+        {
+            "id": change.id,
+            "conversion_id": change.conversion_id,
+            "name": name,
+            "event_type": change.event_type,
+            "from": change.from_status,
+            "to": change.to_status,
+            "scout_id": change.scout_id,
+            "scout": loader.name(Scout, change.scout_id, ""),
+            "actor_id": change.actor_id,
+            "actor": loader.name(Scout, change.actor_id),
+            "actor_role": change.actor_role,
+            "created_at": change.created_at.isoformat() if change.created_at else None,
+        }
+        for change, name in rows
+    ]
+    return {
+        "events": events,
+        "next_cursor": cursor_for(rows[-1][0]) if has_more else None,
+    }
+
+
+@router.get("/stage-durations")
+def get_stage_durations(
+    master_id: int,
+    period: Optional[str] = None,
+    scout_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """ステージごとの平均・最大滞在時間（期間内にそのステージを抜けた遷移が対象）"""
+    verify_master(master_id, db)
+    
+    return {
+        "period": period or "all",
+        "stages": stage_durations(db, parse_period(period), scout_id),
+    }
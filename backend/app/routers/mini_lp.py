@@ -4,6 +4,9 @@ from pydantic import BaseModel
 from typing import Optional
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.loaders import EntityLoader, get_loader
+from app.core.scout_performance import record_click, record_conversion_change
+from app.core.status_events import record_status_event
 from app.models import ScoutLink, Scout, Shop, LinkClick, LinkConversion
 from datetime import datetime
 
@@ -76,14 +79,19 @@ async def redirect_short_url(
     client_ip = request.client.host if request.client else ""
     user_agent = request.headers.get("user-agent", "")
     referer = request.headers.get("referer", "")
+    clicked_at = datetime.now()
     
     click_log = LinkClick(
         link_id=link.id,
         ip_address=client_ip,
         user_agent=user_agent,
         referer=referer,
+        clicked_at=clicked_at,
     )
     db.add(click_log)
+    
+    # 月次集計に加算（同じトランザクション）
+    record_click(db, link, clicked_at)
     db.commit()
     
     # リダイレクト先を返す
@@ -98,7 +106,11 @@ async def redirect_short_url(
 
 
 @router.get("/lp/data/{unique_code}")
-def get_lp_data(unique_code: str, db: Session = Depends(get_db)):
+def get_lp_data(
+    unique_code: str,
+    db: Session = Depends(get_db),
+    loader: EntityLoader = Depends(get_loader),
+):
     """ミニLPに表示するデータを返す"""
     
     try:
@@ -107,18 +119,11 @@ def get_lp_data(unique_code: str, db: Session = Depends(get_db)):
         if not link:
             return cors_response({"is_valid": False, "error": "Link not found"}, 404)
         
-        # スカウト情報取得
-        scout = db.query(Scout).filter(Scout.id == link.scout_id).first()
-        scout_name = scout.name if scout else "スカウト"
-        
-        # 店舗情報取得
-        shop_name = None
-        shop_area = None
-        if link.shop_id:
-            shop = db.query(Shop).filter(Shop.id == link.shop_id).first()
-            if shop:
-                shop_name = shop.name
-                shop_area = shop.area if hasattr(shop, 'area') else None
+        # スカウト・店舗情報取得
+        scout_name = loader.name(Scout, link.scout_id, "スカウト")
+        shop = loader.get(Shop, link.shop_id)
+        shop_name = shop.name if shop else None
+        shop_area = shop.area if shop else None
         
         # ヘッドライン・説明のデフォルト
         if link.link_type == "recruit":
@@ -177,9 +182,18 @@ def submit_lp_form(
             age=request.age,
             shop_id=link.shop_id,
             status="submitted",
+            submitted_at=datetime.now(),
         )
         
         db.add(conversion)
+        db.flush()
+        
+        # 月次集計・遷移ログ（同じトランザクション）
+        record_conversion_change(db, conversion, {})
+        record_status_event(
+            db, conversion, None, actor_id=None, actor_role="applicant",
+            event_type="submitted", at=conversion.submitted_at,
+        )
         db.commit()
         
         return cors_response({
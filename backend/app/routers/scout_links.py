@@ -4,7 +4,10 @@ from typing import Optional, List
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.core.database import get_db
-from app.models import ScoutLink, Scout, Shop, LinkConversion
+from app.core.loaders import EntityLoader, get_loader
+from app.core.scout_performance import conversion_contributions, record_conversion_change
+from app.core.status_events import record_status_event
+from app.models import ScoutLink, Scout, Shop, LinkConversion, ScoutPerformanceRollup
 import qrcode
 from io import BytesIO
 import base64
@@ -16,6 +19,12 @@ router = APIRouter()
 
 SMARTNR_BASE_URL = os.getenv("SMARTNR_BASE_URL", "http://localhost:3000")
 
+# ダッシュボードで読む scout_performance の列
+DASHBOARD_COLUMNS = (
+    "clicks", "submissions", "contacted", "interviewed", "trial", "hired", "registered",
+    "active", "churned", "scout_income", "unpaid_scout_income",
+)
+
 
 class LinkGenerateRequest(BaseModel):
     scout_id: int
@@ -179,7 +188,8 @@ def generate_link(request: LinkGenerateRequest, db: Session = Depends(get_db)):
 def get_my_links(
     scout_id: int,
     link_type: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    loader: EntityLoader = Depends(get_loader),
 ):
     """自分が発行したリンク一覧"""
     
@@ -190,14 +200,9 @@ def get_my_links(
     
     links = query.order_by(ScoutLink.created_at.desc()).all()
     
+    loader.want(Shop, [link.shop_id for link in links])
     result = []
     for link in links:
-        shop_name = None
-        if link.shop_id:
-            shop = db.query(Shop).filter(Shop.id == link.shop_id).first()
-            if shop:
-                shop_name = shop.name
-        
         cvr = round((link.submission_count / link.click_count * 100), 1) if link.click_count > 0 else 0.0
         
         result.append(MyLinkItem(
@@ -205,7 +210,7 @@ def get_my_links(
             link_type=link.link_type,
             unique_code=link.unique_code,
             short_url=link.short_url,
-            shop_name=shop_name,
+            shop_name=loader.name(Shop, link.shop_id),
             click_count=link.click_count,
             submission_count=link.submission_count,
             cvr=cvr,
@@ -219,75 +224,68 @@ def get_my_links(
 
 @router.get("/dashboard", response_model=DashboardResponse)
 def get_dashboard(scout_id: int, db: Session = Depends(get_db)):
-    """スカウト個人のダッシュボード統計"""
-    
-    # recruit統計
-    recruit_links = db.query(ScoutLink).filter(
-        ScoutLink.scout_id == scout_id,
-        ScoutLink.link_type == "recruit"
-    ).all()
+    """
+    スカウト個人のダッシュボード統計
+    クリック・応募・ファネル・SBは月次集計（scout_performance）の全期間合計。
+    ファネルの各段階はそのステータスに到達した件数（マスターのoverviewと同じ数え方）。
+    """
+    
+    # リンク数（link_typeごと）
+    link_counts = dict(db.query(ScoutLink.link_type, func.count(ScoutLink.id)).filter(
+        ScoutLink.scout_id == scout_id
+    ).group_by(ScoutLink.link_type).all())
+    
+    # 月次集計の全期間合計（link_typeごとに1行）
+    perf = ScoutPerformanceRollup
+    totals = {
+        row[0]: row[1:]
+        for row in db.query(
+            perf.link_type,
+            *[func.coalesce(func.sum(getattr(perf, column)), 0) for column in DASHBOARD_COLUMNS],
+        ).filter(perf.scout_id == scout_id).group_by(perf.link_type).all()
+    }
     
-    recruit_clicks = sum(link.click_count for link in recruit_links)
-    recruit_submissions = sum(link.submission_count for link in recruit_links)
-    recruit_cvr = round((recruit_submissions / recruit_clicks * 100), 1) if recruit_clicks > 0 else 0.0
+    def stats(link_type: str) -> dict:
+        values = totals.get(link_type, (0,) * len(DASHBOARD_COLUMNS))
+        return {column: value for column, value in zip(DASHBOARD_COLUMNS, values)}
     
-    # recruitファネル
-    recruit_conversions = db.query(LinkConversion).filter(
-        LinkConversion.scout_id == scout_id,
-        LinkConversion.conversion_type == "recruit_apply"
-    ).all()
+    def cvr(values: dict) -> float:
+        clicks = values["clicks"]
+        return round((values["submissions"] / clicks * 100), 1) if clicks > 0 else 0.0
     
+    recruit = stats("recruit")
     recruit_funnel = {
-        "submitted": sum(1 for c in recruit_conversions if c.status in ['submitted', 'contacted', 'interviewed', 'trial', 'hired', 'active']),
-        "contacted": sum(1 for c in recruit_conversions if c.status in ['contacted', 'interviewed', 'trial', 'hired', 'active']),
-        "interviewed": sum(1 for c in recruit_conversions if c.status in ['interviewed', 'trial', 'hired', 'active']),
-        "trial": sum(1 for c in recruit_conversions if c.status in ['trial', 'hired', 'active']),
-        "hired": sum(1 for c in recruit_conversions if c.status in ['hired', 'active']),
-        "active": sum(1 for c in recruit_conversions if c.status == 'active'),
+        "submitted": int(recruit["submissions"]),
+        "contacted": int(recruit["contacted"]),
+        "interviewed": int(recruit["interviewed"]),
+        "trial": int(recruit["trial"]),
+        "hired": int(recruit["hired"]),
+        "active": int(recruit["active"]),
     }
     
-    # SB合計
-    total_sb = sum(float(c.scout_income or 0) for c in recruit_conversions)
-    unpaid_sb = sum(float(c.scout_income or 0) for c in recruit_conversions if not c.is_sb_paid)
-    
-    # app_invite統計
-    app_links = db.query(ScoutLink).filter(
-        ScoutLink.scout_id == scout_id,
-        ScoutLink.link_type == "app_invite"
-    ).all()
-    
-    app_clicks = sum(link.click_count for link in app_links)
-    app_submissions = sum(link.submission_count for link in app_links)
-    app_cvr = round((app_submissions / app_clicks * 100), 1) if app_clicks > 0 else 0.0
-    
-    # app_inviteファネル
-    app_conversions = db.query(LinkConversion).filter(
-        LinkConversion.scout_id == scout_id,
-        LinkConversion.conversion_type == "app_register"
-    ).all()
-    
+    app = stats("app_invite")
     app_funnel = {
-        "submitted": sum(1 for c in app_conversions if c.status in ['submitted', 'registered', 'active']),
-        "registered": sum(1 for c in app_conversions if c.status in ['registered', 'active']),
-        "active": sum(1 for c in app_conversions if c.status == 'active'),
-        "churned": sum(1 for c in app_conversions if c.status == 'churned'),
+        "submitted": int(app["submissions"]),
+        "registered": int(app["registered"]),
+        "active": int(app["active"]),
+        "churned": int(app["churned"]),
     }
     
     return DashboardResponse(
         recruit=DashboardStats(
-            total_links=len(recruit_links),
-            total_clicks=recruit_clicks,
-            total_submissions=recruit_submissions,
-            cvr=recruit_cvr,
+            total_links=link_counts.get("recruit", 0),
+            total_clicks=int(recruit["clicks"]),
+            total_submissions=int(recruit["submissions"]),
+            cvr=cvr(recruit),
             funnel=recruit_funnel,
-            total_sb_earned=int(total_sb),
-            unpaid_sb=int(unpaid_sb),
+            total_sb_earned=int(recruit["scout_income"]),
+            unpaid_sb=int(recruit["unpaid_scout_income"]),
         ),
         app_invite=DashboardStats(
-            total_links=len(app_links),
-            total_clicks=app_clicks,
-            total_submissions=app_submissions,
-            cvr=app_cvr,
+            total_links=link_counts.get("app_invite", 0),
+            total_clicks=int(app["clicks"]),
+            total_submissions=int(app["submissions"]),
+            cvr=cvr(app),
             funnel=app_funnel,
         )
     )
@@ -370,6 +368,8 @@ def update_conversion_status(
     if not conversion:
         raise HTTPException(status_code=404, detail="Conversion not found")
     
+    before = conversion_contributions(conversion)
+    from_status = conversion.status
     conversion.status = request.status
     conversion.notes = request.notes
     
@@ -389,6 +389,9 @@ def update_conversion_status(
         conversion.registered_at = now
     
     conversion.updated_at = now
+    record_conversion_change(db, conversion, before)
+    if from_status != conversion.status:
+        record_status_event(db, conversion, from_status, actor_id=scout_id, actor_role="scout", at=now)
     db.commit()
     
     return {"success": True, "status": conversion.status}
@@ -0,0 +1,153 @@
+"""
+アクセスログMiddlewareのスループット比較
+
+旧実装（BaseHTTPMiddleware + request.body()の全量読み込み）と
+現行のpure ASGI実装を、同じダミーアプリ・同じ書き込みキューで比較する。
+Supabaseには接続しない（INSERTは捨てる）。
+
+実行: cd backend && python -m benchmarks.bench_access_log_middleware
+"""
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SUPABASE_URL", "https://example.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYmVuY2gifQ.bench")
+os.environ.setdefault("XAI_API_KEY", "bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from app.middleware.access_logger import AccessLogMiddleware, mask_sensitive_data
+from app.middleware.auth_identity import IdentityResolver
+from app.middleware.log_writer import AccessLogWriter
+
+JSON_REQUESTS = 2000
+UPLOAD_REQUESTS = 100
+STREAM_REQUESTS = 500
+UPLOAD_SIZE = 5 * 1024 * 1024  # 5MB（顔写真・キャスト画像想定）
+
+
+class _NullTable:
+    def insert(self, rows):
+        return self
+
+    def execute(self):
+        return None
+
+
+class _NullSupabase:
+    def table(self, name):
+        return _NullTable()
+
+
+class LegacyAccessLogMiddleware(BaseHTTPMiddleware):
+    """比較用：旧実装のボディ処理（全量バッファ＋json.loads）"""
+
+    def __init__(self, app, writer: AccessLogWriter):
+        super().__init__(app)
+        self.writer = writer
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        body_summary = ""
+        if request.method in ("POST", "PUT", "PATCH"):
+            try:
+                body = await request.body()
+                if body:
+                    body_summary = mask_sensitive_data(json.loads(body))
+                request._body = body
+            except Exception:
+                body_summary = "(unreadable)"
+        response = await call_next(request)
+        self.writer.enqueue({
+            "request_path": request.url.path,
+            "request_body_summary": body_summary,
+            "response_status": response.status_code,
+            "response_time_ms": int((time.time() - start_time) * 1000),
+        })
+        return response
+
+
+def build_app(legacy: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/items")
+    async def create_item(payload: dict):
+        return {"ok": True}
+
+    @app.post("/api/upload")
+    async def upload(file: UploadFile = File(...)):
+        size = 0
+        while chunk := await file.read(65536):
+            size += len(chunk)
+        return {"size": size}
+
+    @app.get("/api/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(50):
+                yield b"x" * 1024
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    writer = AccessLogWriter(_NullSupabase(), batch_size=500, flush_interval=0.05)
+    if legacy:
+        app.add_middleware(LegacyAccessLogMiddleware, writer=writer)
+    else:
+        app.add_middleware(
+            AccessLogMiddleware,
+            supabase_client=_NullSupabase(),
+            writer=writer,
+            identity_resolver=IdentityResolver(_NullSupabase(), remote_fallback=False),
+        )
+    return app
+
+
+async def run_case(app: FastAPI, label: str, count: int, request_kwargs: dict) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for _ in range(count):
+            response = await client.request(**request_kwargs)
+            response.read()
+        elapsed = time.perf_counter() - start
+    rps = count / elapsed
+    print(f"  {label:<28} {rps:>9.1f} req/s")
+    return rps
+
+
+async def main():
+    payload = {"name": "テスト", "phone": "090-0000-0000", "notes": "x" * 500}
+    upload = b"\xff" * UPLOAD_SIZE
+    cases = [
+        ("JSON POST", JSON_REQUESTS, {"method": "POST", "url": "/api/items", "json": payload}),
+        ("multipart 5MB upload", UPLOAD_REQUESTS, {
+            "method": "POST", "url": "/api/upload",
+            "files": {"file": ("face.jpg", upload, "image/jpeg")},
+        }),
+        ("streaming GET (50KB)", STREAM_REQUESTS, {"method": "GET", "url": "/api/stream"}),
+    ]
+
+    results = {}
+    for legacy in (True, False):
+        name = "before (BaseHTTPMiddleware)" if legacy else "after (pure ASGI)"
+        print(f"\n【{name}】")
+        app = build_app(legacy)
+        for label, count, kwargs in cases:
+            results[(label, legacy)] = await run_case(app, label, count, kwargs)
+
+    print("\n【比較】")
+    for label, _, _ in cases:
+        before = results[(label, True)]
+        after = results[(label, False)]
+        print(f"  {label:<28} x{after / before:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,164 @@
+"""
+アクセスログ検索のベンチマーク（4列ORのILIKE vs トライグラム索引付き生成列）
+
+100万行の合成ログを一時スキーマ bench_access_logs に作り、
+GET /api/admin/access-logs?search=... が発行するSQLと同じ形のクエリを両方式で実行して比較する。
+PostgreSQL（pg_trgm拡張が使えること）が必要。Supabase本番DBでは実行しないこと。
+
+実行: cd backend && BENCH_DATABASE_URL=postgresql://... python -m benchmarks.bench_access_log_search
+
+計測結果（2026-10-17, PostgreSQL 18.6, 1 vCPU / 5GB, 既定設定 shared_buffers=128MB・work_mem=4MB, 100万行）
+  合成ログ作成 5.1s / 生成列＋トライグラムインデックス作成 21.0s
+
+  検索              一覧 OR  一覧 trgm   件数 OR  件数 trgm  (ms, 中央値)
+  メール部分一致       577.4      19.8     486.6      19.4  x25
+  パス部分一致         597.1      57.7     596.5      58.3  x10
+  IP部分一致           161.7      25.3     559.8      25.9  x22
+  エラーメッセージ       2.2       3.1     422.0      33.4  x13
+  ヒットなし           581.5       0.1     410.3       0.1  x4367
+
+  ヒットの多い語（エラーメッセージ）は新しい順に50件読めば済むためOR検索でも一覧は速いが、
+  件数（COUNT）は全件走査になる。それ以外は一覧・件数ともトライグラム索引で10倍以上速い。
+"""
+import os
+import statistics
+import time
+
+import psycopg2
+
+ROWS = int(os.environ.get("BENCH_ROWS", "1000000"))
+REPEAT = 5
+PAGE = 50
+
+# (ラベル, 検索語)
+SEARCHES = [
+    ("メール部分一致", "user4821"),
+    ("パス部分一致", "/api/shops/7731"),
+    ("IP部分一致", "10.3.77."),
+    ("エラーメッセージ", "timeout"),
+    ("ヒットなし", "zzzqqq"),
+]
+
+SETUP_SQL = f"""
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+DROP SCHEMA IF EXISTS bench_access_logs CASCADE;
+CREATE SCHEMA bench_access_logs;
+CREATE TABLE bench_access_logs.admin_access_logs (
+  id BIGSERIAL PRIMARY KEY,
+  user_email TEXT,
+  request_method TEXT,
+  request_path TEXT,
+  response_status INTEGER,
+  ip_address TEXT,
+  error_message TEXT,
+  created_at TIMESTAMPTZ
+);
+INSERT INTO bench_access_logs.admin_access_logs
+  (user_email, request_method, request_path, response_status, ip_address, error_message, created_at)
+SELECT
+  'user' || (g % 20000) || '@example.com',
+  (ARRAY['GET', 'POST', 'PUT', 'DELETE'])[1 + g % 4],
+  (ARRAY['/api/shops/', '/api/casts/', '/api/links/', '/api/master/tracking/scouts/'])[1 + g % 4] || (g % 10000),
+  (ARRAY[200, 200, 200, 201, 404, 500])[1 + g % 6],
+  '10.' || (g % 8) || '.' || (g % 251) || '.' || (g % 199),
+  CASE WHEN g % 97 = 0 THEN 'upstream timeout after 30s' ELSE '' END,
+  NOW() - (g || ' seconds')::interval
+FROM generate_series(1, {ROWS}) AS g;
+CREATE INDEX ON bench_access_logs.admin_access_logs (created_at DESC, id DESC);
+"""
+
+# add_access_log_search_index.sql と同じ定義
+SEARCH_INDEX_SQL = """
+ALTER TABLE bench_access_logs.admin_access_logs
+  ADD COLUMN search_text TEXT
+  GENERATED ALWAYS AS (
+    lower(
+      coalesce(request_path, '') || ' ' ||
+      coalesce(user_email, '') || ' ' ||
+      coalesce(ip_address, '') || ' ' ||
+      coalesce(error_message, '')
+    )
+  ) STORED;
+CREATE INDEX ON bench_access_logs.admin_access_logs USING gin (search_text gin_trgm_ops);
+ANALYZE bench_access_logs.admin_access_logs;
+"""
+
+OR_QUERY = f"""
+SELECT id FROM bench_access_logs.admin_access_logs
+WHERE request_path ILIKE %(pattern)s OR user_email ILIKE %(pattern)s
+   OR ip_address ILIKE %(pattern)s OR error_message ILIKE %(pattern)s
+ORDER BY created_at DESC, id DESC LIMIT {PAGE}
+"""
+
+TRGM_QUERY = f"""
+SELECT id FROM bench_access_logs.admin_access_logs
+WHERE search_text ILIKE %(pattern)s
+ORDER BY created_at DESC, id DESC LIMIT {PAGE}
+"""
+
+COUNT_OR_QUERY = """
+SELECT COUNT(*) FROM bench_access_logs.admin_access_logs
+WHERE request_path ILIKE %(pattern)s OR user_email ILIKE %(pattern)s
+   OR ip_address ILIKE %(pattern)s OR error_message ILIKE %(pattern)s
+"""
+
+COUNT_TRGM_QUERY = """
+SELECT COUNT(*) FROM bench_access_logs.admin_access_logs
+WHERE search_text ILIKE %(pattern)s
+"""
+
+
+def timed(cursor, sql: str, pattern: str) -> float:
+    """REPEAT回実行した中央値（ミリ秒）"""
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        cursor.execute(sql, {"pattern": pattern})
+        cursor.fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    url = os.environ.get("BENCH_DATABASE_URL")
+    if not url:
+        raise SystemExit("BENCH_DATABASE_URL にベンチマーク用PostgreSQLの接続先を指定してください")
+
+    conn = psycopg2.connect(url)
+    conn.autocommit = True
+    cursor = conn.cursor()
+
+    print(f"合成ログ {ROWS:,} 行を作成中...")
+    start = time.perf_counter()
+    cursor.execute(SETUP_SQL)
+    cursor.execute("ANALYZE bench_access_logs.admin_access_logs")
+    print(f"  {time.perf_counter() - start:.1f}s")
+
+    baseline = {}
+    for label, term in SEARCHES:
+        pattern = f"%{term}%"
+        baseline[label] = (timed(cursor, OR_QUERY, pattern), timed(cursor, COUNT_OR_QUERY, pattern))
+
+    print("検索列・トライグラムインデックスを作成中...")
+    start = time.perf_counter()
+    cursor.execute(SEARCH_INDEX_SQL)
+    print(f"  {time.perf_counter() - start:.1f}s")
+
+    print()
+    print(f"{'検索':<12} {'一覧 OR':>10} {'一覧 trgm':>10} {'件数 OR':>10} {'件数 trgm':>10}  (ms, 中央値)")
+    for label, term in SEARCHES:
+        pattern = f"%{term.lower()}%"
+        page_trgm = timed(cursor, TRGM_QUERY, pattern)
+        count_trgm = timed(cursor, COUNT_TRGM_QUERY, pattern)
+        page_or, count_or = baseline[label]
+        print(
+            f"{label:<12} {page_or:>10.1f} {page_trgm:>10.1f} {count_or:>10.1f} {count_trgm:>10.1f}"
+            f"  x{count_or / max(count_trgm, 0.01):.0f}"
+        )
+
+    cursor.execute("DROP SCHEMA bench_access_logs CASCADE")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+-- ════════════════════════════════════════
+-- SmartNR: アクセスログ分単位サマリー
+-- 実行先: Supabase SQL Editor
+--
+-- ACCESS_LOG_POLICYで aggregate / sample を指定したルート（公開LP等）は
+-- admin_access_logsに1リクエスト1行を書かず、ここに分単位の集計行を書く。
+-- ════════════════════════════════════════
+CREATE TABLE IF NOT EXISTS access_log_route_minutes (
+  id BIGSERIAL PRIMARY KEY,
+  bucket_start TIMESTAMPTZ NOT NULL,                 -- 集計した分の開始時刻（UTC）
+  request_method TEXT NOT NULL,
+  route_template TEXT NOT NULL,                      -- "/api/r/{unique_code}" 等
+  response_status INTEGER NOT NULL,
+  request_count INTEGER NOT NULL DEFAULT 0,
+  total_response_time_ms BIGINT NOT NULL DEFAULT 0,  -- 平均 = total / count
+  max_response_time_ms INTEGER NOT NULL DEFAULT 0,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- 同じ分・ルートの行はプロセスごとに別行になるため、参照時はGROUP BYで合算する
+CREATE INDEX IF NOT EXISTS idx_route_minutes_bucket ON access_log_route_minutes(bucket_start);
+CREATE INDEX IF NOT EXISTS idx_route_minutes_route ON access_log_route_minutes(route_template, bucket_start);
+
+-- 時間別ビュー（ダッシュボード用）
+CREATE OR REPLACE VIEW access_log_route_hourly AS
+SELECT
+  date_trunc('hour', bucket_start) AS bucket_hour,
+  request_method,
+  route_template,
+  SUM(request_count) AS request_count,
+  ROUND(SUM(total_response_time_ms)::numeric / NULLIF(SUM(request_count), 0)) AS avg_response_time_ms,
+  MAX(max_response_time_ms) AS max_response_time_ms,
+  SUM(request_count) FILTER (WHERE response_status >= 400) AS error_count
+FROM access_log_route_minutes
+GROUP BY 1, 2, 3;
+
+-- RLS（service_roleのみ書き込み）
+ALTER TABLE access_log_route_minutes ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,140 @@
+-- ════════════════════════════════════════
+-- SmartNR: アクセスログ日別統計テーブル
+-- 実行先: Supabase SQL Editor
+--
+-- access_log_daily_summaryビュー（毎回admin_access_logsを集計）の置き換え。
+-- 各APIプロセスが記録した行をメモリで日別に集計し、
+-- merge_access_log_daily_stats() で差分を加算する。
+-- ユニークユーザー数・IP数はHyperLogLogレジスタ（1024バイト）をレジスタごとの最大値でマージして推定する。
+-- ════════════════════════════════════════
+CREATE TABLE IF NOT EXISTS access_log_daily_stats (
+  log_date DATE PRIMARY KEY,                          -- UTC日付
+  total_requests BIGINT NOT NULL DEFAULT 0,
+  unique_users INTEGER NOT NULL DEFAULT 0,            -- users_hllからの推定値
+  unique_ips INTEGER NOT NULL DEFAULT 0,              -- ips_hllからの推定値
+  login_count BIGINT NOT NULL DEFAULT 0,
+  error_count BIGINT NOT NULL DEFAULT 0,              -- response_status >= 400
+  create_count BIGINT NOT NULL DEFAULT 0,
+  update_count BIGINT NOT NULL DEFAULT 0,
+  delete_count BIGINT NOT NULL DEFAULT 0,
+  export_count BIGINT NOT NULL DEFAULT 0,
+  response_time_sum_ms BIGINT NOT NULL DEFAULT 0,
+  avg_response_time_ms INTEGER NOT NULL DEFAULT 0,    -- response_time_sum_ms / total_requests
+  users_hll BYTEA,
+  ips_hll BYTEA,
+  updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- HyperLogLogレジスタのマージ（レジスタごとの最大値）
+CREATE OR REPLACE FUNCTION hll_merge(a BYTEA, b BYTEA)
+RETURNS BYTEA AS $$
+DECLARE
+  merged BYTEA;
+BEGIN
+  IF a IS NULL THEN RETURN b; END IF;
+  IF b IS NULL THEN RETURN a; END IF;
+  merged := a;
+  FOR i IN 0..length(a) - 1 LOOP
+    IF get_byte(b, i) > get_byte(merged, i) THEN
+      merged := set_byte(merged, i, get_byte(b, i));
+    END IF;
+  END LOOP;
+  RETURN merged;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- HyperLogLogの推定値（少数時は線形カウント）
+CREATE OR REPLACE FUNCTION hll_estimate(registers BYTEA)
+RETURNS INTEGER AS $$
+DECLARE
+  m INTEGER;
+  total DOUBLE PRECISION := 0;
+  zeros INTEGER := 0;
+  r INTEGER;
+  estimate DOUBLE PRECISION;
+BEGIN
+  IF registers IS NULL THEN RETURN 0; END IF;
+  m := length(registers);
+  FOR i IN 0..m - 1 LOOP
+    r := get_byte(registers, i);
+    total := total + power(2, -r);
+    IF r = 0 THEN zeros := zeros + 1; END IF;
+  END LOOP;
+  estimate := (0.7213 / (1 + 1.079 / m)) * m * m / total;
+  IF estimate <= 2.5 * m AND zeros > 0 THEN
+    estimate := m * ln(m::DOUBLE PRECISION / zeros);
+  END IF;
+  RETURN round(estimate);
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- 1プロセス分の差分を加算（行ロック内で計算するため複数プロセスから同時に呼んでもよい）
+CREATE OR REPLACE FUNCTION merge_access_log_daily_stats(
+  p_log_date DATE,
+  p_total_requests BIGINT,
+  p_login_count BIGINT,
+  p_error_count BIGINT,
+  p_create_count BIGINT,
+  p_update_count BIGINT,
+  p_delete_count BIGINT,
+  p_export_count BIGINT,
+  p_response_time_sum_ms BIGINT,
+  p_users_hll TEXT,                                   -- base64
+  p_ips_hll TEXT
+)
+RETURNS VOID AS $$
+BEGIN
+  INSERT INTO access_log_daily_stats AS s (
+    log_date, total_requests, login_count, error_count, create_count, update_count,
+    delete_count, export_count, response_time_sum_ms, avg_response_time_ms,
+    users_hll, ips_hll, unique_users, unique_ips
+  )
+  VALUES (
+    p_log_date, p_total_requests, p_login_count, p_error_count, p_create_count, p_update_count,
+    p_delete_count, p_export_count, p_response_time_sum_ms,
+    p_response_time_sum_ms / GREATEST(p_total_requests, 1),
+    decode(p_users_hll, 'base64'), decode(p_ips_hll, 'base64'),
+    hll_estimate(decode(p_users_hll, 'base64')), hll_estimate(decode(p_ips_hll, 'base64'))
+  )
+  ON CONFLICT (log_date) DO UPDATE SET
+    total_requests = s.total_requests + EXCLUDED.total_requests,
+    login_count = s.login_count + EXCLUDED.login_count,
+    error_count = s.error_count + EXCLUDED.error_count,
+    create_count = s.create_count + EXCLUDED.create_count,
+    update_count = s.update_count + EXCLUDED.update_count,
+    delete_count = s.delete_count + EXCLUDED.delete_count,
+    export_count = s.export_count + EXCLUDED.export_count,
+    response_time_sum_ms = s.response_time_sum_ms + EXCLUDED.response_time_sum_ms,
+    avg_response_time_ms = (s.response_time_sum_ms + EXCLUDED.response_time_sum_ms)
+      / GREATEST(s.total_requests + EXCLUDED.total_requests, 1),
+    users_hll = hll_merge(s.users_hll, EXCLUDED.users_hll),
+    ips_hll = hll_merge(s.ips_hll, EXCLUDED.ips_hll),
+    unique_users = hll_estimate(hll_merge(s.users_hll, EXCLUDED.users_hll)),
+    unique_ips = hll_estimate(hll_merge(s.ips_hll, EXCLUDED.ips_hll)),
+    updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- 既存ログからの初期投入（前日までの確定分のみ。ユニーク数は正確な値、スケッチは持たない）
+INSERT INTO access_log_daily_stats (
+  log_date, total_requests, unique_users, unique_ips, login_count, error_count,
+  create_count, update_count, delete_count, export_count,
+  response_time_sum_ms, avg_response_time_ms
+)
+SELECT
+  (created_at AT TIME ZONE 'UTC')::date AS log_date,
+  COUNT(*),
+  COUNT(DISTINCT user_id),
+  COUNT(DISTINCT ip_address),
+  COUNT(*) FILTER (WHERE action_type = 'login'),
+  COUNT(*) FILTER (WHERE response_status >= 400),
+  COUNT(*) FILTER (WHERE action_type = 'create'),
+  COUNT(*) FILTER (WHERE action_type = 'update'),
+  COUNT(*) FILTER (WHERE action_type = 'delete'),
+  COUNT(*) FILTER (WHERE action_type = 'export'),
+  COALESCE(SUM(response_time_ms), 0),
+  COALESCE(AVG(response_time_ms), 0)::INTEGER
+FROM admin_access_logs
+WHERE created_at < (NOW() AT TIME ZONE 'UTC')::date
+GROUP BY 1
+ON CONFLICT (log_date) DO NOTHING;
@@ -0,0 +1,72 @@
+-- ════════════════════════════════════════
+-- SmartNR: コンバージョンのステータス遷移ログ
+-- 実行先: Supabase SQL Editor
+--
+-- ステータス変更API（マスター・スカウト）、SB一括支払い、ミニLPからの応募が1行ずつ追記する。
+-- 日報の「今日のステータス変更」・ステージ滞在時間・監査ビューは created_at の範囲で読む。
+-- 追記専用（UPDATE / DELETE はトリガーで拒否）。
+-- ════════════════════════════════════════
+CREATE TABLE IF NOT EXISTS conversion_status_events (
+  id BIGSERIAL PRIMARY KEY,
+  conversion_id INTEGER REFERENCES link_conversions(id) NOT NULL,
+  scout_id INTEGER REFERENCES scouts(id) NOT NULL,   -- コンバージョンの担当スカウト
+  event_type TEXT NOT NULL,                          -- 'submitted' | 'status' | 'sb_paid'
+  from_status TEXT,                                  -- 応募時はNULL
+  to_status TEXT NOT NULL,
+  actor_id INTEGER REFERENCES scouts(id),            -- 操作した人
+  actor_role TEXT NOT NULL,                          -- 'master' | 'scout' | 'applicant' | 'backfill'
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- 日報・監査ビュー（期間で全件）
+CREATE INDEX IF NOT EXISTS idx_conversion_status_events_created
+  ON conversion_status_events(created_at, id);
+-- 1件の履歴・滞在時間の窓関数
+CREATE INDEX IF NOT EXISTS idx_conversion_status_events_conversion
+  ON conversion_status_events(conversion_id, created_at);
+-- スカウト別の履歴
+CREATE INDEX IF NOT EXISTS idx_conversion_status_events_scout
+  ON conversion_status_events(scout_id, created_at);
+
+CREATE OR REPLACE FUNCTION reject_conversion_status_event_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RAISE EXCEPTION 'conversion_status_events is append-only';
+END;
+$$;
+
+DROP TRIGGER IF EXISTS conversion_status_events_append_only ON conversion_status_events;
+CREATE TRIGGER conversion_status_events_append_only
+  BEFORE UPDATE OR DELETE ON conversion_status_events
+  FOR EACH ROW EXECUTE FUNCTION reject_conversion_status_event_change();
+
+-- ────────────────────────────────────────
+-- 既存コンバージョンの履歴を各ステータスの日時から復元する（初回のみ）
+-- 途中のステータスを飛ばした場合や、日時の無いステータス（active / churned）は現在値のみ分かる。
+-- ────────────────────────────────────────
+INSERT INTO conversion_status_events
+  (conversion_id, scout_id, event_type, from_status, to_status, actor_role, created_at)
+SELECT
+  conversion_id,
+  scout_id,
+  CASE WHEN to_status = 'submitted' THEN 'submitted' ELSE 'status' END,
+  LAG(to_status) OVER (PARTITION BY conversion_id ORDER BY created_at, step),
+  to_status,
+  'backfill',
+  created_at
+FROM (
+  SELECT c.id AS conversion_id, c.scout_id, stage.to_status, stage.created_at, stage.step
+  FROM link_conversions c
+  CROSS JOIN LATERAL (VALUES
+    (0, 'submitted', c.submitted_at),
+    (1, 'contacted', c.contacted_at),
+    (2, 'interviewed', c.interviewed_at),
+    (3, 'trial', c.trial_at),
+    (4, 'hired', c.hired_at),
+    (4, 'registered', c.registered_at)
+  ) AS stage(step, to_status, created_at)
+  WHERE stage.created_at IS NOT NULL
+) AS reached
+WHERE NOT EXISTS (SELECT 1 FROM conversion_status_events);
@@ -0,0 +1,19 @@
+-- ════════════════════════════════════════
+-- SmartNR: SB一括支払いの実行記録（冪等キー）
+-- 実行先: Supabase SQL Editor
+--
+-- PATCH /api/master/tracking/conversions/bulk-pay に idempotency_key を付けると、
+-- キーごとに進捗をここへ記録する。完了済みのキーでの再送は何もせず前回の結果を返す。
+-- ════════════════════════════════════════
+CREATE TABLE IF NOT EXISTS sb_payout_batches (
+  idempotency_key TEXT PRIMARY KEY,
+  master_id INTEGER REFERENCES scouts(id) NOT NULL,
+  ids_digest TEXT NOT NULL,                          -- 対象IDのハッシュ
+  requested_count INTEGER NOT NULL,
+  paid_count INTEGER NOT NULL DEFAULT 0,
+  chunks JSONB NOT NULL DEFAULT '[]',                -- [{"index", "requested", "paid"}]
+  status TEXT NOT NULL DEFAULT 'running',            -- 'running' | 'completed'
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  completed_at TIMESTAMPTZ
+);
+
@@ -0,0 +1,37 @@
+-- ════════════════════════════════════════
+-- SmartNR: スカウト成績の月次集計テーブル
+-- 実行先: Supabase SQL Editor
+--
+-- ランキング等はlink_clicks / link_conversionsを毎回集計せず、このテーブルを読む。
+-- クリック・応募・ステータス変更・SB変更の各APIが同じトランザクション内で差分を加算する。
+-- 作成後に一度 cd backend && python -m app.jobs.rebuild_scout_performance で既存分を集計すること。
+-- ════════════════════════════════════════
+CREATE TABLE IF NOT EXISTS scout_performance (
+  scout_id INTEGER REFERENCES scouts(id) NOT NULL,
+  link_type TEXT NOT NULL,                           -- 'recruit' | 'app_invite'
+  month DATE NOT NULL,                               -- 月初日
+
+  -- 発生月で計上（クリック日・応募日・各ステータスの到達日）
+  clicks INTEGER NOT NULL DEFAULT 0,
+  submissions INTEGER NOT NULL DEFAULT 0,
+  contacted INTEGER NOT NULL DEFAULT 0,
+  interviewed INTEGER NOT NULL DEFAULT 0,
+  trial INTEGER NOT NULL DEFAULT 0,
+  hired INTEGER NOT NULL DEFAULT 0,
+  registered INTEGER NOT NULL DEFAULT 0,
+
+  -- 現在のステータス（応募月で計上）
+  active INTEGER NOT NULL DEFAULT 0,
+  churned INTEGER NOT NULL DEFAULT 0,
+
+  -- SB（採用月で計上。未採用なら応募月）
+  sb_amount NUMERIC NOT NULL DEFAULT 0,
+  scout_income NUMERIC NOT NULL DEFAULT 0,
+  unpaid_scout_income NUMERIC NOT NULL DEFAULT 0,
+
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (scout_id, link_type, month)
+);
+
+-- 期間指定のランキング（月の範囲で全スカウト分を読む）
+CREATE INDEX IF NOT EXISTS idx_scout_performance_month ON scout_performance(month, scout_id);
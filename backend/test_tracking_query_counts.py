@@ -0,0 +1,171 @@
+"""
+トラッキング系一覧APIのクエリ回数のテスト
+
+行ごとにScout/Shopを取りに行っていないこと（EntityLoaderでまとめ読みしていること）を、
+表示件数を変えてもSQLの発行回数が変わらないことで検証する。
+SQLiteのインメモリDBで各エンドポイント関数を直接呼ぶ。
+
+実行: cd backend && python -m pytest test_tracking_query_counts.py
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+for key, value in {
+    "DATABASE_URL": "sqlite://",
+    "SUPABASE_URL": "https://example.supabase.co",
+    "SUPABASE_KEY": "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.test",
+    "XAI_API_KEY": "test",
+    "SECRET_KEY": "test",
+}.items():
+    os.environ.setdefault(key, value)
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.alerts import daily_alerts
+from app.core.loaders import EntityLoader
+from app.models import (
+    Cast, ConversionStatusEvent, LinkClick, LinkConversion, Scout, ScoutLink,
+    ScoutPerformanceRollup, Shop,
+)
+from app.routers import master_tracking, mini_lp, scout_links
+
+MASTER_ID = 1
+SCOUT_IDS = (2, 3, 4)
+SHOP_IDS = (1, 2, 3)
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_on_sqlite(element, compiler, **kw):
+    return "JSON"
+
+
+@pytest.fixture
+def make_db():
+    """rows件のリンク・コンバージョンを持つDBを作り、(セッション, クエリカウンター) を返す"""
+    engines = []
+
+    def build(rows: int):
+        daily_alerts.invalidate()  # 日報アラートのキャッシュは前のDBの集計を持っている
+        engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        engines.append(engine)
+        tables = [model.__table__ for model in (
+            Shop, Cast, Scout, ScoutLink, LinkClick, LinkConversion, ScoutPerformanceRollup,
+            ConversionStatusEvent,
+        )]
+        Shop.metadata.create_all(engine, tables=tables)
+
+        db = sessionmaker(bind=engine)()
+        db.add(Scout(id=MASTER_ID, email="master@example.com", name="master", role="admin"))
+        for scout_id in SCOUT_IDS:
+            db.add(Scout(id=scout_id, email=f"s{scout_id}@example.com", name=f"scout{scout_id}"))
+        for shop_id in SHOP_IDS:
+            db.add(Shop(id=shop_id, name=f"shop{shop_id}", area="area"))
+        now = datetime.now(timezone.utc)
+        for i in range(1, rows + 1):
+            scout_id = SCOUT_IDS[i % len(SCOUT_IDS)]
+            shop_id = SHOP_IDS[i % len(SHOP_IDS)] if i % 4 else None
+            db.add(ScoutLink(
+                id=i, scout_id=scout_id, link_type="recruit", unique_code=f"code{i}",
+                short_url=f"https://example.com/r/code{i}", shop_id=shop_id,
+                click_count=10, submission_count=1, created_at=now,
+            ))
+            db.add(LinkConversion(
+                id=i, link_id=i, scout_id=scout_id, conversion_type="recruit_apply",
+                name=f"applicant{i}", shop_id=shop_id, status="contacted",
+                submitted_at=now, contacted_at=now, updated_at=now, created_at=now,
+            ))
+            db.add(ConversionStatusEvent(
+                conversion_id=i, scout_id=scout_id, event_type="status", from_status="submitted",
+                to_status="contacted", actor_id=MASTER_ID, actor_role="master", created_at=now,
+            ))
+        db.commit()
+
+        counter = {"queries": 0}
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def count(*args):
+            counter["queries"] += 1
+
+        return db, counter
+
+    yield build
+    for engine in engines:
+        engine.dispose()
+
+
+def queries_for(make_db, rows, call):
+    db, counter = make_db(rows)
+    try:
+        call(db, EntityLoader(db))
+        return counter["queries"]
+    finally:
+        db.close()
+
+
+ENDPOINTS = {
+    "get_all_conversions": lambda db, loader: master_tracking.get_all_conversions(
+        master_id=MASTER_ID, conversion_type="all", status="all", scout_id=None,
+        search=None, sort="newest", page=1, per_page=20, cursor=None, pagination="offset",
+        count="exact", db=db, loader=loader,
+    ),
+    "get_all_links": lambda db, loader: master_tracking.get_all_links(
+        master_id=MASTER_ID, link_type="all", scout_id=None, is_active=None,
+        sort="newest", db=db, loader=loader,
+    ),
+    "get_scout_detail": lambda db, loader: master_tracking.get_scout_detail(
+        scout_id=SCOUT_IDS[0], master_id=MASTER_ID, months=12, db=db, loader=loader,
+    ),
+    "get_daily_report": lambda db, loader: master_tracking.get_daily_report(
+        master_id=MASTER_ID, db=db, loader=loader,
+    ),
+    "get_my_links": lambda db, loader: scout_links.get_my_links(
+        scout_id=SCOUT_IDS[0], link_type=None, db=db, loader=loader,
+    ),
+}
+
+
+@pytest.mark.parametrize("endpoint", sorted(ENDPOINTS))
+def test_query_count_does_not_grow_with_rows(make_db, endpoint):
+    call = ENDPOINTS[endpoint]
+    assert queries_for(make_db, 3, call) == queries_for(make_db, 60, call)
+
+
+def test_conversions_page_uses_fixed_queries(make_db):
+    # verify_master, count, 一覧, Scoutまとめ読み, Shopまとめ読み
+    assert queries_for(make_db, 60, ENDPOINTS["get_all_conversions"]) == 5
+
+
+def test_lp_data_resolves_scout_and_shop(make_db):
+    db, counter = make_db(5)
+    try:
+        response = mini_lp.get_lp_data(unique_code="code1", db=db, loader=EntityLoader(db))
+        body = json.loads(response.body)
+        assert body["scout_name"] == "scout3"
+        assert body["shop_name"] == "shop2"
+        assert counter["queries"] == 3
+    finally:
+        db.close()
+
+
+def test_loader_deduplicates_and_caches(make_db):
+    db, counter = make_db(0)
+    try:
+        loader = EntityLoader(db)
+        loader.want(Scout, [2, 3, 2, None, 99])
+        assert loader.name(Scout, 2) == "scout2"
+        assert loader.name(Scout, 3) == "scout3"
+        assert loader.get(Scout, 99) is None
+        assert loader.name(Scout, None, "") == ""
+        loader.want(Scout, [2, 3])
+        assert loader.name(Scout, 4) == "scout4"
+        assert counter["queries"] == 2
+    finally:
+        db.close()
@@ -19,7 +19,8 @@ import {
 import Link from "next/link"
 
 interface AccessLog {
-  id: number
+  id?: number
+  stream_id?: number  // ライブ配信で受け取った行（DBのidはまだ無い）
   user_email: string
   user_role: string
   request_method: string
@@ -110,12 +111,23 @@ export default function AccessLogsPage() {
     fetchStats()
   }, [currentPage, filterEmail, filterAction, filterResource, filterStatusMin, filterDateFrom, searchQuery])
 
+  // 自動更新: サーバーからのライブ配信（SSE）を購読し、新しいログを先頭に追加
   useEffect(() => {
-    if (!autoRefresh) return
-    const interval = setInterval(() => {
-      fetchLogs()
-    }, 10000) // 10秒ごと
-    return () => clearInterval(interval)
+    if (!autoRefresh || currentPage !== 1) return
+    const params = new URLSearchParams()
+    if (filterEmail) params.append("user_email", filterEmail)
+    if (filterAction) params.append("action_type", filterAction)
+    if (filterResource) params.append("resource_type", filterResource)
+
+    const source = new EventSource(`${API_BASE}/api/admin/access-logs/stream?${params}`)
+    source.onmessage = (event) => {
+      const log = JSON.parse(event.data) as AccessLog
+      if (filterStatusMin && log.response_status < Number(filterStatusMin)) return
+      if (searchQuery && !`${log.request_path} ${log.user_email} ${log.ip_address}`.includes(searchQuery)) return
+      setLogs((prev) => [log, ...prev].slice(0, 50))
+      setTotalCount((prev) => prev + 1)
+    }
+    return () => source.close()
   }, [autoRefresh, currentPage, filterEmail, filterAction, filterResource, filterStatusMin, filterDateFrom, searchQuery])
 
   const getMethodBadgeColor = (method: string) => {
@@ -278,6 +290,8 @@ export default function AccessLogsPage() {
                 <SelectItem value="scout">スカウト</SelectItem>
                 <SelectItem value="interview">面接</SelectItem>
                 <SelectItem value="salary">給料</SelectItem>
+                <SelectItem value="link">紹介リンク</SelectItem>
+                <SelectItem value="conversion">応募・登録</SelectItem>
                 <SelectItem value="system">システム</SelectItem>
                 <SelectItem value="ai">AI</SelectItem>
               </SelectContent>
@@ -362,7 +376,7 @@ export default function AccessLogsPage() {
                 ) : (
                   logs.map((log) => (
                     <tr
-                      key={log.id}
+                      key={log.id ?? `live-${log.stream_id}`}
                       className="border-b border-zinc-800 hover:bg-zinc-800/50 transition-colors"
                     >
                       <td className="p-3 text-xs text-zinc-400">
@@ -151,6 +151,8 @@ export default function MasterTrackingPage() {
           <SelectContent>
             <SelectItem value="2026-02">今月（2月）</SelectItem>
             <SelectItem value="2026-01">先月（1月）</SelectItem>
+            <SelectItem value="7d">直近7日</SelectItem>
+            <SelectItem value="30d">直近30日</SelectItem>
             <SelectItem value="2026">今年（2026）</SelectItem>
             <SelectItem value="all">全期間</SelectItem>
           </SelectContent>